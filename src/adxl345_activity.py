@@ -0,0 +1,141 @@
+from shake_detector import action_mask, AXIS_X, AXIS_Y, AXIS_Z
+from ticks import ticks_diff
+
+# ADXL345 registers
+_REG_THRESH_ACT = 0x24
+_REG_THRESH_INACT = 0x25
+_REG_TIME_INACT = 0x26
+_REG_ACT_INACT_CTL = 0x27
+_REG_POWER_CTL = 0x2D
+_REG_INT_ENABLE = 0x2E
+_REG_INT_MAP = 0x2F
+_REG_INT_SOURCE = 0x30
+
+_POWER_MEASURE = 0x08
+_POWER_LINK = 0x20     # Activity and inactivity alternate: one activity per still -> moving edge
+_ACT_AC = 0x80         # AC-coupled: compare against a reference sample, not zero
+_INACT_AC = 0x08
+INT_ACTIVITY = 0x10
+INT_INACTIVITY = 0x08
+
+# THRESH_ACT/THRESH_INACT LSB (62.5 mg) in data counts (4 mg)
+COUNTS_PER_THRESH = 62.5 / 4
+
+
+def thresh_counts(threshold):
+    """A level threshold in data counts as a THRESH_ACT value (62.5 mg/LSB, at least 1)"""
+    return max(1, min(255, int(threshold / COUNTS_PER_THRESH + 0.5)))
+
+
+def axis_enables(mask):
+    """ACT_INACT_CTL for an action's axis mask: AC-coupled activity and inactivity on those axes"""
+    axes = ((mask & AXIS_X and 0x04) | (mask & AXIS_Y and 0x02) | (mask & AXIS_Z and 0x01))
+    return _ACT_AC | axes << 4 | _INACT_AC | axes
+
+
+class ADXL345Activity:
+    """
+    ADXL345Activity(i2c, *, address=0x53, int_pin=None, cooldown_ms=300)
+    - Shake counting in the sensor: configure() programs the ADXL345's
+      activity engine for a level (THRESH_ACT from the threshold, per-axis
+      enables from the action) with activity and inactivity linked, so the
+      chip raises one activity interrupt per still -> moving edge at its own
+      output data rate, whether or not anybody is polling.
+    - poll(now) reads INT_SOURCE (one byte, which clears it) and counts an
+      activity once cooldown_ms have passed since the last counted shake;
+      now is ticks_ms, as for ShakeDetector. With int_pin (INT1, high while
+      an interrupt is pending) the read is skipped on polls where nothing
+      happened.
+    - configure() (threshold in counts), count, is_moving and cooldown_ms
+      read like ShakeDetector's; the sensor keeps no samples, so this
+      backend can't feed the trace recorder.
+    """
+
+    def __init__(self, i2c, *, address=0x53, int_pin=None, cooldown_ms=300):
+        self._i2c = i2c
+        self._address = address
+        self._int_pin = int_pin
+        self.cooldown_ms = cooldown_ms
+        self._reg = bytearray(1)
+        self._cmd = bytearray(2)
+        self._source = bytearray(1)
+        self.reads = 0
+        self.configure("", 0)
+
+    def _lock(self):
+        while not self._i2c.try_lock():
+            pass
+
+    def _write(self, reg, value):
+        self._cmd[0] = reg
+        self._cmd[1] = value
+        self._i2c.writeto(self._address, self._cmd)
+
+    def configure(self, action, threshold, *, cooldown_ms=None):
+        """Start a level: program the activity engine for threshold (counts) and clear the count"""
+        self.action = action
+        self.mask = action_mask(action)
+        self.threshold = threshold
+        if cooldown_ms is not None:
+            self.cooldown_ms = cooldown_ms
+        self.count = 0
+        self.is_moving = False
+        self.last_shake_time = None
+        if not self.mask:
+            return
+        thresh = thresh_counts(threshold)
+        self._lock()
+        try:
+            # Standby while reprogramming, so no interrupt fires on half a setup
+            self._write(_REG_POWER_CTL, 0)
+            self._write(_REG_INT_ENABLE, 0)
+            self._write(_REG_THRESH_ACT, thresh)
+            self._write(_REG_THRESH_INACT, thresh)
+            self._write(_REG_TIME_INACT, 0)  # Inactive as soon as a sample is back within the threshold
+            self._write(_REG_ACT_INACT_CTL, axis_enables(self.mask))
+            self._write(_REG_INT_MAP, 0)     # Everything on INT1
+            self._write(_REG_INT_ENABLE, INT_ACTIVITY | INT_INACTIVITY)
+            self._write(_REG_POWER_CTL, _POWER_LINK | _POWER_MEASURE)
+            # Drop anything latched before the level started
+            self._reg[0] = _REG_INT_SOURCE
+            self._i2c.writeto_then_readfrom(self._address, self._reg, self._source)
+        finally:
+            self._i2c.unlock()
+
+    def pending(self):
+        """True if INT_SOURCE needs reading: INT1 is high, or there is no pin to tell"""
+        pin = self._int_pin
+        return pin is None or pin.value
+
+    def read_source(self):
+        """INT_SOURCE, read under the bus lock; 0 without a read when INT1 is low"""
+        if not self.pending():
+            return 0
+        self._lock()
+        try:
+            self._reg[0] = _REG_INT_SOURCE
+            self._i2c.writeto_then_readfrom(self._address, self._reg, self._source)
+        finally:
+            self._i2c.unlock()
+        self.reads += 1
+        return self._source[0]
+
+    def update(self, now, source):
+        """Count one INT_SOURCE value read at ticks_ms `now`; returns True if it counted a shake"""
+        if source & INT_INACTIVITY:
+            # Activity and inactivity both latched means the shake is already over
+            self.is_moving = False
+        elif source & INT_ACTIVITY:
+            self.is_moving = True
+        if not source & INT_ACTIVITY or not self.mask:
+            return False
+        last = self.last_shake_time
+        if last is None or ticks_diff(now, last) > self.cooldown_ms:
+            self.count += 1
+            self.last_shake_time = now
+            return True
+        return False
+
+    def poll(self, now):
+        """Read and count the interrupts latched since the last poll; returns True on a shake"""
+        return self.update(now, self.read_source())
@@ -0,0 +1,101 @@
+from array import array
+
+# ADXL345 registers
+_REG_BW_RATE = 0x2C
+_REG_POWER_CTL = 0x2D
+_REG_INT_SOURCE = 0x30
+_REG_DATAX0 = 0x32
+_REG_FIFO_CTL = 0x38
+_REG_FIFO_STATUS = 0x39
+
+_POWER_MEASURE = 0x08
+_FIFO_STREAM = 0b10 << 6
+_INT_OVERRUN = 0x01
+FIFO_DEPTH = 32
+# The output registers hold one more sample, so FIFO_STATUS reports up to 33
+FIFO_ENTRIES = FIFO_DEPTH + 1
+
+# Output data rate (Hz) -> BW_RATE code
+RATES = {25: 0x08, 50: 0x09, 100: 0x0A, 200: 0x0B, 400: 0x0C, 800: 0x0D}
+
+
+class ADXL345FIFO:
+    """
+    ADXL345FIFO(i2c, *, address=0x53, rate_hz=100)
+    - i2c: busio.I2C shared with the display
+    - rate_hz: output data rate, one of RATES; samples arrive every 1/rate_hz s
+    - Puts the sensor into FIFO stream mode. read_block() drains all queued
+      samples (up to 33) under a single bus lock into preallocated x/y/z
+      arrays of raw counts, so the sample rate no longer depends on the loop.
+    """
+
+    def __init__(self, i2c, *, address=0x53, rate_hz=100):
+        if rate_hz not in RATES:
+            raise ValueError(f"Unsupported rate {rate_hz}Hz, use one of {sorted(RATES)}")
+        self._i2c = i2c
+        self._address = address
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+
+        self.x = array("h", [0] * FIFO_ENTRIES)
+        self.y = array("h", [0] * FIFO_ENTRIES)
+        self.z = array("h", [0] * FIFO_ENTRIES)
+        self.overruns = 0
+
+        self._reg = bytearray(1)
+        self._cmd = bytearray(2)
+        self._status = bytearray(1)
+        self._data = bytearray(6)
+
+        self._lock()
+        try:
+            # Configure in standby, then start measuring
+            self._write(_REG_POWER_CTL, 0)
+            self._write(_REG_BW_RATE, RATES[rate_hz])
+            self._write(_REG_FIFO_CTL, _FIFO_STREAM | (FIFO_DEPTH - 1))
+            self._write(_REG_POWER_CTL, _POWER_MEASURE)
+        finally:
+            self._i2c.unlock()
+
+    def _lock(self):
+        while not self._i2c.try_lock():
+            pass
+
+    def _write(self, reg, value):
+        self._cmd[0] = reg
+        self._cmd[1] = value
+        self._i2c.writeto(self._address, self._cmd)
+
+    def read_block(self):
+        """Drain the FIFO; returns how many samples were stored in x/y/z"""
+        i2c = self._i2c
+        address = self._address
+        reg = self._reg
+        data = self._data
+        self._lock()
+        try:
+            reg[0] = _REG_FIFO_STATUS
+            i2c.writeto_then_readfrom(address, reg, self._status)
+            count = self._status[0] & 0x3F
+            if count >= FIFO_ENTRIES:
+                # Full, which is not yet an overrun: INT_SOURCE says whether a
+                # sample was overwritten while we were away (data reads clear it)
+                count = FIFO_ENTRIES
+                reg[0] = _REG_INT_SOURCE
+                i2c.writeto_then_readfrom(address, reg, self._status)
+                if self._status[0] & _INT_OVERRUN:
+                    self.overruns += 1
+
+            # Each 6-byte read of DATAX0..DATAZ1 pops one FIFO entry
+            reg[0] = _REG_DATAX0
+            for i in range(count):
+                i2c.writeto_then_readfrom(address, reg, data)
+                v = data[0] | data[1] << 8
+                self.x[i] = v - 65536 if v > 32767 else v
+                v = data[2] | data[3] << 8
+                self.y[i] = v - 65536 if v > 32767 else v
+                v = data[4] | data[5] << 8
+                self.z[i] = v - 65536 if v > 32767 else v
+        finally:
+            i2c.unlock()
+        return count
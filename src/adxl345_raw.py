@@ -0,0 +1,72 @@
+# ADXL345 registers
+_REG_POWER_CTL = 0x2D
+_REG_INT_ENABLE = 0x2E
+_REG_DATAX0 = 0x32
+
+_POWER_MEASURE = 0x08
+
+# Same conversion adafruit_adxl34x uses for .acceleration (4 mg/LSB)
+MS2_PER_COUNT = 0.004 * 9.80665
+COUNTS_PER_MS2 = 1 / MS2_PER_COUNT
+
+
+class ADXL345Raw:
+    """
+    ADXL345Raw(i2c, *, address=0x53)
+    - i2c: busio.I2C shared with the display
+    - Minimal ADXL345 driver for the sample path: read() burst-reads
+      DATAX0..DATAZ1 in one transaction into a reused bytearray and unpacks
+      the raw counts (4 mg/LSB) into x/y/z, so a sample costs no allocation
+      and no float math.
+    - acceleration is the same reading as an (x, y, z) tuple in m/s^2, like
+      adafruit_adxl34x's, for code off the hot path.
+    """
+
+    def __init__(self, i2c, *, address=0x53):
+        self._i2c = i2c
+        self._address = address
+        self._reg = bytearray(1)
+        self._cmd = bytearray(2)
+        self._data = bytearray(6)
+        self.x = 0
+        self.y = 0
+        self.z = 0
+
+        self._lock()
+        try:
+            self._write(_REG_POWER_CTL, 0)
+            self._write(_REG_INT_ENABLE, 0)
+            self._write(_REG_POWER_CTL, _POWER_MEASURE)
+        finally:
+            self._i2c.unlock()
+
+    def _lock(self):
+        while not self._i2c.try_lock():
+            pass
+
+    def _write(self, reg, value):
+        self._cmd[0] = reg
+        self._cmd[1] = value
+        self._i2c.writeto(self._address, self._cmd)
+
+    def read(self):
+        """Take one sample into x/y/z (raw counts)"""
+        i2c = self._i2c
+        data = self._data
+        self._lock()
+        try:
+            self._reg[0] = _REG_DATAX0
+            i2c.writeto_then_readfrom(self._address, self._reg, data)
+        finally:
+            i2c.unlock()
+        v = data[0] | data[1] << 8
+        self.x = v - 65536 if v > 32767 else v
+        v = data[2] | data[3] << 8
+        self.y = v - 65536 if v > 32767 else v
+        v = data[4] | data[5] << 8
+        self.z = v - 65536 if v > 32767 else v
+
+    @property
+    def acceleration(self):
+        self.read()
+        return (self.x * MS2_PER_COUNT, self.y * MS2_PER_COUNT, self.z * MS2_PER_COUNT)
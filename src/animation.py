@@ -0,0 +1,78 @@
+class Keyframe:
+    """
+    Keyframe(duration, *, color=None, screen=None)
+    - One step of an animation, held for duration seconds.
+    - color: LED colour to set at the start of the step, or None to leave it.
+    - screen: tuple of (text, y) centred lines to draw, () to clear the
+      screen, or None to leave it.
+    """
+
+    def __init__(self, duration, *, color=None, screen=None):
+        self.duration = duration
+        self.color = color
+        self.screen = screen
+
+
+def blink(color, on, off, times):
+    """Keyframes that flash color `times` times, ending dark"""
+    return (Keyframe(on, color=color), Keyframe(off, color=(0, 0, 0))) * times
+
+
+class Animator:
+    """
+    Animator(set_color, show_screen)
+    - Plays one tuple of Keyframes at a time. tick(now) is called from a
+      periodic task and applies each keyframe when its time comes, so
+      animations never block sampling or input.
+    - Step times are kept from the start time rather than from the tick, so a
+      late tick doesn't stretch the animation; frames missed by a late tick are
+      applied in order.
+    - skip() jumps straight to the final colour and screen and finishes.
+    """
+
+    def __init__(self, set_color, show_screen):
+        self._set_color = set_color
+        self._show_screen = show_screen
+        self._frames = ()
+        self._index = 0
+        self._next_time = 0
+        self.active = False
+
+    def start(self, frames, now):
+        """Begin frames at time now; the first keyframe is applied immediately"""
+        self._frames = frames
+        self._index = 0
+        self._next_time = now
+        self.active = bool(frames)
+        self.tick(now)
+
+    def tick(self, now):
+        frames = self._frames
+        while self.active and now >= self._next_time:
+            if self._index == len(frames):
+                self.active = False
+                break
+            frame = frames[self._index]
+            self._apply(frame.color, frame.screen)
+            self._next_time += frame.duration
+            self._index += 1
+
+    def skip(self):
+        """Finish now, leaving the colour and screen the animation would end on"""
+        if not self.active:
+            return
+        color = screen = None
+        for i in range(self._index, len(self._frames)):
+            frame = self._frames[i]
+            if frame.color is not None:
+                color = frame.color
+            if frame.screen is not None:
+                screen = frame.screen
+        self._apply(color, screen)
+        self.active = False
+
+    def _apply(self, color, screen):
+        if color is not None:
+            self._set_color(color)
+        if screen is not None:
+            self._show_screen(screen)
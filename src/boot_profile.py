@@ -0,0 +1,28 @@
+import time
+
+
+class BootProfile:
+    """
+    BootProfile(*, clock=time.monotonic_ns)
+    - Boot milestones: mark(name) stores the clock reading, which on
+      CircuitPython counts from power-on, so each mark is time since power-on.
+    - report() prints every milestone with the gap from the one before; the
+      game calls it once, when the difficulty screen takes input.
+    """
+
+    def __init__(self, *, clock=time.monotonic_ns):
+        self.clock = clock
+        self.marks = []
+        self.reported = False
+
+    def mark(self, name):
+        self.marks.append((name, self.clock()))
+
+    def report(self):
+        parts = []
+        previous = 0
+        for name, at in self.marks:
+            parts.append(f"{name} {at / 1_000_000_000:.2f}s (+{(at - previous) // 1_000_000}ms)")
+            previous = at
+        print("boot: " + ", ".join(parts))
+        self.reported = True
@@ -0,0 +1,120 @@
+import math
+import struct
+from adxl345_raw import MS2_PER_COUNT
+from shake_detector import AXIS_X, AXIS_Y, AXIS_Z
+
+# NVM record: MAGIC, samples, per-axis mean and standard deviation (counts), checksum
+MAGIC = b"SMC1"
+_RECORD = "<4sH3f3f"
+RECORD_SIZE = struct.calcsize(_RECORD) + 1
+# Noise floors are rounded up to this step (m/s^2), like the LEVELS thresholds
+FLOOR_STEP = 0.05
+
+
+def _checksum(data):
+    return sum(data) & 0xFF
+
+
+class Calibration:
+    """
+    Calibration(nvm=None, *, offset=0, sigmas=5)
+    - Per-device noise calibration: add() streams still samples (raw counts)
+      through a Welford accumulator per axis, keeping only the count, mean and
+      sum of squared deviations, so a few hundred samples take constant memory
+      and the variance stays accurate on CircuitPython's short floats, where
+      sum(x^2) - n * mean^2 would cancel away with 1 g sitting on an axis.
+    - finish() turns the sums into per-axis mean and std; threshold() raises a
+      level threshold (m/s^2) to `sigmas` standard deviations of the noisiest
+      axis the action tests, as the moving-average deviation sees that noise
+      (std * sqrt(1 - 1/window)), rounded up to FLOOR_STEP. Quiet units keep
+      the LEVELS thresholds; noisy ones stop counting their own noise.
+    - nvm: bytearray-like storage that survives a reset (microcontroller.nvm);
+      save() writes the result there and load() takes it back on later boots,
+      so a unit is only sampled once. Without nvm nothing is kept.
+    """
+
+    def __init__(self, nvm=None, *, offset=0, sigmas=5):
+        self._nvm = nvm
+        self._offset = offset
+        self.sigmas = sigmas
+        self.valid = False
+        self.mean = (0.0, 0.0, 0.0)
+        self.std = (0.0, 0.0, 0.0)
+        self.reset()
+
+    def reset(self):
+        """Start a new run of samples"""
+        self.samples = 0
+        self._mean_x = self._mean_y = self._mean_z = 0.0
+        self._m2_x = self._m2_y = self._m2_z = 0.0
+
+    def add(self, x, y, z):
+        """One still sample (raw counts)"""
+        n = self.samples + 1
+        self.samples = n
+        d = x - self._mean_x
+        self._mean_x += d / n
+        self._m2_x += d * (x - self._mean_x)
+        d = y - self._mean_y
+        self._mean_y += d / n
+        self._m2_y += d * (y - self._mean_y)
+        d = z - self._mean_z
+        self._mean_z += d / n
+        self._m2_z += d * (z - self._mean_z)
+
+    def finish(self, *, max_noise=None):
+        """
+        Take the accumulated samples as the calibration; False (and the old one
+        kept) if there were too few or an axis is noisier than max_noise counts,
+        which means the unit was moved while it was sampled
+        """
+        n = self.samples
+        if n < 2:
+            return False
+        std = (math.sqrt(self._m2_x / (n - 1)), math.sqrt(self._m2_y / (n - 1)),
+               math.sqrt(self._m2_z / (n - 1)))
+        if max_noise is not None and max(std) > max_noise:
+            return False
+        self.mean = (self._mean_x, self._mean_y, self._mean_z)
+        self.std = std
+        self.valid = True
+        return True
+
+    def noise(self, mask=AXIS_X | AXIS_Y | AXIS_Z):
+        """Standard deviation (counts) of the noisiest axis in mask"""
+        std_x, std_y, std_z = self.std
+        return max(mask & AXIS_X and std_x, mask & AXIS_Y and std_y, mask & AXIS_Z and std_z)
+
+    def floor(self, mask, window):
+        """Lowest threshold (m/s^2) the action's axes can use without counting noise"""
+        if not self.valid:
+            return 0.0
+        deviation = self.noise(mask) * math.sqrt(1 - 1 / window) * MS2_PER_COUNT
+        return round(math.ceil(self.sigmas * deviation / FLOOR_STEP - 1e-9) * FLOOR_STEP, 2)
+
+    def threshold(self, mask, threshold, window):
+        """A level threshold (m/s^2) raised to this unit's noise floor"""
+        return max(threshold, self.floor(mask, window))
+
+    def load(self):
+        """Take the calibration saved in nvm; False if there is none or it doesn't check out"""
+        nvm = self._nvm
+        if nvm is None:
+            return False
+        data = bytes(nvm[self._offset:self._offset + RECORD_SIZE])
+        if data[:len(MAGIC)] != MAGIC or _checksum(data[:-1]) != data[-1]:
+            return False
+        fields = struct.unpack(_RECORD, data[:-1])
+        self.samples = fields[1]
+        self.mean = fields[2:5]
+        self.std = fields[5:8]
+        self.valid = True
+        return True
+
+    def save(self):
+        """Write the calibration to nvm; False if there is nowhere to keep it"""
+        if self._nvm is None or not self.valid:
+            return False
+        data = struct.pack(_RECORD, MAGIC, self.samples, *(self.mean + self.std))
+        self._nvm[self._offset:self._offset + RECORD_SIZE] = data + bytes((_checksum(data),))
+        return True
@@ -1,81 +1,99 @@
-import board
-import busio
-import time
-import random
-import displayio
-import terminalio
-from adafruit_display_text import label
-import i2cdisplaybus
-import adafruit_displayio_ssd1306
-import adafruit_adxl34x
-from digitalio import DigitalInOut, Direction, Pull
-import neopixel
-
-# Import custom RotaryEncoder class
-try:
-    from rotary_encoder import RotaryEncoder
-    USE_CUSTOM_ENCODER = True
-    print("Using custom RotaryEncoder")
-except ImportError:
-    try:
-        import rotaryio
-        USE_CUSTOM_ENCODER = False
-        USE_ROTARY = True
-        print("Using built-in rotaryio")
-    except ImportError:
-        USE_CUSTOM_ENCODER = False
-        USE_ROTARY = False
-        print("Using GPIO fallback")
+# Boot milestones are marked from the first line; CircuitPython's clock counts
+# from power-on, so each mark is the time since power-on
+import hal
+from boot_profile import BootProfile
+boot = BootProfile(clock=hal.clock_ns)
+boot.mark("code.py")
 
 # ========== Hardware Initialization ==========
-displayio.release_displays()
-
-# I2C Bus (D4=SDA, D5=SCL)
-i2c = busio.I2C(board.D5, board.D4)
-
-# OLED Display (using your working method)
-display_bus = i2cdisplaybus.I2CDisplayBus(i2c, device_address=0x3C)
-display = adafruit_displayio_ssd1306.SSD1306(display_bus, width=128, height=64)
-
-# Create main display group
-main_group = displayio.Group()
-display.root_group = main_group
-
-# Accelerometer
-accelerometer = adafruit_adxl34x.ADXL345(i2c)
-
-# Rotary Encoder
-if USE_CUSTOM_ENCODER:
-    encoder = RotaryEncoder(board.D0, board.D1, pull=Pull.UP, pulses_per_detent=2)
-elif USE_ROTARY:
-    encoder = rotaryio.IncrementalEncoder(board.D0, board.D1)
-else:
-    class SimpleEncoder:
-        def __init__(self):
-            self.position = 0
-        def update(self):
-            pass
-    encoder = SimpleEncoder()
-
-encoder_button = DigitalInOut(board.D2)
-encoder_button.direction = Direction.INPUT
-encoder_button.pull = Pull.UP
-
-# Independent restart button (optional - if not connected, only encoder_button will work)
-try:
-    restart_button = DigitalInOut(board.D6)  # Warning: if no push button, auto-disable
-    restart_button.direction = Direction.INPUT
-    restart_button.pull = Pull.UP
-    HAS_RESTART_BUTTON = True
-except:
-    HAS_RESTART_BUTTON = False
-    print("Warning: Restart button not found on D6")
-
-# NeoPixel LED (3 LEDs)
-# Some versions only accept 2 required parameters (pin, n)
-pixels = neopixel.NeoPixel(board.D10, 3)
-pixels.brightness = 0.3
-pixels.auto_write = False
+# Real drivers on the device; tools/hal_sim.py installs a simulator on the host.
+# Only the display and buttons are up here: the accelerometer, encoder and
+# pixels are brought up by boot_parts() while the splash plays.
+hw = hal.get()
+boot.mark("display")
+
+# The title goes on the OLED before the rest of the game is imported, so the
+# first pixel waits only for the display driver; the splash animation takes
+# the screen over once the game is running
+TITLE = (("SHAKE", 20), ("MASTER", 35))
+
+def show_title():
+    for text, y in TITLE:
+        bitmap = hw.render_text(text)
+        hw.main_group.append(hw.make_tile(bitmap, (hal.DISPLAY_WIDTH - bitmap.width) // 2, y))
+    hw.display.refresh()
+
+show_title()
+boot.mark("splash")
+
+import random
+import asyncio
+from hud import HUD, centered_x
+from shake_detector import ShakeDetector, action_mask, AXIS_ALL
+from sample_queue import SampleQueue
+from tasks import PeriodicTask, print_stats
+from leds import LEDManager
+from animation import Animator, Keyframe, blink
+from render import RenderScheduler
+from i2c_bus import I2CBusScheduler
+from text_cache import TextCache
+from memory import MemoryManager
+from state_machine import StateMachine
+from input_events import InputEvents, PRESS, ROTATE
+from adxl345_raw import COUNTS_PER_MS2, MS2_PER_COUNT
+from calibration import Calibration
+boot.mark("imports")
+
+i2c = hw.i2c
+display = hw.display
+main_group = hw.main_group
+accelerometer = hw.accelerometer
+encoder = hw.encoder
+encoder_button = hw.encoder_button
+restart_button = hw.restart_button
+HAS_RESTART_BUTTON = restart_button is not None
+monotonic = hw.monotonic
+ticks_ms = hw.ticks_ms
+
+# Acquisition mode: "poll" reads one sample per loop, "fifo" lets the ADXL345
+# sample at a fixed rate into its FIFO and drains it in blocks
+ACQUISITION_MODE = "poll"
+FIFO_RATE_HZ = 100
+if ACQUISITION_MODE == "fifo":
+    from adxl345_fifo import ADXL345FIFO
+    from ticks import ticks_add
+    accel_fifo = ADXL345FIFO(i2c, rate_hz=FIFO_RATE_HZ)
+    read_fifo_block = accel_fifo.read_block
+
+# Trace recording: every level's raw samples are appended to TRACE_PATH for
+# offline replay (tools/replay_trace.py). Needs a writable filesystem.
+RECORD_TRACES = False
+TRACE_PATH = "/traces.bin"
+recorder = None
+if RECORD_TRACES:
+    from shake_trace import TraceRecorder
+    recorder = TraceRecorder(TRACE_PATH)
+
+# Span profiling: time each hot stage into a ring buffer and print min/mean/max
+# every 1/SPAN_REPORT_HZ seconds. When off, each span costs one `if spans:` test.
+PROFILE_SPANS = False
+SPAN_CAPACITY = 256
+SPAN_NAMES = ("sensor.read", "detect", "led.show", "hud.update", "menu.redraw", "slot.redraw")
+SPAN_SENSOR, SPAN_DETECT, SPAN_LED, SPAN_HUD, SPAN_MENU, SPAN_SLOT = range(len(SPAN_NAMES))
+spans = None
+if PROFILE_SPANS:
+    from spans import Spans
+    spans = Spans(SPAN_CAPACITY, clock=hw.monotonic_ns)
+    for name in SPAN_NAMES:
+        spans.span(name)
+
+# Heap budgets per game phase: the most free heap one visit may use, in bytes.
+# Every phase starts after a gc.collect(); levels hold automatic collection off
+# so no GC pause lands mid-level. The "level" phase starts once the HUD, its
+# strings and the detector are set up, so its budget covers only the running
+# level. tools/mem_budget.py fails when one goes over.
+MEMORY_BUDGETS = {"menu": 8192, "level": 2048, "slot": 4096, "result": 4096}
+memory = MemoryManager(MEMORY_BUDGETS, mem_free=hw.mem_free, clock=hw.monotonic_ns)
 
 # ========== Game Configuration ==========
 DIFFICULTY_LEVELS = ["EASY", "MED", "HARD"]
@@ -101,122 +119,412 @@ current_difficulty = 0
 current_level = 0
 score = 0
 
-# ========== Filter ==========
-class MovingAverageFilter:
-    def __init__(self, window_size=5):
-        self.window_size = window_size
-        # CircuitPython's deque doesn't support maxlen parameter, use list instead
-        self.x_data = []
-        self.y_data = []
-        self.z_data = []
-    
-    def update(self, x, y, z):
-        self.x_data.append(x)
-        self.y_data.append(y)
-        self.z_data.append(z)
-        
-        # Manually limit list length
-        if len(self.x_data) > self.window_size:
-            self.x_data.pop(0)
-        if len(self.y_data) > self.window_size:
-            self.y_data.pop(0)
-        if len(self.z_data) > self.window_size:
-            self.z_data.pop(0)
-    
-    def get_average(self):
-        if len(self.x_data) == 0:
-            return (0, 0, 0)
-        return (
-            sum(self.x_data) / len(self.x_data),
-            sum(self.y_data) / len(self.y_data),
-            sum(self.z_data) / len(self.z_data)
-        )
-
-accel_filter = MovingAverageFilter()
+# Moving average window; widen (32-128) for noisy units, cost per sample is constant.
+# Samples stay raw ADXL345 counts with ticks_ms times from the sensor read to
+# the shake count; level thresholds are converted to counts when a level starts.
+FILTER_WINDOW = 5
+SHAKE_COOLDOWN_MS = 300  # At least 0.3s between shakes, in sample time
+detector = ShakeDetector(FILTER_WINDOW, cooldown_ms=SHAKE_COOLDOWN_MS)
+
+# Detection backend: "software" runs the detector above over the sampled stream;
+# "adxl345" lets the sensor's activity engine count shakes at its own data rate
+# (adxl345_activity.py) and the sensor task only reads INT_SOURCE, or nothing
+# while INT1 (hal.ACCEL_INT_PIN) is low. No samples are read, so no traces.
+DETECTION_BACKEND = "software"
+if DETECTION_BACKEND == "adxl345":
+    if RECORD_TRACES:
+        raise ValueError("RECORD_TRACES needs DETECTION_BACKEND = \"software\"")
+    from adxl345_activity import ADXL345Activity
+    detector = ADXL345Activity(i2c, int_pin=hw.accel_int, cooldown_ms=SHAKE_COOLDOWN_MS)
+    read_activity = detector.read_source
+
+# Noise calibration: the first boot streams CALIBRATION_SAMPLES samples of the
+# unit at rest through calibration.py while the splash and menu are up, and
+# keeps each axis's noise in NVM (hw.nvm); later boots load it instead. A level
+# threshold is raised to CALIBRATION_SIGMAS standard deviations of that noise,
+# so a noisy unit doesn't count its own noise. RECALIBRATE samples again.
+CALIBRATION_SAMPLES = 256
+CALIBRATION_RATE_HZ = 100
+CALIBRATION_SIGMAS = 5
+CALIBRATION_MAX_NOISE = 0.5  # m/s^2 on any axis; noisier means the unit was moving
+RECALIBRATE = False
+calibration = Calibration(hw.nvm, sigmas=CALIBRATION_SIGMAS)
 
 # ========== Display Functions ==========
+# Frame rates for the render task; the screen is only pushed when something changed
+RENDER_FPS_MENU = 20
+RENDER_FPS_HUD = 15
+RENDER_FPS_SLOT = 30
+renderer = RenderScheduler(display, fps=RENDER_FPS_MENU, clock=hw.monotonic_ns)
+render_frame = renderer.step
+
+# Text is rendered once per distinct string into shared bitmaps; every screen
+# after that is built from cached tiles. Budget is in heap bytes.
+TEXT_CACHE_BUDGET = 8192
+text_cache = TextCache(hw, budget=TEXT_CACHE_BUDGET, clock=hw.monotonic_ns)
+text_label = text_cache.label
+
 def clear_screen():
     """Clear screen"""
+    text_cache.new_screen()
     while len(main_group):
         main_group.pop()
+    renderer.invalidate()
 
 def show_text(lines):
     """Display multiple lines of text"""
     clear_screen()
     y = 5
     for line in lines:
-        text_area = label.Label(terminalio.FONT, text=line[:21], color=0xFFFFFF, x=0, y=y)
+        text_area = text_label(line[:21], 0, y)
         main_group.append(text_area)
         y += 10
 
 def show_centered(text, y):
     """Display centered text"""
-    x = max(0, (128 - len(text) * 6) // 2)
-    text_area = label.Label(terminalio.FONT, text=text[:21], color=0xFFFFFF, x=x, y=y)
+    x = centered_x(text)
+    text_area = text_label(text[:21], x, y)
     main_group.append(text_area)
+    renderer.invalidate()
+
+# ========== Task Rates ==========
+# Each subsystem runs as its own asyncio task at its own rate (Hz)
+SENSOR_RATE_HZ = 100   # Accelerometer reads (FIFO mode: how often the FIFO is drained)
+DETECT_RATE_HZ = 50    # Shake detection over queued samples
+DISPLAY_RATE_HZ = 20   # HUD text updates
+LED_RATE_HZ = 50       # NeoPixel updates
+INPUT_RATE_HZ = 100    # Button polling
+ENCODER_RATE_HZ = 500  # Encoder pin sampling (keypad sampler: how often edges are drained)
+ANIMATION_RATE_HZ = 50 # Keyframe animation ticks
+RENDER_RATE_HZ = 60    # Render checks; frames are paced by RENDER_FPS_*
+RECORDER_RATE_HZ = 5   # Trace chunk writes
+SPAN_REPORT_HZ = 1     # Span summaries over serial
+MEMORY_RATE_HZ = 10    # Free-heap watermark samples
+
+sample_queue = SampleQueue()
+
+# Sensor reads and display frames share one I2C bus; the scheduler holds frames
+# back so they don't delay a due accelerometer read
+bus = I2CBusScheduler(hw, sensor_rate_hz=SENSOR_RATE_HZ, clock=hw.monotonic_ns)
 
 # ========== LED Functions ==========
-def set_all_pixels(color):
-    pixels.fill(color)
-    pixels.show()
-
-def rainbow_pulse():
-    colors = [(255, 0, 0), (255, 127, 0), (0, 255, 0), (0, 0, 255)]
-    for color in colors:
-        set_all_pixels(color)
-        time.sleep(0.1)
-    set_all_pixels((0, 0, 0))
-
-def win_animation():
-    for _ in range(5):
-        set_all_pixels((0, 255, 0))
-        time.sleep(0.1)
-        set_all_pixels((0, 0, 0))
-        time.sleep(0.1)
-
-def lose_animation():
-    for _ in range(3):
-        set_all_pixels((255, 0, 0))
-        time.sleep(0.2)
-        set_all_pixels((0, 0, 0))
-        time.sleep(0.2)
+# The LED task decides each frame's colour; the manager only writes the strip on a change
+leds = LEDManager(hw.pixels, count=hal.PIXEL_COUNT)
+led_color = (0, 0, 0)    # Colour requested by the game flow
+flash_color = (0, 0, 0)  # Short overlay colour, e.g. green when a shake counts
+flash_until = 0
 
-# ========== Difficulty Selection ==========
-def select_difficulty():
-    global current_difficulty
+def set_led(color):
+    """Request a colour; the LED task writes it out"""
+    global led_color
+    led_color = color
+
+def flash_led(color, duration):
+    """Show color for duration seconds on top of the current colour, without blocking"""
+    global flash_color, flash_until
+    flash_color = color
+    flash_until = monotonic() + duration
+
+# ========== Animations ==========
+# Animations are keyframe data played by the animation task; the game flow only
+# waits for them to finish, so sampling and input never stop
+RAINBOW_PULSE = (
+    Keyframe(0.1, color=(255, 0, 0)),
+    Keyframe(0.1, color=(255, 127, 0)),
+    Keyframe(0.1, color=(0, 255, 0)),
+    Keyframe(0.1, color=(0, 0, 255)),
+    Keyframe(0, color=(0, 0, 0)),
+)
+WIN_BLINK = blink((0, 255, 0), 0.1, 0.1, 5)
+LOSE_BLINK = blink((255, 0, 0), 0.2, 0.2, 3)
+WIN_CELEBRATION = WIN_BLINK + RAINBOW_PULSE
+
+SPLASH = RAINBOW_PULSE + (Keyframe(0.3, screen=TITLE), Keyframe(0.2, screen=())) * 3 + (Keyframe(1, screen=TITLE),)
+
+def show_lines(lines):
+    """Screen keyframe: centred (text, y) lines on a cleared screen"""
+    clear_screen()
+    for text, y in lines:
+        show_centered(text, y)
+
+animator = Animator(set_led, show_lines)
+
+async def play(frames, *skip_buttons):
+    """Play an animation to the end; a press on any of skip_buttons jumps to its last frame"""
+    animator.start(frames, monotonic())
+    events.clear()
+    while animator.active:
+        while events.pop():
+            if events.kind == PRESS and events.source in skip_buttons:
+                animator.skip()
+        await asyncio.sleep(0.01)
+
+# ========== Input ==========
+# The input task polls the buttons and the encoder into one bounded event
+# queue; screens wait on events instead of polling pins themselves
+INPUT_QUEUE_SIZE = 16
+LONG_PRESS_MS = 800
+events = InputEvents(INPUT_QUEUE_SIZE, long_press_ms=LONG_PRESS_MS, clock=ticks_ms)
+encoder_btn = events.add_button(encoder_button)
+restart_btn = events.add_button(restart_button) if HAS_RESTART_BUTTON else None
+events.add_encoder()
+# Slot machine uses the restart button, or the encoder button if there is none
+slot_btn = restart_btn if HAS_RESTART_BUTTON else encoder_btn
+any_btn = (encoder_btn, restart_btn) if HAS_RESTART_BUTTON else (encoder_btn,)
+
+def next_press(*buttons):
+    """Pop queued events up to the first press of one of the buttons; returns it, or None"""
+    while events.pop():
+        if events.kind == PRESS and events.source in buttons:
+            return events.source
+    return None
+
+async def wait_for_click(*buttons):
+    """Wait for a press of one of the buttons made from now on; returns that button"""
+    events.clear()
+    while True:
+        button = next_press(*buttons)
+        if button is not None:
+            return button
+        await asyncio.sleep(0.01)
+
+# ========== Level State ==========
+class LevelState:
+    """State of the running shake level, shared by the sensor, detector, LED and display tasks"""
+    def __init__(self):
+        # Every attribute exists from the start, so a level adds none under its collection hold
+        self.active = False
+        self.hud = None
+        self.count_slot = None
+        self.time_slot = None
+        self.count_texts = ()
+        self.time_texts = ()
+        self.urgent_texts = ()
+        self.target_shakes = 0
+        self.duration = 0
+        self.start_time = 0.0
+        self.start_ticks = 0
+        self.end_time = 0.0
+        self.shown_count = -1
+        self.shown_secs = -1
+        self.shown_urgent = False
+    
+    def prepare(self, duration, target_shakes, hud, count_slot, time_slot):
+        """Build everything the level's tasks will show; runs before the collection hold"""
+        # Every HUD string the level can show is built now instead of being
+        # formatted in the display task
+        self.count_texts = [f"{n}/{target_shakes}" for n in range(2 * target_shakes + 1)]
+        self.time_texts = [f"Time: {s}s" for s in range(int(duration) + 1)]
+        self.urgent_texts = [f"TIME: {s}s !!!" for s in range(6)]
+        self.target_shakes = target_shakes
+        self.duration = duration
+        self.hud = hud
+        self.count_slot = count_slot
+        self.time_slot = time_slot
     
-    if USE_CUSTOM_ENCODER:
-        encoder.update()
-        last_position = encoder.position
-    elif USE_ROTARY:
-        last_position = encoder.position
+    def start(self):
+        """Start the clock and let the tasks run the level"""
+        self.start_time = monotonic()
+        self.start_ticks = ticks_ms()
+        self.end_time = self.start_time + self.duration
+        self.shown_count = -1
+        self.shown_secs = -1
+        self.shown_urgent = False
+        self.active = True
+
+level = LevelState()
+
+# ========== Sensor / Detection Tasks ==========
+def seed_filter():
+    """Take the level's baseline into the freshly configured detector"""
+    sample_queue.clear()
+    if DETECTION_BACKEND == "adxl345":
+        return  # The activity engine takes its own reference
+    if ACQUISITION_MODE == "fifo":
+        # Samples queued before the level started only seed the filter
+        for i in range(accel_fifo.read_block()):
+            seed_sample(accel_fifo.x[i], accel_fifo.y[i], accel_fifo.z[i])
+    else:
+        accelerometer.read()
+        seed_sample(accelerometer.x, accelerometer.y, accelerometer.z)
+
+def seed_sample(x, y, z):
+    detector.seed(x, y, z)
+    if recorder:
+        recorder.seed(x, y, z)
+
+def read_sample():
+    accelerometer.read()
+
+def sensor_step():
+    if not level.active:
+        return
+    now = ticks_ms()
+    if spans:
+        t = spans.begin()
+    if DETECTION_BACKEND == "adxl345":
+        # With INT1 low there is nothing latched, and the poll never touches the bus
+        if detector.pending():
+            source = bus.sensor(read_activity)
+        else:
+            source = 0
+            bus.skip()
+        if spans:
+            spans.end(SPAN_SENSOR, t)
+        if detector.update(now, source):
+            flash_led((0, 255, 0), 0.1)  # Green flash indicates count
+    elif ACQUISITION_MODE == "fifo":
+        # Samples are evenly spaced; the newest one was taken just now
+        count = bus.sensor(read_fifo_block)
+        if spans:
+            spans.end(SPAN_SENSOR, t)
+        for i in range(count):
+            sample_queue.push(ticks_add(now, -((count - 1 - i) * 1000 // FIFO_RATE_HZ)),
+                              accel_fifo.x[i], accel_fifo.y[i], accel_fifo.z[i])
     else:
-        last_position = 0
+        bus.sensor(read_sample)
+        if spans:
+            spans.end(SPAN_SENSOR, t)
+        sample_queue.push(now, accelerometer.x, accelerometer.y, accelerometer.z)
+    # A display frame that found no gap before a read is drawn in this one
+    bus.after_read()
+
+def detect_block(t, x, y, z, start, count):
+    """Queued samples start..start+count-1 through the recorder and the detector"""
+    if recorder:
+        for i in range(start, start + count):
+            recorder.add(t[i], x[i], y[i], z[i])
+    if spans:
+        t0 = spans.begin()
+    if detector.update_block(t, x, y, z, start, count):
+        flash_led((0, 255, 0), 0.1)  # Green flash indicates count
+    if spans:
+        spans.end(SPAN_DETECT, t0)
+
+def detect_step():
+    if level.active:
+        sample_queue.drain_block(detect_block)
+
+def recorder_step():
+    if recorder:
+        recorder.service()
+
+def render_step():
+    if renderer.due():
+        bus.display(render_frame)
+
+def animation_step():
+    animator.tick(monotonic())
+
+def spans_step():
+    if spans:
+        spans.report()
+
+# ========== Display / LED / Input Tasks ==========
+def display_step():
+    if not level.active:
+        return
+    if spans:
+        t = spans.begin()
+    hud = level.hud
+    
+    # Only touch a slot when the shown value changes
+    count = detector.count
+    if count != level.shown_count:
+        if count < len(level.count_texts):
+            text = level.count_texts[count]
+        else:
+            text = f"{count}/{level.target_shakes}"
+        if hud.set_text(level.count_slot, text):
+            renderer.invalidate()
+        level.shown_count = count
+    
+    remaining = max(0, level.end_time - monotonic())
+    secs = int(remaining)
+    urgent = remaining <= 5
+    if secs != level.shown_secs or urgent != level.shown_urgent:
+        if urgent:
+            changed = hud.set_text(level.time_slot, level.urgent_texts[secs])
+        else:
+            changed = hud.set_text(level.time_slot, level.time_texts[secs])
+        if changed:
+            renderer.invalidate()
+        level.shown_secs = secs
+        level.shown_urgent = urgent
+    if spans:
+        spans.end(SPAN_HUD, t)
+
+def led_step():
+    if monotonic() < flash_until:
+        leds.fill(flash_color)
+    elif level.active:
+        if detector.is_moving:
+            leds.fill((255, 255, 0))  # Yellow - shaking
+        else:
+            leds.fill((0, 0, 255))  # Blue - waiting for shake
+    else:
+        leds.fill(led_color)
+    if spans:
+        t = spans.begin()
+    leds.flush()
+    if spans:
+        spans.end(SPAN_LED, t)
+
+def encoder_step():
+    encoder.update()
+
+def input_step():
+    events.poll(ticks_ms())
+
+# Added to TASKS and started by boot_parts() only for an encoder driver that
+# must be polled; rotaryio and the simulator's encoder count on their own
+encoder_task = PeriodicTask("encoder", ENCODER_RATE_HZ, encoder_step, clock=hw.monotonic_ns)
+TASKS = [
+    PeriodicTask("sensor", SENSOR_RATE_HZ, sensor_step, clock=hw.monotonic_ns),
+    PeriodicTask("detect", DETECT_RATE_HZ, detect_step, clock=hw.monotonic_ns),
+    PeriodicTask("display", DISPLAY_RATE_HZ, display_step, clock=hw.monotonic_ns),
+    PeriodicTask("led", LED_RATE_HZ, led_step, clock=hw.monotonic_ns),
+    PeriodicTask("input", INPUT_RATE_HZ, input_step, clock=hw.monotonic_ns),
+    PeriodicTask("render", RENDER_RATE_HZ, render_step, clock=hw.monotonic_ns),
+    PeriodicTask("animation", ANIMATION_RATE_HZ, animation_step, clock=hw.monotonic_ns),
+    PeriodicTask("recorder", RECORDER_RATE_HZ, recorder_step, clock=hw.monotonic_ns),
+    PeriodicTask("spans", SPAN_REPORT_HZ, spans_step, clock=hw.monotonic_ns),
+    PeriodicTask("memory", MEMORY_RATE_HZ, memory.sample, clock=hw.monotonic_ns),
+]
+
+# ========== Difficulty Selection ==========
+async def select_difficulty():
+    global current_difficulty
+    memory.enter("menu")
     
     # Initial display
     last_displayed_difficulty = -1
+    events.clear()
+    started = False
     
     while True:
-        if USE_CUSTOM_ENCODER:
-            encoder.update()
-        elif not USE_ROTARY:
-            encoder.update()
-        
-        current_position = encoder.position
-        
-        if current_position != last_position:
-            diff = current_position - last_position
-            print(f"Encoder: pos={current_position}, diff={diff}, difficulty={current_difficulty}")
+        while events.pop():
+            if events.kind == PRESS and events.source == encoder_btn:
+                started = True
+                break
+            if events.kind != ROTATE:
+                continue
+            diff = events.value
+            if hw.encoder_kind == "custom":
+                print(f"Encoder: pos={encoder.position}, diff={diff}, difficulty={current_difficulty}, "
+                      f"speed={encoder.velocity:.1f}/s, skipped={encoder.skipped}")
+            else:
+                print(f"Encoder: pos={encoder.position}, diff={diff}, difficulty={current_difficulty}")
             
             # Only accept positive direction (clockwise) rotation
             if diff > 0:
                 current_difficulty = (current_difficulty + 1) % len(DIFFICULTY_LEVELS)
             # Ignore negative direction (counter-clockwise)
-            
-            last_position = current_position
         
         # Only update display when difficulty actually changes
         if current_difficulty != last_displayed_difficulty:
+            if spans:
+                t = spans.begin()
             clear_screen()
             show_centered("SELECT DIFFICULTY", 10)
             
@@ -227,132 +535,141 @@ def select_difficulty():
             
             # First display all text (without brackets)
             for i, (diff_text, x) in enumerate(zip(difficulties, x_positions)):
-                text_area = label.Label(terminalio.FONT, text=diff_text, color=0xFFFFFF, x=x, y=y)
+                text_area = text_label(diff_text, x, y)
                 main_group.append(text_area)
             
             # Then draw brackets around selected option
             selected_x = x_positions[current_difficulty]
-            bracket_left = label.Label(terminalio.FONT, text="[", color=0xFFFFFF, x=selected_x-6, y=y)
-            bracket_right = label.Label(terminalio.FONT, text="]", color=0xFFFFFF, x=selected_x+len(difficulties[current_difficulty])*6, y=y)
+            bracket_left = text_label("[", selected_x-6, y)
+            bracket_right = text_label("]", selected_x+len(difficulties[current_difficulty])*6, y)
             main_group.append(bracket_left)
             main_group.append(bracket_right)
             
             show_centered("PRESS START", 50)
+            if spans:
+                spans.end(SPAN_MENU, t)
             
             last_displayed_difficulty = current_difficulty
         
-        # Check button
-        if not encoder_button.value:
-            time.sleep(0.05)
-            if not encoder_button.value:
-                while not encoder_button.value:
-                    time.sleep(0.01)
-                break
+        if started:
+            break
         
-        time.sleep(0.01)  # Faster update rate: 10ms instead of 50ms
+        await asyncio.sleep(0.01)
     
-    set_all_pixels((0, 255, 0))
-    time.sleep(0.3)
-    set_all_pixels((0, 0, 0))
+    set_led((0, 255, 0))
+    await asyncio.sleep(0.3)
+    set_led((0, 0, 0))
     
     return DIFFICULTY_LEVELS[current_difficulty]
 
 # ========== Shake Detection ==========
-def detect_shake(action, duration, threshold, target_shakes, tolerance):
+async def detect_shake(action, duration, threshold, target_shakes, tolerance):
     """
     New game logic: shake specified number of times within time limit
     target_shakes: target count
     tolerance: error tolerance (±tolerance counts as pass)
+    Sampling, detection, LEDs and the HUD run in their own tasks while this waits.
     """
-    start_time = time.monotonic()
-    shake_count = 0
-    is_shaking = False
-    last_shake_time = 0
-    shake_cooldown = 0.3  # At least 0.3s between shakes
-    
-    base_x, base_y, base_z = accelerometer.acceleration
-    accel_filter.update(base_x, base_y, base_z)
-    
     min_shakes = target_shakes - tolerance
     max_shakes = target_shakes + tolerance
     
-    while True:
-        current_time = time.monotonic()
-        elapsed = current_time - start_time
-        remaining = duration - elapsed
-        
-        # Read acceleration
-        x, y, z = accelerometer.acceleration
-        accel_filter.update(x, y, z)
-        avg_x, avg_y, avg_z = accel_filter.get_average()
-        
-        delta_x = abs(x - avg_x)
-        delta_y = abs(y - avg_y)
-        delta_z = abs(z - avg_z)
-        
-        # Detect if shaking
-        is_moving = False
-        if "LEFT-RIGHT" in action:
-            is_moving = delta_x > threshold
-        elif "FWD-BACK" in action:
-            is_moving = delta_y > threshold
-        elif "UP-DOWN" in action:
-            is_moving = delta_z > threshold
-        elif "ANY" in action or "FAST" in action:
-            is_moving = delta_x > threshold or delta_y > threshold or delta_z > threshold
-        elif "RANDOM" in action:
-            is_moving = delta_x > threshold or delta_y > threshold
-        
-        # Count logic: from still to moving counts as one
-        if is_moving and not is_shaking:
-            # Check cooldown time
-            if current_time - last_shake_time > shake_cooldown:
-                shake_count += 1
-                last_shake_time = current_time
-                is_shaking = True
-                set_all_pixels((0, 255, 0))  # Green flash indicates count
-                time.sleep(0.1)
-        elif not is_moving:
-            is_shaking = False
-        
-        # LED indication
-        if is_moving:
-            set_all_pixels((255, 255, 0))  # Yellow - shaking
-        else:
-            set_all_pixels((0, 0, 255))  # Blue - waiting for shake
-        
-        # Update display
-        clear_screen()
-        
-        # Top: level info
-        show_centered("=" * 21, 0)
-        show_centered(f"LEVEL {current_level + 1}/10", 10)
-        show_centered("=" * 21, 18)
-        
-        # Middle: action and progress
-        show_centered(action, 28)
-        show_centered(f"{shake_count}/{target_shakes}", 40)
-        
-        # Bottom: time
-        if remaining <= 5:
-            show_centered(f"TIME: {int(remaining)}s !!!", 54)
-        else:
-            show_centered(f"Time: {int(remaining)}s", 54)
-        
-        # Check if time is up
-        if elapsed >= duration:
-            set_all_pixels((0, 0, 0))
-            
-            # Judge success: shake count within range
-            if min_shakes <= shake_count <= max_shakes:
-                return True, shake_count
-            else:
-                return False, shake_count
-        
-        time.sleep(0.01)
+    # HUD is built once per level; the display task only rewrites the slots that change
+    text_cache.new_screen()
+    hud = HUD(main_group, hw)
+    hud.add_slot(0, "=" * 21)
+    hud.add_slot(10, f"LEVEL {current_level + 1}/10")
+    hud.add_slot(18, "=" * 21)
+    hud.add_slot(28, action)
+    count_slot = hud.add_slot(40, f"0/{target_shakes}")
+    time_slot = hud.add_slot(54)
+    hud.show()
+    renderer.invalidate()
+    renderer.fps = RENDER_FPS_HUD
+    threshold = calibration.threshold(action_mask(action), threshold, FILTER_WINDOW)
+    level.prepare(duration, target_shakes, hud, count_slot, time_slot)
+    detector.configure(action, threshold * COUNTS_PER_MS2)
+    # Put the level screen up before sampling starts: a whole-screen frame is
+    # longer than the gap between two reads and would push one late
+    while renderer.dirty:
+        await asyncio.sleep(1 / RENDER_RATE_HZ)
+    
+    # Everything above allocates with the collector on; the "level" phase and
+    # its collection hold cover only the running level
+    memory.enter("level", hold_gc=True)
+    for task in TASKS:
+        task.reset_stats()
+    leds.reset_stats()
+    renderer.reset_stats()
+    bus.reset_stats()
+    level.start()
+    if recorder:
+        recorder.begin(current_level + 1, current_difficulty, action, threshold, duration,
+                       detector.cooldown_ms / 1000, target_shakes, tolerance, detector.filter.window_size,
+                       level.start_ticks)
+    seed_filter()
+    
+    await asyncio.sleep(duration)
+    
+    level.active = False
+    bus.idle()
+    sample_queue.drain_block(detect_block)  # Count samples taken right up to the deadline
+    if DETECTION_BACKEND == "adxl345":
+        detector.poll(ticks_ms())
+    shake_count = detector.count
+    memory.enter("result")
+    if recorder:
+        recorder.end(shake_count)
+    set_led((0, 0, 0))
+    print_stats(TASKS)
+    print(f"leds: {leds.frames} frames, {leds.shows} shows, {leds.pixel_writes} pixel writes")
+    print(f"render: {renderer.frames} frames at {renderer.fps} fps, "
+          f"{renderer.late} late, {renderer.dropped} dropped")
+    renderer.fps = RENDER_FPS_MENU
+    bus.report()
+    text_cache.report()
+    if sample_queue.dropped:
+        print(f"detect_shake: {sample_queue.dropped} samples dropped")
+        sample_queue.dropped = 0
+    
+    # Judge success: shake count within range
+    if min_shakes <= shake_count <= max_shakes:
+        return True, shake_count
+    else:
+        return False, shake_count
 
 # ========== Slot Machine ==========
-def play_slot_machine():
+def slot_screen():
+    """HUD for the spinning reels; returns it and the reel line's slot"""
+    hud = HUD(main_group, hw)
+    hud.add_slot(5, "SLOT MACHINE!")
+    reel_slot = hud.add_slot(30)
+    hud.add_slot(55, "Press to STOP")
+    return hud, reel_slot
+
+def reel_lines(reels, current_reel):
+    """
+    The reel line for each symbol the spinning reel can show, built when a
+    reel stops so a spinning frame only picks one; [] marks the spinning reel
+    """
+    lines = []
+    for symbol in SLOT_SYMBOLS:
+        parts = []
+        for i in range(3):
+            if reels[i] is not None:
+                parts.append(f" {reels[i]} ")  # Stopped reel
+            elif i == current_reel:
+                parts.append(f"[{symbol}]")  # Current spinning reel
+            else:
+                parts.append(f" {SLOT_SYMBOLS[0]} ")  # Not spun yet
+        lines.append("".join(parts))
+    return lines
+
+def draw_reels(hud, reel_slot, line):
+    """Show one spinning frame of the slot machine"""
+    if hud.set_text(reel_slot, line):
+        renderer.invalidate()
+
+async def play_slot_machine():
     """
     Slot machine game:
     1. Press restart button to start spinning
@@ -360,78 +677,58 @@ def play_slot_machine():
     3. Press restart button again to stop current reel
     4. After all 3 reels stop, judge result
     """
+    memory.enter("slot")
     clear_screen()
     show_centered("SLOT MACHINE!", 10)
     show_centered("Press RESTART", 30)
     show_centered("to START", 45)
     
     # Wait for button to start
-    while True:
-        if not restart_button.value:
-            time.sleep(0.05)
-            if not restart_button.value:
-                while not restart_button.value:
-                    time.sleep(0.01)
-                break
-        time.sleep(0.1)
+    await wait_for_click(slot_btn)
     
     # State of 3 reels
     reels = [None, None, None]  # Final result
     current_reel = 0  # Current spinning reel
-    reel_symbols = [SLOT_SYMBOLS[0], SLOT_SYMBOLS[0], SLOT_SYMBOLS[0]]  # Current displayed symbols
+    lines = reel_lines(reels, current_reel)
     
     # Spinning animation
-    spinning = True
     animation_counter = 0
+    events.clear()
     
     clear_screen()
-    show_centered("SLOT MACHINE!", 5)
-    show_centered("Press to STOP", 55)
+    hud, reel_slot = slot_screen()
+    hud.show()
+    renderer.fps = RENDER_FPS_SLOT
     
     while current_reel < 3:
         # Update current reel symbol (spinning effect)
-        if reels[current_reel] is None:  # Still spinning
-            reel_symbols[current_reel] = SLOT_SYMBOLS[animation_counter % len(SLOT_SYMBOLS)]
-            animation_counter += 1
+        shown = animation_counter % len(SLOT_SYMBOLS)
+        animation_counter += 1
         
         # Display 3 reels
-        clear_screen()
-        show_centered("SLOT MACHINE!", 5)
+        if spans:
+            t = spans.begin()
+        draw_reels(hud, reel_slot, lines[shown])
+        if spans:
+            spans.end(SPAN_SLOT, t)
         
-        # Display symbols, mark unstopped reels with []
-        display_parts = []
-        for i in range(3):
-            if reels[i] is None and i == current_reel:
-                display_parts.append(f"[{reel_symbols[i]}]")  # Current spinning reel
-            else:
-                display_parts.append(f" {reel_symbols[i]} ")  # Stopped reel
-        
-        result = "".join(display_parts)
-        show_centered(result, 30)
-        show_centered("Press to STOP", 55)
-        
-        # Detect button to stop current reel
-        if not restart_button.value:
-            time.sleep(0.05)
-            if not restart_button.value:
-                while not restart_button.value:
-                    time.sleep(0.01)
-                
-                # Stop current reel
-                reels[current_reel] = reel_symbols[current_reel]
-                
-                # LED flash indicates stop
-                set_all_pixels((0, 255, 0))
-                time.sleep(0.1)
-                set_all_pixels((0, 0, 0))
-                
-                current_reel += 1
-                animation_counter = 0
+        # Detect button to stop current reel; one reel per frame, later presses stay queued
+        if next_press(slot_btn) is not None:
+            # Stop current reel
+            reels[current_reel] = SLOT_SYMBOLS[shown]
+            
+            # LED flash indicates stop
+            flash_led((0, 255, 0), 0.1)
+            
+            current_reel += 1
+            animation_counter = 0
+            lines = reel_lines(reels, current_reel)
         
-        time.sleep(0.05)  # Control spinning speed
+        await asyncio.sleep(0.05)  # Control spinning speed
     
     # All reels stopped, show final result
-    time.sleep(0.5)
+    renderer.fps = RENDER_FPS_MENU
+    await asyncio.sleep(0.5)
     clear_screen()
     show_centered("SLOT MACHINE!", 10)
     result = f" {reels[0]}   {reels[1]}   {reels[2]} "
@@ -440,150 +737,201 @@ def play_slot_machine():
     # Judge if win
     if reels[0] == reels[1] == reels[2]:
         show_centered("JACKPOT!!!", 50)
-        win_animation()
-        rainbow_pulse()
-        time.sleep(2)
+        await play(WIN_CELEBRATION)
+        await asyncio.sleep(2)
         return True
     elif reels[0] == reels[1] or reels[1] == reels[2] or reels[0] == reels[2]:
         show_centered("2 Match!", 50)
-        set_all_pixels((255, 165, 0))  # Orange
-        time.sleep(1)
-        set_all_pixels((0, 0, 0))
-        time.sleep(1)
+        set_led((255, 165, 0))  # Orange
+        await asyncio.sleep(1)
+        set_led((0, 0, 0))
+        await asyncio.sleep(1)
         return False
     else:
         show_centered("No Match", 50)
-        lose_animation()
-        time.sleep(2)
+        await play(LOSE_BLINK)
+        await asyncio.sleep(2)
         return False
 
-# ========== Game Main Loop ==========
-def game_loop():
-    global current_level, score
+# ========== Game Flow ==========
+# The game is a table-driven state machine: each state's tick runs one visit
+# and returns an event, and TRANSITIONS picks the next state. Everything runs
+# in StateMachine.run()'s loop, so replaying never nests another game on the stack.
+BONUS_LEVELS = (3, 6)  # A passed level here is followed by a bonus slot round
+FINAL_LEVEL = 10       # Three slot rounds decide the game
+
+difficulty_mult = 1.0
+tolerance_mult = 1.0
+game_won = False
+
+async def splash_state():
+    await splash_screen()
+    return "done"
+
+async def select_state():
+    global current_level, score, difficulty_mult, tolerance_mult
     
-    difficulty = select_difficulty()
+    await boot_done.wait()  # A skipped splash can get here before the encoder is up
+    if not boot.reported:
+        boot.mark("input")
+        boot.report()
+    difficulty = await select_difficulty()
     difficulty_mult = difficulty_multipliers[difficulty]
     tolerance_mult = tolerance_multipliers[difficulty]  # Tolerance multiplier
     
-    rainbow_pulse()
+    await play(RAINBOW_PULSE)
     clear_screen()
     show_centered("=" * 21, 5)
     show_centered("SHAKE GAME", 18)
     show_centered("=" * 21, 28)
     show_centered("Hit the target", 38)
     show_centered("number!", 48)
-    time.sleep(2.5)
+    await asyncio.sleep(2.5)
     
     current_level = 0
     score = 0
+    return "start"
+
+def next_level():
+    """Move past the current level; "next" while levels remain, else the game is won"""
+    global current_level, game_won
+    current_level += 1
+    if current_level < len(LEVELS):
+        return "next"
+    game_won = True
+    return "cleared"
+
+async def level_state():
+    global score, game_won
+    level_data = LEVELS[current_level]
+    if level_data["level"] == FINAL_LEVEL:
+        return "bonus"
     
-    while current_level < len(LEVELS):
-        level_data = LEVELS[current_level]
-        
-        # Special handling: slot machine for levels 3, 6, 10
-        if level_data["level"] in [3, 6, 10]:
-            # First complete current level
-            if level_data["level"] != 10:
-                action = level_data["action"]
-                time_limit = level_data["time"] * difficulty_mult
-                threshold = level_data["threshold"]
-                target_shakes = level_data["target_shakes"]
-                tolerance = int(level_data["tolerance"] * tolerance_mult)  # Apply difficulty multiplier
-                
-                success, shake_count = detect_shake(action, time_limit, threshold, target_shakes, tolerance)
-                
-                if not success:
-                    game_over()
-                    return
-                
-                score += 100
-            
-            # Enter slot machine phase
-            if level_data["level"] == 10:
-                # Level 10: 3 rounds of slot machine
-                wins = 0
-                for i in range(3):
-                    clear_screen()
-                    show_centered("*" * 21, 10)
-                    show_centered(f"ROUND {i+1}/3", 25)
-                    show_centered("*" * 21, 38)
-                    time.sleep(1)
-                    
-                    if play_slot_machine():
-                        wins += 1
-                        score += 500
-                
-                if wins >= 2:  # Win at least 2 rounds
-                    game_win()
-                    return
-                else:
-                    game_over()
-                    return
-            else:
-                # Single round slot machine (Level 3 or Level 6)
-                clear_screen()
-                show_centered("~" * 21, 10)
-                show_centered("BONUS ROUND", 25)
-                show_centered("~" * 21, 38)
-                time.sleep(1)
-                
-                slot_win = play_slot_machine()
-                
-                if slot_win:
-                    score += 200
-                    
-                    # Skip level reward!
-                    if level_data["level"] == 3:
-                        # Level 3 slot machine win -> skip to Level 6
-                        clear_screen()
-                        show_centered("+" * 21, 5)
-                        show_centered("BONUS!", 18)
-                        show_centered("SKIP TO LV6", 32)
-                        show_centered("+" * 21, 42)
-                        rainbow_pulse()
-                        time.sleep(2)
-                        current_level = 5  # Jump to Level 6 (index 5)
-                    elif level_data["level"] == 6:
-                        # Level 6 slot machine win -> skip to Level 10
-                        clear_screen()
-                        show_centered("*" * 21, 5)
-                        show_centered("MEGA BONUS!", 18)
-                        show_centered("SKIP TO LV10", 32)
-                        show_centered("*" * 21, 42)
-                        rainbow_pulse()
-                        time.sleep(2)
-                        current_level = 9  # Jump to Level 10 (index 9)
-        else:
-            # Normal level
-            action = level_data["action"]
-            time_limit = level_data["time"] * difficulty_mult
-            threshold = level_data["threshold"]
-            target_shakes = level_data["target_shakes"]
-            tolerance = int(level_data["tolerance"] * tolerance_mult)  # Apply difficulty multiplier
-            
-            success, shake_count = detect_shake(action, time_limit, threshold, target_shakes, tolerance)
+    action = level_data["action"]
+    time_limit = level_data["time"] * difficulty_mult
+    threshold = level_data["threshold"]
+    target_shakes = level_data["target_shakes"]
+    tolerance = int(level_data["tolerance"] * tolerance_mult)  # Apply difficulty multiplier
+    
+    success, shake_count = await detect_shake(action, time_limit, threshold, target_shakes, tolerance)
+    
+    if not success:
+        game_won = False
+        return "failed"
+    
+    score += 100
+    if level_data["level"] in BONUS_LEVELS:
+        return "bonus"
+    
+    clear_screen()
+    show_centered("*" * 21, 5)
+    show_centered("SUCCESS!", 20)
+    show_centered("*" * 21, 30)
+    show_centered(f"Got: {shake_count}", 42)
+    show_centered(f"Score: {score}", 54)
+    await play(WIN_BLINK)
+    await asyncio.sleep(1.5)
+    return next_level()
+
+async def bonus_state():
+    global current_level, score, game_won
+    level_data = LEVELS[current_level]
+    
+    if level_data["level"] == FINAL_LEVEL:
+        # Level 10: 3 rounds of slot machine
+        wins = 0
+        for i in range(3):
+            clear_screen()
+            show_centered("*" * 21, 10)
+            show_centered(f"ROUND {i+1}/3", 25)
+            show_centered("*" * 21, 38)
+            await asyncio.sleep(1)
             
-            if success:
-                score += 100
-                clear_screen()
-                show_centered("*" * 21, 5)
-                show_centered("SUCCESS!", 20)
-                show_centered("*" * 21, 30)
-                show_centered(f"Got: {shake_count}", 42)
-                show_centered(f"Score: {score}", 54)
-                win_animation()
-                time.sleep(1.5)
-            else:
-                game_over()
-                return
+            if await play_slot_machine():
+                wins += 1
+                score += 500
         
-        current_level += 1
+        game_won = wins >= 2  # Win at least 2 rounds
+        return "finished"
     
-    game_win()
+    # Single round slot machine (Level 3 or Level 6)
+    clear_screen()
+    show_centered("~" * 21, 10)
+    show_centered("BONUS ROUND", 25)
+    show_centered("~" * 21, 38)
+    await asyncio.sleep(1)
+    
+    if await play_slot_machine():
+        score += 200
+        
+        # Skip level reward!
+        if level_data["level"] == 3:
+            # Level 3 slot machine win -> skip to Level 6
+            clear_screen()
+            show_centered("+" * 21, 5)
+            show_centered("BONUS!", 18)
+            show_centered("SKIP TO LV6", 32)
+            show_centered("+" * 21, 42)
+            await play(RAINBOW_PULSE)
+            await asyncio.sleep(2)
+            current_level = 5  # Jump to Level 6 (index 5)
+        elif level_data["level"] == 6:
+            # Level 6 slot machine win -> skip to Level 10
+            clear_screen()
+            show_centered("*" * 21, 5)
+            show_centered("MEGA BONUS!", 18)
+            show_centered("SKIP TO LV10", 32)
+            show_centered("*" * 21, 42)
+            await play(RAINBOW_PULSE)
+            await asyncio.sleep(2)
+            current_level = 9  # Jump to Level 10 (index 9)
+    return next_level()
+
+async def result_state():
+    if game_won:
+        await game_win()
+    else:
+        await game_over()
+    return "done"
+
+async def restart_state():
+    set_led((0, 0, 0))
+    clear_screen()
+    show_centered("RESTARTING...", 30)
+    await asyncio.sleep(1)
+    return "done"
+
+GAME_STATES = {
+    "splash": splash_state,
+    "select": select_state,
+    "level": level_state,
+    "bonus": bonus_state,
+    "result": result_state,
+    "restart": restart_state,
+}
+
+TRANSITIONS = {
+    ("splash", "done"): "select",
+    ("select", "start"): "level",
+    ("level", "next"): "level",
+    ("level", "bonus"): "bonus",
+    ("level", "failed"): "result",
+    ("level", "cleared"): "result",
+    ("bonus", "next"): "level",
+    ("bonus", "cleared"): "result",
+    ("bonus", "finished"): "result",
+    ("result", "done"): "restart",
+    ("restart", "done"): "select",
+}
+
+game_flow = StateMachine(GAME_STATES, TRANSITIONS, "splash")
 
 # ========== Game Over ==========
-def game_over():
-    lose_animation()
+async def game_over():
+    memory.enter("result")
+    memory.report()
+    events.report()
+    await play(LOSE_BLINK, *any_btn)
     clear_screen()
     
     # Top divider
@@ -597,32 +945,18 @@ def game_over():
     # Bottom prompt
     show_centered("Press Button", 54)
     
-    time.sleep(0.5)
-    while True:
-        # Check encoder button
-        if not encoder_button.value:
-            time.sleep(0.05)
-            if not encoder_button.value:
-                while not encoder_button.value:
-                    time.sleep(0.01)
-                restart_game()
-                return
-        
-        # If has restart button, also check it
-        if HAS_RESTART_BUTTON:
-            if not restart_button.value:
-                time.sleep(0.05)
-                if not restart_button.value:
-                    while not restart_button.value:
-                        time.sleep(0.01)
-                    restart_game()
-                    return
-        
-        time.sleep(0.1)
+    await asyncio.sleep(0.5)
+    # Either button restarts
+    if HAS_RESTART_BUTTON:
+        await wait_for_click(encoder_btn, restart_btn)
+    else:
+        await wait_for_click(encoder_btn)
 
-def game_win():
-    win_animation()
-    rainbow_pulse()
+async def game_win():
+    memory.enter("result")
+    memory.report()
+    events.report()
+    await play(WIN_CELEBRATION, *any_btn)
     
     clear_screen()
     
@@ -637,58 +971,95 @@ def game_win():
     # Bottom prompt
     show_centered("Press Button", 54)
     
-    time.sleep(0.5)
-    while True:
-        # Check encoder button
-        if not encoder_button.value:
-            time.sleep(0.05)
-            if not encoder_button.value:
-                while not encoder_button.value:
-                    time.sleep(0.01)
-                restart_game()
-                return
-        
-        # If has restart button, also check it
-        if HAS_RESTART_BUTTON:
-            if not restart_button.value:
-                time.sleep(0.05)
-                if not restart_button.value:
-                    while not restart_button.value:
-                        time.sleep(0.01)
-                    restart_game()
-                    return
-        
-        time.sleep(0.1)
-
-def restart_game():
-    set_all_pixels((0, 0, 0))
-    clear_screen()
-    show_centered("RESTARTING...", 30)
-    time.sleep(1)
-    game_loop()
+    await asyncio.sleep(0.5)
+    # Either button restarts
+    if HAS_RESTART_BUTTON:
+        await wait_for_click(encoder_btn, restart_btn)
+    else:
+        await wait_for_click(encoder_btn)
 
 # ========== Splash Screen ==========
-def splash_screen():
-    """Boot animation"""
-    rainbow_pulse()
-    
-    for _ in range(3):
-        clear_screen()
-        show_centered("SHAKE", 20)
-        show_centered("MASTER", 35)
-        time.sleep(0.3)
-        clear_screen()
-        time.sleep(0.2)
-    
-    clear_screen()
-    show_centered("SHAKE", 20)
-    show_centered("MASTER", 35)
-    time.sleep(1)
+async def splash_screen():
+    """Boot animation; any button skips it"""
+    await play(SPLASH, *any_btn)
+
+# ========== Boot ==========
+boot_done = asyncio.Event()
+
+def bind_parts():
+    """Pick up the parts the boot steps have brought up so far"""
+    global accelerometer, encoder
+    accelerometer = hw.accelerometer
+    if hw.encoder is not None and encoder is None:
+        events.set_encoder(hw.encoder)
+    encoder = hw.encoder
+    if hw.pixels is not None and leds._pixels is None:
+        leds.attach(hw.pixels)
+
+async def boot_parts():
+    """Bring up the deferred hardware one part per turn of the event loop; the title is already up"""
+    for name, init in hw.boot_steps():
+        await asyncio.sleep(0)  # Let the splash animate between parts
+        init()
+        bind_parts()
+        boot.mark(name)
+    if hw.encoder_polled:
+        TASKS.append(encoder_task)
+        asyncio.create_task(encoder_task.run())
+    boot_done.set()
+
+def report_calibration(how):
+    noise = "/".join(f"{std * MS2_PER_COUNT:.3f}" for std in calibration.std)
+    gravity = "/".join(f"{mean * MS2_PER_COUNT:.2f}" for mean in calibration.mean)
+    print(f"calibration {how}: {calibration.samples} samples, noise x/y/z {noise} m/s^2, "
+          f"gravity {gravity} m/s^2, threshold floor {calibration.floor(AXIS_ALL, FILTER_WINDOW):.2f} m/s^2")
+
+async def calibrate():
+    """Load this unit's noise calibration, or sample the unit at rest before the first level and save it"""
+    if not RECALIBRATE and calibration.load():
+        report_calibration("loaded")
+        return
+    await boot_done.wait()  # The accelerometer comes up during the splash
+    calibration.reset()
+    while calibration.samples < CALIBRATION_SAMPLES:
+        if level.active:
+            print("calibration: a level started first; sampling again next boot")
+            return
+        if ACQUISITION_MODE == "fifo":
+            for i in range(bus.sensor(read_fifo_block)):
+                calibration.add(accel_fifo.x[i], accel_fifo.y[i], accel_fifo.z[i])
+        else:
+            bus.sensor(read_sample)
+            calibration.add(accelerometer.x, accelerometer.y, accelerometer.z)
+        bus.after_read()
+        await asyncio.sleep(1 / CALIBRATION_RATE_HZ)
+    bus.idle()
+    if not calibration.finish(max_noise=CALIBRATION_MAX_NOISE * COUNTS_PER_MS2):
+        print("calibration: the unit moved while it was sampled; sampling again next boot")
+        return
+    report_calibration("measured" if calibration.save() else "measured (no NVM, not kept)")
+
+def finish_boot():
+    """Bring up every deferred part now, for host tools that call steps without run()"""
+    for name, init in hw.boot_steps():
+        init()
+    bind_parts()
+    boot_done.set()
 
 # ========== Main Program ==========
+def start_tasks():
+    for task in TASKS:
+        asyncio.create_task(task.run())
+
+async def run():
+    start_tasks()
+    asyncio.create_task(boot_parts())
+    asyncio.create_task(calibrate())
+    memory.enter("menu")
+    await game_flow.run()
+
 def main():
-    splash_screen()
-    game_loop()
+    hw.run(run())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,68 @@
+from array import array
+
+
+class MovingAverageFilter:
+    """
+    MovingAverageFilter(window_size=5, *, scale=1000)
+    - Fixed-size ring buffer per axis plus running sums, so update() and
+      get_average() cost the same for a window of 5 or 128 samples.
+    - Samples are stored as integers (value * scale) so the running sums are
+      exact and never drift. With scale=1 integer samples (raw sensor counts)
+      go in as they are, with no float math.
+    - sum_x/sum_y/sum_z and count are public, so a caller can test deviation
+      as x * count - sum_x in integers instead of dividing for the average.
+    """
+
+    def __init__(self, window_size=5, *, scale=1000):
+        self.window_size = max(1, int(window_size))
+        self._scale = scale
+        # Preallocated once; update() never grows or shrinks these
+        self._x = array("l", [0] * self.window_size)
+        self._y = array("l", [0] * self.window_size)
+        self._z = array("l", [0] * self.window_size)
+        self.sum_x = 0
+        self.sum_y = 0
+        self.sum_z = 0
+        self._index = 0
+        self.count = 0
+
+    def update(self, x, y, z):
+        i = self._index
+        scale = self._scale
+        if scale != 1:
+            x = int(x * scale)
+            y = int(y * scale)
+            z = int(z * scale)
+
+        # Replace the oldest sample and keep the sums in step
+        self.sum_x += x - self._x[i]
+        self.sum_y += y - self._y[i]
+        self.sum_z += z - self._z[i]
+        self._x[i] = x
+        self._y[i] = y
+        self._z[i] = z
+
+        i += 1
+        if i == self.window_size:
+            i = 0
+        self._index = i
+        if self.count < self.window_size:
+            self.count += 1
+
+    def get_average(self):
+        n = self.count
+        if n == 0:
+            return (0, 0, 0)
+        d = n * self._scale
+        return (self.sum_x / d, self.sum_y / d, self.sum_z / d)
+
+    def reset(self):
+        for i in range(self.window_size):
+            self._x[i] = 0
+            self._y[i] = 0
+            self._z[i] = 0
+        self.sum_x = 0
+        self.sum_y = 0
+        self.sum_z = 0
+        self._index = 0
+        self.count = 0
@@ -0,0 +1,285 @@
+"""
+Hardware abstraction for Shake Master.
+
+code.py only talks to the Hardware object returned by get(): the display and its
+root group, text rendering, the accelerometer and its I2C bus, NeoPixels, the
+encoder and buttons, a clock, and run() to drive the asyncio game.
+
+On the device get() builds the CircuitPython backend from the real drivers. Host
+tools install another backend first with use(), e.g. tools/hal_sim.py, which runs
+the same game headless against simulated parts and a virtual clock.
+"""
+import gc
+import time
+import ticks
+
+# ========== Pin / Driver Configuration ==========
+# Shared I2C bus clock; both the SSD1306 and the ADXL345 run at 400 kHz
+I2C_FREQUENCY = 400_000
+OLED_ADDRESS = 0x3C
+DISPLAY_WIDTH = 128
+DISPLAY_HEIGHT = 64
+PIXEL_COUNT = 3
+PIXEL_BRIGHTNESS = 0.3
+
+# Rotary encoder sampling: "poll" samples the pins from the encoder task; "keypad"
+# scans them in the background and queues timestamped edges so fast spins don't drop steps
+ENCODER_SAMPLER = "poll"
+
+# ADXL345 INT1 wired to a GPIO (e.g. "D3"), or None when only INT_SOURCE is polled
+ACCEL_INT_PIN = None
+
+_hw = None
+
+
+class Hardware:
+    """
+    Everything the game needs from the board. Backends fill in:
+    - i2c: busio.I2C-compatible bus shared by the OLED and the ADXL345;
+      i2c_frequency is the clock (Hz) the backend opened it at
+    - display, main_group: display with root_group already set to main_group
+    - render_text(text): 1-bit bitmap of text in the terminal font (.width, .height)
+    - make_tile(bitmap, x, y): display object showing a rendered bitmap, left
+      edge at x and vertically centred on y
+    - make_text_slot(y): (tile, canvas) for one screen-wide line of text
+      vertically centred on y; draw_text(canvas, text, x) redraws it in place
+      with text's left edge at x, allocating nothing
+    - accelerometer: ADXL345Raw-like: read() leaves raw counts in .x/.y/.z,
+      .acceleration gives (x, y, z) in m/s^2
+    - accel_int: DigitalInOut-like on the ADXL345's INT1 (high while an
+      interrupt is latched), or None when it isn't wired
+    - pixels: NeoPixel-compatible strip with auto_write off
+    - encoder: object with .position; encoder_kind is "custom", "rotaryio" or "none"
+      and encoder_polled says whether encoder.update() must be called
+    - boot_steps(): (name, init) pairs for the parts that are still None; the
+      display and buttons are up when get() returns, the accelerometer,
+      encoder and pixels may be left for the game to bring up during the splash
+    - encoder_button, restart_button: DigitalInOut-like, pressed == False;
+      restart_button is None when not fitted
+    - monotonic(), monotonic_ns(): the clock every timestamp in the game uses;
+      ticks_ms() is the same clock as supervisor.ticks_ms() counts it, for
+      sample timestamps that must stay small ints
+    - mem_free(): free heap bytes, or None where the heap can't be measured
+    - nvm: bytearray-like non-volatile memory that survives a reset
+      (microcontroller.nvm), or None where nothing can be kept between boots
+    """
+
+    name = "base"
+    encoder_kind = "none"
+    encoder_polled = False
+    restart_button = None
+    accelerometer = None
+    accel_int = None
+    encoder = None
+    pixels = None
+    nvm = None
+    i2c_frequency = None
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def monotonic_ns(self):
+        return time.monotonic_ns()
+
+    def ticks_ms(self):
+        return ticks.ticks_ms()
+
+    def mem_free(self):
+        return None
+
+    def boot_steps(self):
+        return ()
+
+    def render_text(self, text):
+        raise NotImplementedError
+
+    def make_tile(self, bitmap, x, y):
+        raise NotImplementedError
+
+    def make_text_slot(self, y):
+        raise NotImplementedError
+
+    def draw_text(self, canvas, text, x):
+        raise NotImplementedError
+
+    def run(self, coro):
+        """Run the game coroutine to completion on this backend's event loop"""
+        import asyncio
+        return asyncio.run(coro)
+
+
+class CircuitPythonHardware(Hardware):
+    """
+    Real drivers on the ESP32-C3 SuperMini. The constructor only brings up
+    what the splash needs (I2C, the OLED, text rendering, the buttons);
+    the ADXL345 driver, neopixel and the encoder driver are imported by their
+    boot steps.
+    """
+
+    name = "circuitpython"
+
+    def __init__(self):
+        import board
+        import busio
+        import displayio
+        import bitmaptools
+        import terminalio
+        import i2cdisplaybus
+        import adafruit_displayio_ssd1306
+        from digitalio import DigitalInOut, Direction, Pull
+
+        self._displayio = displayio
+        self._bitmaptools = bitmaptools
+        self._font = terminalio.FONT
+        self._cell = self._font.get_bounding_box()[:2]
+        self._glyphs = {}  # char -> tile index in the font bitmap, None if missing
+        self._palette = displayio.Palette(2)
+        self._palette[0] = 0x000000
+        self._palette[1] = 0xFFFFFF
+        self._palette.make_transparent(0)
+
+        displayio.release_displays()
+
+        # I2C Bus (D4=SDA, D5=SCL)
+        self.i2c_frequency = I2C_FREQUENCY
+        self.i2c = busio.I2C(board.D5, board.D4, frequency=self.i2c_frequency)
+
+        # OLED Display
+        display_bus = i2cdisplaybus.I2CDisplayBus(self.i2c, device_address=OLED_ADDRESS)
+        self.display = adafruit_displayio_ssd1306.SSD1306(display_bus, width=DISPLAY_WIDTH, height=DISPLAY_HEIGHT)
+
+        # Create main display group
+        self.main_group = displayio.Group()
+        self.display.root_group = self.main_group
+
+        self.encoder_button = DigitalInOut(board.D2)
+        self.encoder_button.direction = Direction.INPUT
+        self.encoder_button.pull = Pull.UP
+
+        # Independent restart button (optional - if not connected, only encoder_button will work)
+        try:
+            restart_button = DigitalInOut(board.D6)  # Warning: if no push button, auto-disable
+            restart_button.direction = Direction.INPUT
+            restart_button.pull = Pull.UP
+            self.restart_button = restart_button
+        except Exception:
+            print("Warning: Restart button not found on D6")
+
+        if ACCEL_INT_PIN is not None:
+            accel_int = DigitalInOut(getattr(board, ACCEL_INT_PIN))
+            accel_int.direction = Direction.INPUT
+            self.accel_int = accel_int
+
+        import microcontroller
+        self.nvm = microcontroller.nvm  # None on ports built without NVM
+
+    def boot_steps(self):
+        steps = (("accelerometer", self._init_accelerometer),
+                 ("encoder", self._init_encoder),
+                 ("pixels", self._init_pixels))
+        return tuple(step for step in steps if getattr(self, step[0]) is None)
+
+    def _init_accelerometer(self):
+        from adxl345_raw import ADXL345Raw
+        self.accelerometer = ADXL345Raw(self.i2c)
+
+    def _init_encoder(self):
+        # Custom driver, then built-in rotaryio, then a fixed position
+        import board
+        from digitalio import Pull
+        try:
+            from rotary_encoder import RotaryEncoder
+            self.encoder = RotaryEncoder(board.D0, board.D1, pull=Pull.UP, pulses_per_detent=2, sampler=ENCODER_SAMPLER)
+            self.encoder_kind = "custom"
+            self.encoder_polled = True
+            print("Using custom RotaryEncoder")
+        except ImportError:
+            try:
+                import rotaryio
+                self.encoder = rotaryio.IncrementalEncoder(board.D0, board.D1)
+                self.encoder_kind = "rotaryio"
+                print("Using built-in rotaryio")
+            except ImportError:
+                self.encoder = _FixedEncoder()
+                print("Using GPIO fallback")
+
+    def _init_pixels(self):
+        # NeoPixel LED (3 LEDs)
+        # Some versions only accept 2 required parameters (pin, n)
+        import board
+        import neopixel
+        pixels = neopixel.NeoPixel(board.D10, PIXEL_COUNT)
+        pixels.brightness = PIXEL_BRIGHTNESS
+        pixels.auto_write = False
+        self.pixels = pixels
+
+    def mem_free(self):
+        return gc.mem_free()
+
+    def _glyph_tile(self, char):
+        tile = self._glyphs.get(char, -1)
+        if tile == -1:
+            glyph = self._font.get_glyph(ord(char))
+            tile = glyph.tile_index if glyph else None
+            self._glyphs[char] = tile
+        return tile
+
+    def render_text(self, text):
+        width, height = self._cell
+        bitmap = self._displayio.Bitmap(max(1, len(text)) * width, height, 2)
+        source = self._font.bitmap
+        for i, char in enumerate(text):
+            tile = self._glyph_tile(char)
+            if tile is not None:
+                self._bitmaptools.blit(bitmap, source, i * width, 0,
+                                       x1=tile * width, y1=0, x2=tile * width + width, y2=height)
+        return bitmap
+
+    def make_tile(self, bitmap, x, y):
+        return self._displayio.TileGrid(bitmap, pixel_shader=self._palette, x=x, y=y - bitmap.height // 2)
+
+    def make_text_slot(self, y):
+        bitmap = self._displayio.Bitmap(DISPLAY_WIDTH, self._cell[1], 2)
+        return self.make_tile(bitmap, 0, y), bitmap
+
+    def draw_text(self, canvas, text, x):
+        # Glyphs are blitted straight from the font; one-character strings are
+        # interned, so indexing text allocates nothing once a character was seen
+        width, height = self._cell
+        source = self._font.bitmap
+        canvas.fill(0)
+        for i in range(len(text)):
+            tile = self._glyph_tile(text[i])
+            if tile is not None:
+                self._bitmaptools.blit(canvas, source, x + i * width, 0,
+                                       x1=tile * width, y1=0, x2=tile * width + width, y2=height)
+
+
+class _FixedEncoder:
+    def __init__(self):
+        self.position = 0
+
+    def update(self):
+        pass
+
+
+def use(hardware):
+    """Install a backend (e.g. the host simulator) before code.py is imported"""
+    global _hw
+    _hw = hardware
+    return hardware
+
+
+def get():
+    """The active Hardware; builds the CircuitPython backend on first use"""
+    global _hw
+    if _hw is None:
+        _hw = CircuitPythonHardware()
+    return _hw
+
+
+def clock_ns():
+    """The installed backend's clock, or time.monotonic_ns() before get() has built one"""
+    if _hw is None:
+        return time.monotonic_ns()
+    return _hw.monotonic_ns()
@@ -0,0 +1,57 @@
+SCREEN_WIDTH = 128
+CHAR_WIDTH = 6
+MAX_CHARS = 21
+
+
+def centered_x(text):
+    """X position that centres text on the 128px wide screen"""
+    x = (SCREEN_WIDTH - len(text) * CHAR_WIDTH) // 2
+    return x if x > 0 else 0
+
+
+class HUD:
+    """
+    HUD(group, hw)
+    - Retained-mode screen made of fixed, centred text slots.
+    - add_slot() creates a slot's tile and bitmap once (hw.make_text_slot);
+      afterwards set_text() redraws only a slot whose text actually changed,
+      in place (hw.draw_text), so an update builds no tile, bitmap or string.
+    """
+
+    def __init__(self, group, hw):
+        self._group = group
+        self._make_slot = hw.make_text_slot
+        self._draw = hw.draw_text
+        self._tiles = []
+        self._canvases = []
+        self._texts = []
+
+    def add_slot(self, y, text=""):
+        tile, canvas = self._make_slot(y)
+        self._tiles.append(tile)
+        self._canvases.append(canvas)
+        self._texts.append(None)
+        slot = len(self._tiles) - 1
+        self.set_text(slot, text)
+        return slot
+
+    def show(self):
+        """Replace the group contents with this HUD's slots"""
+        while len(self._group):
+            self._group.pop()
+        for tile in self._tiles:
+            self._group.append(tile)
+
+    def set_text(self, slot, text):
+        """Update one slot; returns True if the slot was changed"""
+        shown = self._texts[slot]
+        if len(text) > MAX_CHARS:
+            # Compare what would be shown; only a changed text is sliced
+            if shown is not None and len(shown) == MAX_CHARS and text.startswith(shown):
+                return False
+            text = text[:MAX_CHARS]
+        elif text == shown:
+            return False
+        self._draw(self._canvases[slot], text, centered_x(text))
+        self._texts[slot] = text
+        return True
@@ -0,0 +1,137 @@
+import time
+
+# Render ticks a frame waits for a gap before it is drawn straight after the next read
+MAX_DEFERRALS = 5
+
+
+class I2CBusScheduler:
+    """
+    I2CBusScheduler(hw, *, sensor_rate_hz, clock=time.monotonic_ns)
+    - Owns the shared I2C bus (hw.i2c, opened by the HAL at hw.i2c_frequency)
+      between the ADXL345 and the SSD1306 and gives the accelerometer
+      priority. Sensor reads run through sensor(read) immediately.
+    - Display frames run through display(refresh) only where they are
+      expected to finish before the next sensor read is due. A frame that
+      doesn't fit is held, and after MAX_DEFERRALS render ticks it is handed
+      to the sensor task: after_read(), called once the task's read is done,
+      draws it while the whole gap to the next read is free. A frame is never started with a
+      read about to fall due; one longer than the gap itself still delays
+      the next read, and is counted in `overlaps`.
+    - The frame cost estimate is learned from the measured refresh times:
+      it jumps up to a slow frame and halves back towards faster ones.
+    - Records per-device bus occupancy and sensor read jitter (how far each
+      read started from one sensor period after the previous one); report()
+      prints and resets them. A poll that finds nothing to read calls skip(),
+      which keeps the schedule without counting a read or bus time.
+    """
+
+    def __init__(self, hw, *, sensor_rate_hz, clock=time.monotonic_ns):
+        self.i2c = hw.i2c
+        self.frequency = hw.i2c_frequency
+        self.clock = clock
+        self._sensor_period_ns = int(1_000_000_000 // sensor_rate_hz)
+        self.display_estimate_ns = 0
+        self._next_sensor_ns = 0
+        self._deferrals = 0
+        self._held = None  # refresh handed to the sensor path, drawn after the next read
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.sensor_reads = 0
+        self.sensor_busy_ns = 0
+        self.display_frames = 0
+        self.display_busy_ns = 0
+        self.deferred = 0
+        self.after_read_frames = 0  # Frames drawn by after_read()
+        self.overlaps = 0     # Frames that ran past the next read's due time
+        self.jitter_total_ns = 0
+        self.jitter_max_ns = 0
+        self.late_reads = 0  # Reads more than a tenth of a period off schedule
+        self._jitter_samples = 0
+        self._last_read_ns = None
+        self._stats_start = self.clock()
+
+    def sensor(self, read):
+        """Run a sensor transaction now; returns what read() returns"""
+        clock = self.clock
+        start = clock()
+        last = self._last_read_ns
+        if last is not None:
+            jitter = start - last - self._sensor_period_ns
+            if jitter < 0:
+                jitter = -jitter
+            self.jitter_total_ns += jitter
+            self._jitter_samples += 1
+            if jitter > self.jitter_max_ns:
+                self.jitter_max_ns = jitter
+            if jitter * 10 > self._sensor_period_ns:
+                self.late_reads += 1
+        self._last_read_ns = start
+        self._next_sensor_ns = start + self._sensor_period_ns
+
+        result = read()
+
+        self.sensor_busy_ns += clock() - start
+        self.sensor_reads += 1
+        return result
+
+    def after_read(self):
+        """Draw a display frame held for the gap after a read; call right after sensor() or skip()"""
+        held = self._held
+        if held is not None:
+            self._held = None
+            self.after_read_frames += 1
+            self._refresh(held)
+
+    def skip(self):
+        """A sensor poll that needed no transaction: keeps the read schedule, counts no read"""
+        now = self.clock()
+        self._last_read_ns = now
+        self._next_sensor_ns = now + self._sensor_period_ns
+
+    def idle(self):
+        """Sampling has stopped: frames stop waiting for reads until the next one"""
+        self._last_read_ns = None
+        self._held = None
+
+    def display(self, refresh):
+        """Run refresh() if it fits before the next sensor read; returns True if it ran"""
+        start = self.clock()
+        # A read more than a period overdue means sampling has stopped, e.g. between levels
+        sampling = self._last_read_ns is not None and start <= self._next_sensor_ns + self._sensor_period_ns
+        if sampling and start + self.display_estimate_ns > self._next_sensor_ns:
+            self.deferred += 1
+            if self._deferrals < MAX_DEFERRALS:
+                self._deferrals += 1
+            else:
+                self._held = refresh
+            return False
+        self._held = None
+        self._refresh(refresh)
+        return True
+
+    def _refresh(self, refresh):
+        self._deferrals = 0
+        start = self.clock()
+        refresh()
+        end = self.clock()
+        took = end - start
+        if self._last_read_ns is not None and start < self._next_sensor_ns < end:
+            self.overlaps += 1
+        self.display_busy_ns += took
+        self.display_frames += 1
+        estimate = self.display_estimate_ns
+        self.display_estimate_ns = took if took > estimate else (estimate + took) // 2
+
+    def report(self):
+        window = self.clock() - self._stats_start
+        if window <= 0:
+            return
+        mean_jitter = self.jitter_total_ns // self._jitter_samples if self._jitter_samples else 0
+        print(f"bus {self.frequency // 1000} kHz: sensor {100 * self.sensor_busy_ns / window:.1f}% "
+              f"display {100 * self.display_busy_ns / window:.1f}% busy, "
+              f"read jitter mean {mean_jitter / 1_000_000:.2f}ms max {self.jitter_max_ns / 1_000_000:.2f}ms "
+              f"({self.late_reads}/{self.sensor_reads} late), "
+              f"{self.display_frames} frames {self.deferred} deferred {self.after_read_frames} after a read "
+              f"{self.overlaps} over a read")
+        self.reset_stats()
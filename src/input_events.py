@@ -0,0 +1,142 @@
+from array import array
+from ticks import ticks_diff, ticks_ms
+
+# Event kinds
+PRESS = 1
+RELEASE = 2
+LONG_PRESS = 3
+ROTATE = 4
+
+
+class InputEvents:
+    """
+    InputEvents(capacity=16, *, debounce_ms=50, long_press_ms=800, clock=ticks_ms)
+    - One input service for every button and the encoder: poll(now) samples
+      them (call it from the input task) and queues timestamped events in a
+      bounded ring of preallocated arrays. When the ring is full the oldest
+      event is dropped and counted in `dropped`.
+    - Buttons (pressed == io.value False) report PRESS on the first edge and
+      then ignore the pin for `debounce_ms`, so a press costs no debounce
+      delay; RELEASE follows on the release edge and LONG_PRESS, once per
+      hold, when the button has been held `long_press_ms`. The encoder
+      reports ROTATE with the position change as value.
+    - pop() moves the oldest event into kind/source/value/time and returns
+      True, or returns False when the queue is empty; nothing is allocated.
+      clear() drops events nobody was waiting for, e.g. presses made while
+      the previous screen was still up.
+    - Times are ticks_ms ints on `clock`, the same clock poll()'s `now`
+      comes from, kept in an array like the rest of the ring. Press-to-
+      reaction latency is the time from a PRESS until the game pops it;
+      report() prints it and resets.
+    """
+
+    def __init__(self, capacity=16, *, debounce_ms=50, long_press_ms=800, clock=ticks_ms):
+        self.capacity = capacity
+        self.debounce_ms = debounce_ms
+        self.long_press_ms = long_press_ms
+        self.clock = clock
+        self._kinds = array("B", [0] * capacity)
+        self._sources = array("B", [0] * capacity)
+        self._values = array("l", [0] * capacity)
+        self._times = array("l", [0] * capacity)
+        self._head = 0
+        self._count = 0
+        self._buttons = []      # [io, pressed, changed_at, long_sent] per button source
+        self._encoder = None
+        self._encoder_source = None
+        self._position = 0
+        self.kind = 0
+        self.source = 0
+        self.value = 0
+        self.time = 0
+        self.dropped = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.presses = 0
+        self.latency_total_ms = 0
+        self.latency_max_ms = 0
+
+    def add_button(self, io):
+        """Register a button; returns its source id"""
+        self._buttons.append([io, False, None, False])
+        return len(self._buttons) - 1
+
+    def add_encoder(self):
+        """Reserve the encoder's source id; attach the encoder with set_encoder()"""
+        self._encoder_source = len(self._buttons)
+        return self._encoder_source
+
+    def set_encoder(self, encoder):
+        self._encoder = encoder
+        self._position = encoder.position
+
+    def _push(self, kind, source, value, now):
+        i = self._head + self._count
+        if i >= self.capacity:
+            i -= self.capacity
+        if self._count == self.capacity:
+            # Full: overwrite the oldest
+            self._head = self._head + 1 if self._head + 1 < self.capacity else 0
+            self.dropped += 1
+        else:
+            self._count += 1
+        self._kinds[i] = kind
+        self._sources[i] = source
+        self._values[i] = value
+        self._times[i] = now
+
+    def poll(self, now):
+        buttons = self._buttons
+        for source in range(len(buttons)):
+            button = buttons[source]
+            pressed = not button[0].value
+            changed_at = button[2]
+            if changed_at is not None and ticks_diff(now, changed_at) < self.debounce_ms:
+                continue
+            if pressed != button[1]:
+                button[1] = pressed
+                button[2] = now
+                button[3] = False
+                self._push(PRESS if pressed else RELEASE, source, 0, now)
+            elif pressed and not button[3] and ticks_diff(now, changed_at) >= self.long_press_ms:
+                button[3] = True
+                self._push(LONG_PRESS, source, 0, now)
+
+        encoder = self._encoder
+        if encoder is not None:
+            position = encoder.position
+            if position != self._position:
+                self._push(ROTATE, self._encoder_source, position - self._position, now)
+                self._position = position
+
+    def pop(self):
+        if not self._count:
+            return False
+        i = self._head
+        self.kind = self._kinds[i]
+        self.source = self._sources[i]
+        self.value = self._values[i]
+        self.time = self._times[i]
+        self._head = i + 1 if i + 1 < self.capacity else 0
+        self._count -= 1
+        if self.kind == PRESS:
+            latency = ticks_diff(self.clock(), self.time)
+            self.presses += 1
+            self.latency_total_ms += latency
+            if latency > self.latency_max_ms:
+                self.latency_max_ms = latency
+        return True
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def report(self):
+        mean_ms = self.latency_total_ms / self.presses if self.presses else 0
+        print(f"input: {self.presses} presses, press-to-reaction mean {mean_ms:.1f}ms "
+              f"max {self.latency_max_ms}ms, {self.dropped} dropped")
+        self.reset_stats()
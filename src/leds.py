@@ -0,0 +1,69 @@
+class LEDManager:
+    """
+    LEDManager(pixels, *, count=None)
+    - Keeps the colour requested for each pixel and the colour last pushed to
+      the strip. fill() and set() only record the request; flush() writes the
+      pixels that differ and calls pixels.show() once, or not at all when the
+      frame is unchanged. Call flush() once per frame.
+    - pixels must have auto_write off. It may be None while the strip is
+      still booting (count then gives the pixel number): requests are kept and
+      attach(pixels) pushes them on the next flush.
+    - Counters since reset_stats(): frames, shows, pixel_writes and skipped
+      (frames with nothing to push); frame_writes is the last frame's count.
+    """
+
+    def __init__(self, pixels, *, count=None):
+        self._pixels = pixels
+        self.n = len(pixels) if pixels is not None else count
+        self._colors = [(0, 0, 0)] * self.n
+        self._shown = [None] * self.n  # Unknown until the first flush
+        self._dirty = True
+        self.frame_writes = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.shows = 0
+        self.pixel_writes = 0
+        self.skipped = 0
+
+    def attach(self, pixels):
+        self._pixels = pixels
+        self._shown = [None] * self.n
+        self._dirty = True
+
+    def set(self, i, color):
+        if self._colors[i] != color:
+            self._colors[i] = color
+            self._dirty = True
+
+    def fill(self, color):
+        colors = self._colors
+        for i in range(self.n):
+            if colors[i] != color:
+                colors[i] = color
+                self._dirty = True
+
+    def flush(self):
+        """Push this frame's changes; returns the number of pixels written"""
+        self.frames += 1
+        written = 0
+        if self._dirty and self._pixels is not None:
+            pixels = self._pixels
+            colors = self._colors
+            shown = self._shown
+            for i in range(self.n):
+                color = colors[i]
+                if shown[i] != color:
+                    pixels[i] = color
+                    shown[i] = color
+                    written += 1
+            self._dirty = False
+        if written:
+            self._pixels.show()
+            self.shows += 1
+            self.pixel_writes += written
+        else:
+            self.skipped += 1
+        self.frame_writes = written
+        return written
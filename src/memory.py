@@ -0,0 +1,106 @@
+import gc
+import time
+
+
+class PhaseStats:
+    """Heap figures of one game phase, accumulated over every time it was entered"""
+
+    def __init__(self, name, budget):
+        self.name = name
+        self.budget = budget
+        self.reset()
+
+    def reset(self):
+        self.entries = 0
+        self.free_low = None
+        self.free_high = None
+        self.used_max = 0       # Largest drop in free heap from the start of one visit
+        self.collects = 0
+        self.collect_max_ns = 0
+        self.held = 0           # Visits that ran with automatic collection off
+
+    @property
+    def over_budget(self):
+        return self.used_max > self.budget
+
+
+class MemoryManager:
+    """
+    MemoryManager(budgets, *, mem_free, clock=time.monotonic_ns)
+    - Splits the game into phases ("menu", "level", "slot", "result") with a
+      heap budget each: the most free heap a single visit may consume, in bytes.
+    - enter(name) is a safe point: it runs gc.collect() (timed), then starts
+      the phase from the free heap that's left. With hold_gc=True and at least
+      twice the budget free, automatic collection stays off until the next
+      enter(), so no collection pause can land inside the phase.
+    - sample() records free-heap low/high watermarks and the drop since the
+      phase began; call it from a periodic task. mem_free() returns None when
+      the heap can't be measured (host without tracing) and then only
+      collections are counted.
+    - over_budget() names the phases that went over; report() prints them.
+    """
+
+    def __init__(self, budgets, *, mem_free, clock=time.monotonic_ns):
+        self.mem_free = mem_free
+        self.clock = clock
+        self.phases = {name: PhaseStats(name, budget) for name, budget in budgets.items()}
+        self.current = None
+        self._start_free = None
+        self._holding = False
+
+    def enter(self, name, *, hold_gc=False):
+        """Close the current phase and start `name` after a collection"""
+        if self.current is not None:
+            self.sample()
+        if self._holding:
+            gc.enable()
+            self._holding = False
+
+        phase = self.phases[name]
+        start = self.clock()
+        gc.collect()
+        took = self.clock() - start
+        phase.collects += 1
+        if took > phase.collect_max_ns:
+            phase.collect_max_ns = took
+
+        phase.entries += 1
+        self.current = phase
+        self._start_free = self.mem_free()
+        if hold_gc and self._start_free is not None and self._start_free >= 2 * phase.budget:
+            gc.disable()
+            self._holding = True
+            phase.held += 1
+        self.sample()
+
+    def sample(self):
+        phase = self.current
+        free = self.mem_free()
+        if phase is None or free is None:
+            return
+        if phase.free_low is None or free < phase.free_low:
+            phase.free_low = free
+        if phase.free_high is None or free > phase.free_high:
+            phase.free_high = free
+        used = self._start_free - free
+        if used > phase.used_max:
+            phase.used_max = used
+
+    def over_budget(self):
+        return [phase.name for phase in self.phases.values() if phase.over_budget]
+
+    def reset_stats(self):
+        for phase in self.phases.values():
+            phase.reset()
+
+    def report(self):
+        for phase in self.phases.values():
+            if not phase.entries:
+                continue
+            heap = ""
+            if phase.free_low is not None:
+                heap = (f"used max {phase.used_max}/{phase.budget} B, "
+                        f"free {phase.free_low / 1024:.1f}-{phase.free_high / 1024:.1f} KB, ")
+            flag = "  OVER BUDGET" if phase.over_budget else ""
+            print(f"mem {phase.name}: {phase.entries} entries, {heap}"
+                  f"gc max {phase.collect_max_ns / 1_000_000:.1f}ms, {phase.held} held{flag}")
@@ -0,0 +1,72 @@
+import time
+
+
+class RenderScheduler:
+    """
+    RenderScheduler(display, *, fps=20, clock=time.monotonic_ns)
+    - Turns off the display's auto_refresh and pushes frames itself, at most
+      `fps` per second and only after invalidate() says something changed, so
+      label edits don't each trigger a full-screen write on the shared I2C bus.
+    - step() is called from a task that runs faster than the fastest fps used;
+      it refreshes when a frame is due and the screen is dirty.
+    - Counters since reset_stats(): frames pushed, late frames (pushed a whole
+      frame period or more after they were due) and dropped frame slots.
+    """
+
+    def __init__(self, display, *, fps=20, clock=time.monotonic_ns):
+        self._display = display
+        self.clock = clock
+        display.auto_refresh = False
+        self.fps = fps
+        self._next_ns = clock()
+        self._dirty = True
+        self.reset_stats()
+
+    @property
+    def fps(self):
+        return self._fps
+
+    @fps.setter
+    def fps(self, fps):
+        self._fps = fps
+        self._period_ns = int(1_000_000_000 // fps)
+
+    def reset_stats(self):
+        self.frames = 0
+        self.late = 0
+        self.dropped = 0
+
+    def invalidate(self):
+        """Mark the screen as changed; the next due frame will be pushed"""
+        self._dirty = True
+
+    @property
+    def dirty(self):
+        """True while a change is waiting for its frame"""
+        return self._dirty
+
+    def due(self):
+        """True when the screen is dirty and a frame slot has come round"""
+        return self._dirty and self.clock() >= self._next_ns
+
+    def step(self):
+        now = self.clock()
+        if now < self._next_ns:
+            return False
+        if not self._dirty:
+            # Idle: the next change may be drawn as soon as it arrives
+            self._next_ns = now
+            return False
+
+        late_ns = now - self._next_ns
+        if late_ns >= self._period_ns:
+            self.late += 1
+            self.dropped += late_ns // self._period_ns
+        self._dirty = False
+        self._display.refresh()
+        self.frames += 1
+
+        self._next_ns += self._period_ns
+        if self._next_ns <= now:
+            self._next_ns = now + self._period_ns
+        return True
@@ -1,110 +1,190 @@
-import time
-import digitalio
-
-class RotaryEncoder:
-    """
-    RotaryEncoder(pin_a, pin_b, *, pull=digitalio.Pull.UP, debounce_ms=3, pulses_per_detent=4)
-    - pin_a, pin_b: board pin objects (e.g. board.D1, board.D0)
-    - debounce_ms: stable time (ms) before accepting a new state 
-    - pulses_per_detent: number of encoder edges per visible detent. Set to 1 if you want
-      raw edges, or to 4 for many encoders so 1 detent == 1 step.
-    """
-    # Quadrature Table
-    _TRANSITIONS = {
-        0b0001:  1,  
-        0b0011:  1,  
-        0b0111:  1,  
-        0b0100: -1,  
-        0b1110:  1,  
-        0b1101: -1,  
-        0b1000:  1,  
-        0b1011: -1,  
-    }
-    
-    def __init__(self, pin_a, pin_b, *, pull=digitalio.Pull.UP, debounce_ms=3, pulses_per_detent=3):
-        self._a = digitalio.DigitalInOut(pin_a)
-        self._a.direction = digitalio.Direction.INPUT
-        self._a.pull = pull
-        
-        self._b = digitalio.DigitalInOut(pin_b)
-        self._b.direction = digitalio.Direction.INPUT
-        self._b.pull = pull
-        
-        self._debounce_ms = max(1, int(debounce_ms))
-        self._pulses_per_detent = max(1, int(pulses_per_detent))
-        
-        self._last_raw = (self._a.value, self._b.value)
-        self._last_stable = self._last_raw
-        self._last_change_time = time.monotonic() * 1000.0 
-        
-        self._last_q = (1 if self._last_stable[0] else 0) << 1 | (1 if self._last_stable[1] else 0)
-        self._position_raw = 0
-        self._position = 0
-        self._delta_accum = 0
-    
-    @staticmethod
-    def _pack(state):
-        return (1 if state[0] else 0) << 1 | (1 if state[1] else 0)
-    
-    def _read_raw(self):
-        return (self._a.value, self._b.value)
-    
-    def update(self):
-        now = time.monotonic() * 1000.0
-        raw = self._read_raw()
-        
-        if raw != self._last_raw:
-            self._last_raw = raw
-            self._last_change_time = now
-            return False
-        
-        if raw != self._last_stable and (now - self._last_change_time) >= self._debounce_ms:
-            prev_q = self._last_q
-            self._last_stable = raw
-            curr_q = self._pack(raw)
-            self._last_q = curr_q
-            
-            key = (prev_q << 2) | curr_q
-            move = self._TRANSITIONS.get(key, 0)
- 
-            if move == 0:
-                diff = (curr_q - prev_q) % 4
-                if diff == 1:
-                    move = 1
-                elif diff == 3:
-                    move = -1
-                elif diff == 2:
-                    move = 2 if ((curr_q - prev_q) > 0) else -2
-            
-            if move != 0:
-                self._position_raw += int(move)
-                new_pos = self._position_raw // self._pulses_per_detent
-                if new_pos != self._position:
-                    delta = new_pos - self._position
-                    self._position = new_pos
-                    self._delta_accum += delta
-                    return True
-        
-        return False
-    
-    @property
-    def position(self):
-        return self._position
-    
-    @property
-    def position_raw(self):
-        return self._position_raw
-    
-    def get_delta(self):
-        d = self._delta_accum
-        self._delta_accum = 0
-        return d
-    
-    def reset(self, *, to_detent=None):
-        if to_detent is None:
-            self._position_raw = 0
-            self._position = 0
-        else:
-            self._position = int(to_detent)
-            self._position_raw = self._position * self._pulses_per_detent
-        self._delta_accum = 0
+from array import array
+try:
+    import digitalio
+except ImportError:
+    digitalio = None  # Host-side replay tools only use QuadratureDecoder
+from ticks import ticks_ms, ticks_diff
+
+# Velocity reads 0 once no step has been seen for this long
+_IDLE_MS = 250
+
+class QuadratureDecoder:
+    """
+    QuadratureDecoder(*, debounce_ms=3, pulses_per_detent=3, state=0b11)
+    - Pin-free quadrature state machine. feed(state, now_ms) takes the packed
+      A/B level (A << 1 | B) and an integer ticks_ms timestamp.
+    - Shared by RotaryEncoder and host-side replay of recorded edge streams.
+    """
+    # Index: previous state << 2 | new state. Gray-code order 00->01->11->10 is +1,
+    # the reverse is -1; no change or a two-bit jump (a missed state) is 0.
+    _TRANSITIONS = array("b", (
+        0,  1, -1,  0,
+        -1, 0,  0,  1,
+        1,  0,  0, -1,
+        0, -1,  1,  0,
+    ))
+
+    def __init__(self, *, debounce_ms=3, pulses_per_detent=3, state=0b11):
+        self._debounce_ms = max(1, int(debounce_ms))
+        self._pulses_per_detent = max(1, int(pulses_per_detent))
+
+        now = ticks_ms()
+        self._last_raw = state
+        self._last_stable = state
+        self._last_change_time = now
+        self._last_update_time = now
+
+        self._position_raw = 0
+        self._position = 0
+        self._delta_accum = 0
+        self.skipped = 0  # Two-bit jumps: a state changed faster than it was sampled
+
+        self._last_step_time = now
+        self._interval_ms = 0
+        self._prev_interval_ms = 0
+        self._direction = 0
+        self._prev_direction = 0
+
+    def feed(self, state, now):
+        """Debounced sample: state must hold for debounce_ms before it is accepted"""
+        self._last_update_time = now
+        if state != self._last_raw:
+            self._last_raw = state
+            self._last_change_time = now
+            return False
+
+        if state != self._last_stable and ticks_diff(now, self._last_change_time) >= self._debounce_ms:
+            return self._transition(state, now)
+        return False
+
+    def _transition(self, state, now):
+        move = self._TRANSITIONS[self._last_stable << 2 | state]
+        self._last_stable = state
+        if move == 0:
+            self.skipped += 1
+            return False
+
+        self._position_raw += move
+        new_pos = self._position_raw // self._pulses_per_detent
+        if new_pos != self._position:
+            delta = new_pos - self._position
+            self._position = new_pos
+            self._delta_accum += delta
+            self._track_speed(delta, now)
+            return True
+        return False
+
+    def _track_speed(self, delta, now):
+        interval = ticks_diff(now, self._last_step_time)
+        self._last_step_time = now
+        self._prev_interval_ms = self._interval_ms
+        self._prev_direction = self._direction
+        self._interval_ms = interval if interval > 0 else 1
+        self._direction = delta
+
+    @property
+    def position(self):
+        return self._position
+
+    @property
+    def position_raw(self):
+        return self._position_raw
+
+    @property
+    def velocity(self):
+        """Detents per second from the last step interval (signed); 0 when idle"""
+        if not self._interval_ms or ticks_diff(self._last_update_time, self._last_step_time) > _IDLE_MS:
+            return 0.0
+        return self._direction * 1000 / self._interval_ms
+
+    @property
+    def acceleration(self):
+        """Change in velocity over the last two steps, detents per second squared"""
+        if not self._prev_interval_ms or ticks_diff(self._last_update_time, self._last_step_time) > _IDLE_MS:
+            return 0.0
+        previous = self._prev_direction * 1000 / self._prev_interval_ms
+        return (self.velocity - previous) * 1000 / self._interval_ms
+
+    def get_delta(self):
+        d = self._delta_accum
+        self._delta_accum = 0
+        return d
+
+    def reset(self, *, to_detent=None):
+        if to_detent is None:
+            self._position_raw = 0
+            self._position = 0
+        else:
+            self._position = int(to_detent)
+            self._position_raw = self._position * self._pulses_per_detent
+        self._delta_accum = 0
+
+class RotaryEncoder(QuadratureDecoder):
+    """
+    RotaryEncoder(pin_a, pin_b, *, pull=None, debounce_ms=3, pulses_per_detent=3, sampler="poll", scan_interval=0.001)
+    - pin_a, pin_b: board pin objects (e.g. board.D1, board.D0)
+    - pull: digitalio.Pull for both pins; None means digitalio.Pull.UP
+    - debounce_ms: stable time (ms) before accepting a new state
+    - pulses_per_detent: number of encoder edges per visible detent. Set to 1 if you want
+      raw edges, or to 4 for many encoders so 1 detent == 1 step.
+    - sampler: "poll" reads the pins on each update(), so call it from a fast task.
+      "keypad" lets the keypad module scan the pins in the background every
+      scan_interval seconds and queue timestamped edges; update() then only drains
+      the queue, so edges between calls are not lost (pull and debounce_ms are unused).
+    """
+
+    def __init__(self, pin_a, pin_b, *, pull=None, debounce_ms=3, pulses_per_detent=3, sampler="poll", scan_interval=0.001):
+        self._keys = None
+        if sampler == "keypad":
+            import keypad
+            # Pins idle high through the pull-ups; a "pressed" key is a low pin
+            self._keys = keypad.Keys((pin_a, pin_b), value_when_pressed=False, pull=True,
+                                     interval=scan_interval, max_events=64)
+            self._event = keypad.Event()
+            self.lost_events = 0
+            super().__init__(debounce_ms=debounce_ms, pulses_per_detent=pulses_per_detent, state=0b11)
+            return
+
+        if pull is None:
+            pull = digitalio.Pull.UP
+        self._a = digitalio.DigitalInOut(pin_a)
+        self._a.direction = digitalio.Direction.INPUT
+        self._a.pull = pull
+
+        self._b = digitalio.DigitalInOut(pin_b)
+        self._b.direction = digitalio.Direction.INPUT
+        self._b.pull = pull
+
+        super().__init__(debounce_ms=debounce_ms, pulses_per_detent=pulses_per_detent, state=self._read_raw())
+
+    def _read_raw(self):
+        return self._a.value << 1 | self._b.value
+
+    def update(self):
+        if self._keys is None:
+            return self.feed(self._read_raw(), ticks_ms())
+
+        events = self._keys.events
+        if events.overflowed:
+            self.lost_events += 1
+            events.overflowed = False
+        moved = False
+        event = self._event
+        state = self._last_stable
+        while events.get_into(event):
+            bit = 0b10 if event.key_number == 0 else 0b01
+            if event.pressed:
+                state &= ~bit
+            else:
+                state |= bit
+            if self._transition(state, event.timestamp):
+                moved = True
+        self._last_update_time = ticks_ms()
+        return moved
+
+    def deinit(self):
+        if self._keys is not None:
+            self._keys.deinit()
+        else:
+            self._a.deinit()
+            self._b.deinit()
@@ -0,0 +1,75 @@
+from array import array
+
+
+class SampleQueue:
+    """
+    SampleQueue(capacity=64)
+    - Preallocated ring of timestamped x/y/z samples between the sensor task
+      (push) and the shake detector (drain): ticks_ms times and raw int16
+      counts, so pushing and draining never box a float.
+    - When the consumer falls behind, the newest samples are dropped and
+      counted in `dropped` rather than growing the heap.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.t = array("l", [0] * capacity)
+        self.x = array("h", [0] * capacity)
+        self.y = array("h", [0] * capacity)
+        self.z = array("h", [0] * capacity)
+        self._head = 0
+        self._count = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, t, x, y, z):
+        if self._count == self.capacity:
+            self.dropped += 1
+            return False
+        i = self._head + self._count
+        if i >= self.capacity:
+            i -= self.capacity
+        self.t[i] = t
+        self.x[i] = x
+        self.y[i] = y
+        self.z[i] = z
+        self._count += 1
+        return True
+
+    def drain(self, consumer):
+        """Call consumer(t, x, y, z) for every queued sample, oldest first"""
+        n = self._count
+        i = self._head
+        for _ in range(n):
+            consumer(self.t[i], self.x[i], self.y[i], self.z[i])
+            i += 1
+            if i == self.capacity:
+                i = 0
+        self._head = i
+        self._count -= n
+        return n
+
+    def drain_block(self, consumer):
+        """
+        Call consumer(t, x, y, z, start, count) with the queue's own arrays for
+        each contiguous run of queued samples (two runs when the ring wraps)
+        """
+        n = self._count
+        head = self._head
+        first = min(n, self.capacity - head)
+        if first:
+            consumer(self.t, self.x, self.y, self.z, head, first)
+        if n > first:
+            consumer(self.t, self.x, self.y, self.z, 0, n - first)
+        head += n
+        if head >= self.capacity:
+            head -= self.capacity
+        self._head = head
+        self._count = 0
+        return n
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
@@ -0,0 +1,104 @@
+from array import array
+from filters import MovingAverageFilter
+from ticks import ticks_diff
+
+AXIS_X = 1
+AXIS_Y = 2
+AXIS_Z = 4
+AXIS_ALL = AXIS_X | AXIS_Y | AXIS_Z
+
+
+def action_mask(action):
+    """Axes whose deviation from the average counts as movement for a level action"""
+    if "LEFT-RIGHT" in action:
+        return AXIS_X
+    if "FWD-BACK" in action:
+        return AXIS_Y
+    if "UP-DOWN" in action:
+        return AXIS_Z
+    if "ANY" in action or "FAST" in action:
+        return AXIS_ALL
+    if "RANDOM" in action:
+        return AXIS_X | AXIS_Y
+    return 0
+
+
+class ShakeDetector:
+    """
+    ShakeDetector(window=5, *, cooldown_ms=300)
+    - Counts shakes in a stream of timestamped x/y/z samples: a sample is
+      moving when an axis of the level's action deviates from the moving
+      average by more than the threshold, and a still -> moving edge counts
+      once the cooldown has passed since the last counted shake.
+    - Samples are raw ADXL345 counts and times are ticks_ms, all small ints:
+      deviation is tested as |x * n - sum_x| > threshold * n over the
+      filter's integer sums, with threshold * n worked out per fill level by
+      configure(), so update() does no float math and allocates nothing.
+    - configure() takes the threshold already in counts and compiles the
+      action into an axis mask once per level; the cooldown is measured
+      between sample timestamps, so the count depends only on the samples,
+      not on how often or how late they are processed.
+    - Shared by the game's detect task, the FIFO path and offline replay.
+    """
+
+    def __init__(self, window=5, *, cooldown_ms=300):
+        self.filter = MovingAverageFilter(window, scale=1)
+        self.cooldown_ms = cooldown_ms
+        self._limits = array("l", [0] * (self.filter.window_size + 1))
+        self.configure("", 0)
+
+    def configure(self, action, threshold, *, cooldown_ms=None):
+        """Start a level: compile its action and threshold (counts), clear the count and the filter"""
+        self.action = action
+        self.mask = action_mask(action)
+        self.threshold = threshold
+        # |x * n - sum| > threshold * n  <=>  > int(threshold * n), the left side being an int
+        for n in range(len(self._limits)):
+            self._limits[n] = int(threshold * n)
+        if cooldown_ms is not None:
+            self.cooldown_ms = cooldown_ms
+        self.filter.reset()
+        self.count = 0
+        self.is_moving = False
+        self.is_shaking = False
+        self.last_shake_time = None
+
+    def seed(self, x, y, z):
+        """Baseline sample: primes the average without being tested for movement"""
+        self.filter.update(x, y, z)
+
+    def update(self, t, x, y, z):
+        """One sample at ticks_ms t; returns True if it counted a shake"""
+        flt = self.filter
+        flt.update(x, y, z)
+        n = flt.count
+        limit = self._limits[n]
+
+        mask = self.mask
+        is_moving = ((mask & AXIS_X and abs(x * n - flt.sum_x) > limit)
+                     or (mask & AXIS_Y and abs(y * n - flt.sum_y) > limit)
+                     or (mask & AXIS_Z and abs(z * n - flt.sum_z) > limit))
+        is_moving = bool(is_moving)
+        self.is_moving = is_moving
+
+        # Count logic: from still to moving counts as one
+        if is_moving:
+            if not self.is_shaking:
+                last = self.last_shake_time
+                if last is None or ticks_diff(t, last) > self.cooldown_ms:
+                    self.count += 1
+                    self.last_shake_time = t
+                    self.is_shaking = True
+                    return True
+        else:
+            self.is_shaking = False
+        return False
+
+    def update_block(self, t, x, y, z, start, count):
+        """Samples start..start+count-1 of parallel arrays; returns shakes counted"""
+        counted = 0
+        update = self.update
+        for i in range(start, start + count):
+            if update(t[i], x[i], y[i], z[i]):
+                counted += 1
+        return counted
@@ -0,0 +1,158 @@
+import struct
+from ticks import ticks_diff
+
+# File layout: MAGIC, then chunks, each a 1-byte type followed by its payload
+#   b"L" level header   HEADER
+#   b"S" samples        "<H" count, then count * _RECORD
+#   b"E" level end      "<H" shake count the device reported
+# A record is a delta time since the previous sample (units of 100 us) and raw
+# ADXL345 counts. A delta of SEED marks a baseline sample that only primed the filter.
+MAGIC = b"SMT1"
+HEADER = "<BB12sfffHBB"  # level, difficulty, action, threshold, duration, cooldown, target, tolerance, window
+_RECORD = "<Hhhh"
+RECORD_SIZE = struct.calcsize(_RECORD)
+TICK = 0.0001
+TICKS_PER_MS = 10
+SEED = 0xFFFF
+
+
+class TraceRecorder:
+    """
+    TraceRecorder(path, *, chunk_samples=64)
+    - Streams the detector's samples to a compact binary trace: packed int16
+      x/y/z plus a 16-bit delta timestamp, 8 bytes per sample.
+    - add() only packs into one of two preallocated chunk buffers; service()
+      writes full chunks, so file writes happen outside the sampling path.
+    - Samples are the detector's own: raw counts and ticks_ms times, so
+      they are packed as they are.
+    - On CircuitPython the filesystem must be writable (storage.remount in
+      boot.py); if the file can't be opened, recording is disabled.
+    """
+
+    def __init__(self, path, *, chunk_samples=64):
+        self._capacity = chunk_samples
+        size = 3 + chunk_samples * RECORD_SIZE
+        self._buffers = (bytearray(size), bytearray(size))
+        self._fill = 0          # Index of the buffer add() packs into
+        self._count = 0         # Samples in the fill buffer
+        self._ready = None      # Index of a full buffer waiting for service()
+        self._ready_count = 0
+        self._last_t = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.enabled = True
+        try:
+            self._file = open(path, "ab")
+            if self._file.tell() == 0:
+                self._write(MAGIC)
+        except OSError as e:
+            print(f"Trace recording disabled: {e}")
+            self.enabled = False
+
+    def _write(self, data):
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def begin(self, level, difficulty, action, threshold, duration, cooldown, target, tolerance, window, start_ticks):
+        if not self.enabled:
+            return
+        self._write(b"L" + struct.pack(HEADER, level, difficulty, action.encode(), threshold,
+                                       duration, cooldown, target, tolerance, window))
+        self._last_t = start_ticks
+
+    def seed(self, x, y, z):
+        """Record a baseline sample that primes the filter but is not detected on"""
+        self._pack(SEED, x, y, z)
+
+    def add(self, t, x, y, z):
+        ticks = ticks_diff(t, self._last_t) * TICKS_PER_MS
+        self._last_t = t
+        self._pack(min(max(ticks, 0), SEED - 1), x, y, z)
+
+    def _pack(self, ticks, x, y, z):
+        if not self.enabled:
+            return
+        if self._count == self._capacity:
+            if self._ready is not None:
+                # Writer hasn't caught up: drop rather than block the sampling path
+                self.dropped += 1
+                return
+            self._ready = self._fill
+            self._ready_count = self._count
+            self._fill ^= 1
+            self._count = 0
+        struct.pack_into(_RECORD, self._buffers[self._fill], 3 + self._count * RECORD_SIZE,
+                         ticks, x, y, z)
+        self._count += 1
+
+    def _flush(self, index, count):
+        buf = self._buffers[index]
+        buf[0] = ord("S")
+        struct.pack_into("<H", buf, 1, count)
+        self._write(memoryview(buf)[:3 + count * RECORD_SIZE])
+
+    def service(self):
+        """Write a full chunk if one is waiting; call from a low-priority task"""
+        if self._ready is not None:
+            self._flush(self._ready, self._ready_count)
+            self._ready = None
+
+    def end(self, shake_count):
+        if not self.enabled:
+            return
+        self.service()
+        if self._count:
+            self._flush(self._fill, self._count)
+            self._count = 0
+        self._write(b"E" + struct.pack("<H", shake_count))
+        self._file.flush()
+
+    def close(self):
+        if self.enabled:
+            self._file.close()
+            self.enabled = False
+
+
+class TraceLevel:
+    """One recorded level: header fields, seed samples, samples and the device's count"""
+
+    def __init__(self, fields):
+        (self.level, self.difficulty, action, self.threshold, self.duration,
+         self.cooldown, self.target, self.tolerance, self.window) = fields
+        self.action = action.rstrip(b"\0").decode()
+        self.seeds = []    # (x, y, z) raw counts
+        self.samples = []  # (t, x, y, z); t in seconds from level start
+        self.shake_count = None
+
+
+def read_trace(f):
+    """Parse a trace file object into a list of TraceLevel"""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a Shake Master trace")
+    header_size = struct.calcsize(HEADER)
+    levels = []
+    current = None
+    t = 0
+    while True:
+        kind = f.read(1)
+        if not kind:
+            break
+        if kind == b"L":
+            current = TraceLevel(struct.unpack(HEADER, f.read(header_size)))
+            levels.append(current)
+            t = 0
+        elif kind == b"S":
+            (count,) = struct.unpack("<H", f.read(2))
+            data = f.read(count * RECORD_SIZE)
+            for i in range(count):
+                ticks, x, y, z = struct.unpack_from(_RECORD, data, i * RECORD_SIZE)
+                if ticks == SEED:
+                    current.seeds.append((x, y, z))
+                else:
+                    t += ticks
+                    current.samples.append((t * TICK, x, y, z))
+        elif kind == b"E":
+            (current.shake_count,) = struct.unpack("<H", f.read(2))
+        else:
+            raise ValueError(f"Corrupt trace: chunk type {kind!r}")
+    return levels
@@ -0,0 +1,96 @@
+import time
+from array import array
+
+_MAX_US = 0xFFFFFFFF
+
+
+class Spans:
+    """
+    Spans(capacity=128, *, clock=time.monotonic_ns)
+    - Named timing spans for the hot paths. Register each name once with
+      span(name) and keep the integer id; at run time t = begin() and
+      end(id, t) store the id and the elapsed microseconds in a fixed-size
+      ring buffer, overwriting the oldest entries. Nothing is allocated.
+    - report() prints count/min/mean/max per span over the buffered entries
+      and empties the buffer.
+    - Callers keep a None instead of a Spans when profiling is off and guard
+      with `if spans:`, so a disabled span costs one global lookup.
+    """
+
+    def __init__(self, capacity=128, *, clock=time.monotonic_ns):
+        self.clock = clock
+        self.capacity = capacity
+        self._names = []
+        self._ids = array("B", [0] * capacity)
+        self._us = array("L", [0] * capacity)
+        self._head = 0
+        self._count = 0
+        self.overwritten = 0
+
+    def span(self, name):
+        """Register a span name; returns the id passed to end()"""
+        if name in self._names:
+            return self._names.index(name)
+        if len(self._names) == 256:
+            raise ValueError("too many spans")
+        self._names.append(name)
+        return len(self._names) - 1
+
+    def begin(self):
+        return self.clock()
+
+    def end(self, span_id, start):
+        us = (self.clock() - start) // 1000
+        i = self._head
+        self._ids[i] = span_id
+        self._us[i] = us if us < _MAX_US else _MAX_US
+        i += 1
+        if i == self.capacity:
+            i = 0
+        self._head = i
+        if self._count < self.capacity:
+            self._count += 1
+        else:
+            self.overwritten += 1
+
+    def stats(self, span_id):
+        """(count, min_us, mean_us, max_us) over the buffered entries of one span"""
+        n = 0
+        total = 0
+        low = _MAX_US
+        high = 0
+        ids = self._ids
+        us = self._us
+        i = self._head - self._count
+        if i < 0:
+            i += self.capacity
+        for _ in range(self._count):
+            if ids[i] == span_id:
+                v = us[i]
+                n += 1
+                total += v
+                if v < low:
+                    low = v
+                if v > high:
+                    high = v
+            i += 1
+            if i == self.capacity:
+                i = 0
+        if n == 0:
+            return 0, 0, 0, 0
+        return n, low, total // n, high
+
+    def report(self):
+        """Print a summary line per span seen since the last report, then clear"""
+        for span_id, name in enumerate(self._names):
+            n, low, mean, high = self.stats(span_id)
+            if n:
+                print(f"span {name}: n={n} min {low}us mean {mean}us max {high}us")
+        if self.overwritten:
+            print(f"spans: {self.overwritten} older entries overwritten")
+        self.clear()
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self.overwritten = 0
@@ -0,0 +1,36 @@
+class StateMachine:
+    """
+    StateMachine(ticks, transitions, initial)
+    - ticks: state name -> async function that runs one visit to the state
+      and returns an event name.
+    - transitions: (state, event) -> next state. An event with no entry raises
+      ValueError naming both, so a missing edge fails loudly instead of
+      falling through to some default.
+    - run() is one loop: visit, look up, visit the next state. A replay goes
+      back round the same loop, so the hundredth game uses the same stack as
+      the first. `state` is the state being visited and `visits` counts
+      entries per state.
+    """
+
+    def __init__(self, ticks, transitions, initial):
+        for (state, event), target in transitions.items():
+            if state not in ticks or target not in ticks:
+                raise ValueError(f"transition {state} --{event}--> {target} names an unknown state")
+        self.ticks = ticks
+        self.transitions = transitions
+        self.initial = initial
+        self.state = None
+        self.visits = {state: 0 for state in ticks}
+
+    async def run(self, *, until=None):
+        """Run from the initial state; returns when the machine would enter `until`"""
+        state = self.initial
+        while state != until:
+            self.state = state
+            self.visits[state] += 1
+            event = await self.ticks[state]()
+            target = self.transitions.get((state, event))
+            if target is None:
+                raise ValueError(f"no transition from {state} on {event}")
+            state = target
+        self.state = None
@@ -0,0 +1,63 @@
+import time
+import asyncio
+
+
+class PeriodicTask:
+    """
+    PeriodicTask(name, rate_hz, step, *, clock=time.monotonic_ns)
+    - Runs step() every 1/rate_hz seconds as its own asyncio task.
+    - clock: integer nanosecond clock, the HAL's when running on the simulator
+    - Records how often it ran, the slowest step and the worst wake-up
+      lateness, so print_stats() shows whether one task is starving another.
+    """
+
+    def __init__(self, name, rate_hz, step, *, clock=time.monotonic_ns):
+        self.name = name
+        self.clock = clock
+        self.rate_hz = rate_hz
+        self.step = step
+        self._period_ns = int(1_000_000_000 // rate_hz)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.runs = 0
+        self.busy_ns = 0
+        self.max_step_ns = 0
+        self.max_late_ns = 0
+        self._stats_start = self.clock()
+
+    async def run(self):
+        clock = self.clock
+        next_ns = clock()
+        while True:
+            start = clock()
+            late = start - next_ns
+            self.step()
+            end = clock()
+
+            took = end - start
+            self.runs += 1
+            self.busy_ns += took
+            if took > self.max_step_ns:
+                self.max_step_ns = took
+            if late > self.max_late_ns:
+                self.max_late_ns = late
+
+            next_ns += self._period_ns
+            if next_ns < end:
+                # Overran: start again from now instead of bursting to catch up
+                next_ns = end
+            await asyncio.sleep((next_ns - end) / 1_000_000_000)
+
+
+def print_stats(tasks):
+    """Print and reset per-task timing since the last call"""
+    for task in tasks:
+        now = task.clock()
+        window = (now - task._stats_start) / 1_000_000_000
+        rate = task.runs / window if window > 0 else 0
+        mean_ms = task.busy_ns / task.runs / 1_000_000 if task.runs else 0
+        print(f"task {task.name}: {rate:.1f}/{task.rate_hz} Hz, "
+              f"step mean {mean_ms:.2f}ms max {task.max_step_ns / 1_000_000:.2f}ms, "
+              f"late max {task.max_late_ns / 1_000_000:.2f}ms")
+        task.reset_stats()
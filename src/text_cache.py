@@ -0,0 +1,110 @@
+import gc
+import time
+
+# CircuitPython only; the host simulator has no heap figure to report
+mem_free = getattr(gc, "mem_free", None)
+
+# Bytes charged per cached string on top of its bitmap rows (dict slot, entry list, object headers)
+ENTRY_OVERHEAD = 48
+
+
+def bitmap_bytes(bitmap):
+    """Heap bytes of a 1-bit displayio.Bitmap: rows padded to 32-bit words"""
+    return ((bitmap.width + 31) // 32) * 4 * bitmap.height + ENTRY_OVERHEAD
+
+
+class TextCache:
+    """
+    TextCache(hw, *, budget=4096, clock=time.monotonic_ns)
+    - Text as shared bitmaps: each distinct string is rendered once with
+      hw.render_text() and kept in an LRU bounded by `budget` bytes; label()
+      wraps the cached bitmap in a cheap tile (hw.make_tile) at x, y, so a
+      repeated screen reuses its bitmaps instead of building new Labels.
+    - A hit only stamps the entry with a use counter; a miss that needs room
+      evicts the entry with the oldest stamp. The scan is over a few dozen
+      entries and only happens next to a render, which costs far more.
+    - Evicting a string only drops the cache's reference; a tile still on
+      screen keeps its bitmap alive until the screen changes.
+    - Render time is what a screen spent rendering strings it missed; hits
+      cost no clock reads. new_screen() closes the current screen's time and
+      samples free heap; report() prints cache and per-screen figures and
+      resets them.
+    """
+
+    def __init__(self, hw, *, budget=4096, clock=time.monotonic_ns):
+        self._render = hw.render_text
+        self._make_tile = hw.make_tile
+        self.budget = budget
+        self.clock = clock
+        self._entries = {}  # text -> [bitmap, nbytes, last use]
+        self._uses = 0
+        self.bytes = 0
+        self._screen_ns = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.screens = 0
+        self.screen_total_ns = 0
+        self.screen_max_ns = 0
+        self.heap_min = None
+
+    def bitmap(self, text):
+        self._uses += 1
+        entry = self._entries.get(text)
+        if entry is not None:
+            entry[2] = self._uses
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        start = self.clock()
+        bitmap = self._render(text)
+        self._screen_ns += self.clock() - start
+        size = bitmap_bytes(bitmap)
+        while self._entries and self.bytes + size > self.budget:
+            self._evict()
+        self._entries[text] = [bitmap, size, self._uses]
+        self.bytes += size
+        return bitmap
+
+    def _evict(self):
+        oldest = None
+        oldest_use = 0
+        for text, entry in self._entries.items():
+            if oldest is None or entry[2] < oldest_use:
+                oldest = text
+                oldest_use = entry[2]
+        self.bytes -= self._entries.pop(oldest)[1]
+        self.evictions += 1
+
+    def label(self, text, x, y):
+        """Tile showing text with its left edge at x, vertically centred on y"""
+        return self._make_tile(self.bitmap(text), x, y)
+
+    def new_screen(self):
+        """Close the screen being drawn: record its render time and the free heap"""
+        if self._screen_ns:
+            self.screens += 1
+            self.screen_total_ns += self._screen_ns
+            if self._screen_ns > self.screen_max_ns:
+                self.screen_max_ns = self._screen_ns
+            self._screen_ns = 0
+        if mem_free:
+            free = mem_free()
+            if self.heap_min is None or free < self.heap_min:
+                self.heap_min = free
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def report(self):
+        mean_ms = self.screen_total_ns / self.screens / 1_000_000 if self.screens else 0
+        heap = f", heap free min {self.heap_min / 1024:.1f} KB" if self.heap_min is not None else ""
+        print(f"text: {len(self._entries)} strings {self.bytes}/{self.budget} B, "
+              f"{self.hits} hits {self.misses} misses {self.evictions} evicted; "
+              f"{self.screens} screens render mean {mean_ms:.2f}ms max {self.screen_max_ns / 1_000_000:.2f}ms{heap}")
+        self.reset_stats()
@@ -0,0 +1,23 @@
+import time
+
+# supervisor.ticks_ms() counts milliseconds modulo 2**29, so it stays a small int
+TICKS_PERIOD = 1 << 29
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALF = TICKS_PERIOD // 2
+
+try:
+    from supervisor import ticks_ms
+except ImportError:
+    def ticks_ms():
+        return (time.monotonic_ns() // 1_000_000) & TICKS_MAX
+
+
+def ticks_diff(a, b):
+    """Signed a - b for ticks_ms values, correct across the 2**29 wrap"""
+    d = (a - b) & TICKS_MAX
+    return d - TICKS_PERIOD if d >= TICKS_HALF else d
+
+
+def ticks_add(ticks, delta):
+    """ticks moved by delta milliseconds, wrapped like ticks_ms"""
+    return (ticks + delta) & TICKS_MAX
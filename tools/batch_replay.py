@@ -0,0 +1,265 @@
+"""
+Batch-replay a fleet's recorded traces with NumPy and report per-level pass rates.
+
+Each trace file is memory-mapped and every level in it is counted with the
+shake detector's logic done as array operations over the whole level: the
+moving-average sums are a cumulative sum differenced at the window, the
+threshold test is |x * n - sum_x| > int(threshold * n) on the action's axes,
+exactly as src/shake_detector.py does it in integers, and only the cooldown
+(which depends on the previous counted shake) is a loop, over runs of moving
+samples rather than over samples. Files are spread over a process pool.
+
+    python tools/batch_replay.py fleet/                 # every *.bin under fleet/
+    python tools/batch_replay.py a.bin b.bin --jobs 4 --json rates.json
+    python tools/batch_replay.py fleet/ --threshold-scale 1.1 --check
+
+Prints, per level and difficulty, how many sessions passed with the replayed
+count and the spread of the counts; --json also writes each count histogram.
+--check replays every level through ShakeDetector as well (as
+tools/replay_trace.py does) and exits 1 if any count differs. Needs NumPy;
+tools/replay_trace.py replays without it.
+"""
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import hal_sim  # noqa: F401  (puts src/ on the path)
+from adxl345_raw import COUNTS_PER_MS2
+from shake_detector import action_mask, AXIS_X, AXIS_Y, AXIS_Z
+from shake_trace import HEADER, MAGIC, RECORD_SIZE, SEED, TICK, TraceLevel, read_trace
+
+DIFFICULTIES = ["EASY", "MED", "HARD"]
+HEADER_SIZE = struct.calcsize(HEADER)
+AXES = ((AXIS_X, "x"), (AXIS_Y, "y"), (AXIS_Z, "z"))
+
+
+class LevelArrays(TraceLevel):
+    """
+    A TraceLevel whose seeds and samples are arrays: seeds/xyz int64 (n, 3),
+    t_ms int64, and the same times as a list in `times` for the cooldown pass
+    """
+
+
+def load_trace(path):
+    """Memory-map a trace file and return its levels as LevelArrays"""
+    record = np.dtype([("dt", "<u2"), ("x", "<i2"), ("y", "<i2"), ("z", "<i2")])
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not a Shake Master trace")
+        # Walk the chunk headers only; samples stay in the mapping until a level is complete
+        levels = []
+        chunks = None
+        pos = len(MAGIC)
+        end = len(mm)
+        while pos < end:
+            kind = mm[pos:pos + 1]
+            pos += 1
+            if kind == b"L":
+                chunks = []
+                levels.append((struct.unpack_from(HEADER, mm, pos), chunks, [None]))
+                pos += HEADER_SIZE
+            elif kind == b"S":
+                (count,) = struct.unpack_from("<H", mm, pos)
+                chunks.append((pos + 2, count))
+                pos += 2 + count * RECORD_SIZE
+            elif kind == b"E":
+                levels[-1][2][0] = struct.unpack_from("<H", mm, pos)[0]
+                pos += 2
+            else:
+                raise ValueError(f"{path}: corrupt trace, chunk type {kind!r} at {pos - 1}")
+
+        result = []
+        for fields, chunks, shake_count in levels:
+            level = LevelArrays(fields)
+            level.shake_count = shake_count[0]
+            if chunks:
+                # One copy per level out of the mapping; no view outlives it
+                records = np.concatenate([np.frombuffer(mm, record, count, offset) for offset, count in chunks])
+            else:
+                records = np.zeros(0, record)
+            is_seed = records["dt"] == SEED
+            xyz = np.stack((records["x"], records["y"], records["z"]), axis=1).astype(np.int64)
+            level.seeds = xyz[is_seed]
+            level.xyz = xyz[~is_seed]
+            # Same float steps as read_trace() and replay_level(): t = ticks * TICK, then round(t * 1000)
+            ticks = np.cumsum(records["dt"][~is_seed].astype(np.int64))
+            level.t_ms = np.round(ticks * TICK * 1000).astype(np.int64)
+            level.times = level.t_ms.tolist()
+            result.append(level)
+    return result
+
+
+def filter_deviation(level, window):
+    """
+    Per sample of a level: the largest |v * n - sum| over the action's axes and
+    n, the samples in the moving average (seeds included, as they prime it)
+    """
+    window = max(1, int(window))
+    series = np.concatenate((level.seeds, level.xyz))
+    sums = np.zeros((len(series) + 1, 3), np.int64)
+    np.cumsum(series, axis=0, out=sums[1:])
+    upper = np.arange(1, len(series) + 1)
+    lower = np.maximum(upper - window, 0)
+    n = upper - lower
+    first = len(level.seeds)
+    n = n[first:]
+    window_sums = sums[upper[first:]] - sums[lower[first:]]
+    mask = action_mask(level.action)
+    deviation = np.zeros(len(n), np.int64)
+    for i, (axis, _) in enumerate(AXES):
+        if mask & axis:
+            np.maximum(deviation, np.abs(level.xyz[:, i] * n - window_sums[:, i]), out=deviation)
+    return deviation, n, bool(mask)
+
+
+def moving_runs(moving):
+    """Runs of moving samples as (starts, stops) lists; a stop is one past its run"""
+    edges = np.diff(moving.astype(np.int8), prepend=0, append=0)
+    return np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()
+
+
+def count_runs(times, starts, stops, cooldown_ms):
+    """
+    Still -> moving edges at least cooldown_ms apart, given the runs of moving
+    samples: at most one per run, at its first sample past the cooldown
+    """
+    count = 0
+    last = None
+    for start, stop in zip(starts, stops):
+        if last is None or times[start] - last > cooldown_ms:
+            i = start
+        else:
+            i = bisect.bisect_right(times, last + cooldown_ms, start, stop)
+            if i == stop:
+                continue
+        count += 1
+        last = times[i]
+    return count
+
+
+def moving_samples(deviation, n, threshold):
+    """Samples over threshold (counts, a Python float) as ShakeDetector tests them"""
+    return deviation > np.floor(threshold * n).astype(np.int64)
+
+
+def replay(level, *, threshold_scale=1.0, cooldown=None, window=None):
+    """The shake count ShakeDetector would give for one LevelArrays"""
+    deviation, n, any_axis = filter_deviation(level, window or level.window)
+    if not any_axis:
+        return 0
+    # Python float arithmetic first, as ShakeDetector.configure() does it
+    threshold = level.threshold * threshold_scale * COUNTS_PER_MS2
+    cooldown_ms = round((level.cooldown if cooldown is None else cooldown) * 1000)
+    return count_runs(level.times, *moving_runs(moving_samples(deviation, n, threshold)), cooldown_ms)
+
+
+def replay_file(path, threshold_scale, cooldown, window, check):
+    """Worker: (level, difficulty, target, tolerance, count, device count, mismatches) per level of a file"""
+    results = []
+    reference = None
+    if check:
+        from replay_trace import replay_level
+        with open(path, "rb") as f:
+            reference = read_trace(f)
+    for i, level in enumerate(load_trace(path)):
+        count = replay(level, threshold_scale=threshold_scale, cooldown=cooldown, window=window)
+        mismatch = None
+        if reference is not None:
+            expected = replay_level(reference[i], threshold_scale=threshold_scale, cooldown=cooldown, window=window)
+            if expected != count:
+                mismatch = f"{path}: level {level.level} batch {count} != ShakeDetector {expected}"
+        results.append((level.level, level.difficulty, level.action, level.target, level.tolerance,
+                        count, level.shake_count, len(level.t_ms), mismatch))
+    return results
+
+
+def trace_paths(args):
+    paths = []
+    for arg in args:
+        if os.path.isdir(arg):
+            for root, _, files in os.walk(arg):
+                paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".bin"))
+        else:
+            paths.append(arg)
+    return paths
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("traces", nargs="+", help="trace files or directories of *.bin")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--threshold-scale", type=float, default=1.0)
+    parser.add_argument("--cooldown", type=float, help="override the recorded shake cooldown (s)")
+    parser.add_argument("--window", type=int, help="override the recorded filter window")
+    parser.add_argument("--check", action="store_true", help="also replay through ShakeDetector and compare")
+    parser.add_argument("--json", metavar="PATH", help="write per-level rates and count histograms")
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("batch_replay.py needs NumPy (pip install numpy); tools/replay_trace.py replays without it")
+
+    paths = trace_paths(args.traces)
+    start = time.perf_counter()
+    groups = {}  # (level, difficulty) -> [action, target, tolerance, counts, passes, device passes]
+    mismatches = []
+    samples = 0
+    options = (args.threshold_scale, args.cooldown, args.window, args.check)
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for results in pool.map(replay_file, paths, *([option] * len(paths) for option in options),
+                                chunksize=max(1, len(paths) // (4 * args.jobs))):
+            for level, difficulty, action, target, tolerance, count, device, n, mismatch in results:
+                group = groups.setdefault((level, difficulty), [action, target, tolerance, [], 0, 0])
+                group[3].append(count)
+                group[4] += target - tolerance <= count <= target + tolerance
+                if device is not None:
+                    group[5] += target - tolerance <= device <= target + tolerance
+                samples += n
+                if mismatch:
+                    mismatches.append(mismatch)
+    wall = time.perf_counter() - start
+
+    report = []
+    print(f"{'level':>5s} {'diff':4s} {'action':10s} {'target':>9s} {'sessions':>8s} {'pass':>6s} "
+          f"{'device':>6s}  counts min/p10/median/p90/max")
+    for (level, difficulty), (action, target, tolerance, counts, passes, device_passes) in sorted(groups.items()):
+        counts.sort()
+        spread = [counts[0], percentile(counts, 0.1), percentile(counts, 0.5), percentile(counts, 0.9), counts[-1]]
+        sessions = len(counts)
+        print(f"{level:5d} {DIFFICULTIES[difficulty]:4s} {action:10s} {target:4d}±{tolerance:<4d} {sessions:8d} "
+              f"{passes / sessions:6.1%} {device_passes / sessions:6.1%}  {'/'.join(map(str, spread))}")
+        histogram = {}
+        for count in counts:
+            histogram[count] = histogram.get(count, 0) + 1
+        report.append({"level": level, "difficulty": DIFFICULTIES[difficulty], "action": action,
+                       "target": target, "tolerance": tolerance, "sessions": sessions,
+                       "pass_rate": passes / sessions, "device_pass_rate": device_passes / sessions,
+                       "counts": histogram})
+    print(f"{len(paths)} files, {sum(len(g[3]) for g in groups.values())} levels, {samples} samples "
+          f"in {wall:.2f}s on {args.jobs} processes ({samples / wall if wall else 0:.0f} samples/s)")
+    if args.json:
+        import json
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.check:
+        for mismatch in mismatches[:20]:
+            print(mismatch)
+        print(f"check: {len(mismatches)} levels differ from ShakeDetector")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Benchmarks for Shake Master's hot loops on the host simulator.
+
+Each benchmark calls one step of the game many times against the simulated
+hardware in hal_sim.py and reports the median and p99 time per call and the
+memory allocated per call. bench_baseline.json holds each step's bytes per
+call and its time as a multiple of a fixed reference step ("ref"); a step that
+allocates more (or more than its own max_alloc) or is more than --tolerance
+slower in ref is reported as a regression and the exit status is 1.
+
+    python tools/bench.py                    # run and check against the baseline
+    python tools/bench.py --only filter      # benchmarks whose name starts with "filter"
+    python tools/bench.py --save             # accept the current figures as the baseline
+
+Host timings say little about the ESP32-C3 and nothing across machines, so no
+absolute time is committed: the reference step runs on the same interpreter
+as the steps, so ref cancels most of the machine's speed. A step over the
+tolerance is measured again and only fails if it is still slow, so one burst
+of host activity doesn't fail the run. Object sizes and interpreter speed
+change between Python versions, so the baseline records the version it was
+saved with and the script refuses to compare against another one; --save
+there, on the last known-good commit, and pass the file with --baseline.
+
+Allocation is the peak traced memory a call adds (tracemalloc), so it catches
+new lists, strings, buffers and labels in a loop, but not floats or small
+tuples served from CPython's free lists.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import hal_sim
+from hal_sim import Simulator, load_game
+import rotary_encoder
+from filters import MovingAverageFilter
+from shake_detector import ShakeDetector
+from hud import HUD
+
+BASELINE_PATH = os.path.join(hal_sim.TOOLS, "bench_baseline.json")
+PYTHON = "%d.%d" % sys.version_info[:2]
+REF_SLACK = 0.1  # Sub-microsecond steps jitter by about this much ref whatever the tolerance
+REPEATS = 5
+REFERENCE = "reference"
+QUADRATURE = (0b11, 0b01, 0b00, 0b10)  # One detent clockwise
+
+
+class Benchmark:
+    """
+    A named step to time; setup() runs once, before any call. With max_alloc
+    a call allocating more than that many bytes fails whatever the baseline says.
+    """
+
+    def __init__(self, name, step, *, calls=20000, setup=None, max_alloc=None):
+        self.name = name
+        self.step = step
+        self.calls = calls
+        self.setup = setup
+        self.max_alloc = max_alloc
+
+
+def load_quiet_game():
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = load_game(Simulator())
+        game.finish_boot()
+    game.recorder = None
+    return game
+
+
+def make_benchmarks(game):
+    def start_level():
+        game.level.prepare(10, 25, None, None, None)
+        game.level.start()
+        game.detector.configure("ANY SHAKE", 2.0 * game.COUNTS_PER_MS2)
+        game.seed_filter()
+
+    def detect_iteration():
+        game.sensor_step()
+        game.detect_step()
+
+    detector = ShakeDetector(game.FILTER_WINDOW)
+    detector.configure("ANY SHAKE", 2.0 * game.COUNTS_PER_MS2)
+
+    # Raw counts, as the detector feeds them
+    filter_small = MovingAverageFilter(game.FILTER_WINDOW, scale=1)
+    filter_large = MovingAverageFilter(64, scale=1)
+
+    rotary_encoder.digitalio = hal_sim.sim_digitalio
+    encoder = rotary_encoder.RotaryEncoder("A", "B", debounce_ms=0, pulses_per_detent=4)
+    pins = encoder._a, encoder._b
+    phase = [0]
+
+    def encoder_update():
+        # Advance the pins one quadrature state every 4 calls, as a steady spin would
+        i = phase[0] = phase[0] + 1
+        state = QUADRATURE[(i >> 2) & 3]
+        pins[0].value = state >> 1
+        pins[1].value = state & 1
+        encoder.update()
+
+    def redraw():
+        game.clear_screen()
+        game.show_centered("*" * 21, 5)
+        game.show_centered("SUCCESS!", 20)
+        game.show_centered("Got: 12", 42)
+
+    # The second reel spinning, its lines built when the first one stopped
+    slot_hud, reel_slot = game.slot_screen()
+    reel_lines = game.reel_lines([game.SLOT_SYMBOLS[0], None, None], 1)
+    frame_counter = [0]
+
+    def slot_frame():
+        n = frame_counter[0] = (frame_counter[0] + 1) % len(reel_lines)
+        game.draw_reels(slot_hud, reel_slot, reel_lines[n])
+
+    # The level HUD's count slot stepping through strings built before the level
+    hud = HUD(game.main_group, game.hw)
+    count_slot = hud.add_slot(40)
+    count_texts = [f"{n}/25" for n in range(51)]
+    count_index = [0]
+
+    def hud_set_text():
+        i = count_index[0] = (count_index[0] + 1) % len(count_texts)
+        hud.set_text(count_slot, count_texts[i])
+
+    # A text longer than a slot, set again every call: compared as shown, so never redrawn
+    long_slot = hud.add_slot(54)
+    long_text = "SHAKE LEFT-RIGHT NOW, FASTER!"
+
+    def hud_set_long_text():
+        hud.set_text(long_slot, long_text)
+
+    return [
+        Benchmark("detect.iteration", detect_iteration, setup=start_level),
+        Benchmark("detector.update", lambda: detector.update(1000, 3, -5, 250), calls=50000),
+        Benchmark("filter.update.w5", lambda: filter_small.update(3, -5, 250), calls=50000),
+        Benchmark("filter.get_average.w5", filter_small.get_average, calls=50000),
+        Benchmark("filter.update.w64", lambda: filter_large.update(3, -5, 250), calls=50000),
+        Benchmark("encoder.update", encoder_update, calls=50000),
+        Benchmark("led.frame", game.led_step),
+        Benchmark("display.redraw", redraw),
+        Benchmark("slot.frame", slot_frame, setup=slot_hud.show, max_alloc=0),
+        Benchmark("hud.set_text", hud_set_text, setup=hud.show, max_alloc=0),
+        Benchmark("hud.set_text.long", hud_set_long_text, setup=hud.show, max_alloc=0),
+    ]
+
+
+def reference_step():
+    """Fixed interpreter work that every median is expressed against"""
+    total = 0
+    for i in range(32):
+        total += i * 3 & 7
+    return total
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def time_pass(bench):
+    """One timed pass: sorted ns per call"""
+    step = bench.step
+    clock = time.perf_counter_ns
+    times = [0] * bench.calls
+    for i in range(bench.calls):
+        start = clock()
+        step()
+        times[i] = clock() - start
+    times.sort()
+    return times
+
+
+def alloc_pass(bench, calls=2000):
+    """Median peak bytes traced during one call"""
+    step = bench.step
+    peaks = [0] * calls
+    tracemalloc.start()
+    try:
+        for i in range(calls):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            step()
+            peaks[i] = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return percentile(peaks, 0.5)
+
+
+def measure(benchmarks):
+    """
+    Median and p99 ns per call and bytes allocated per call for each benchmark,
+    plus the reference step's median. Passes are interleaved across benchmarks
+    and the pass with the best median is kept, so a burst of host activity
+    doesn't read as a slowdown of one step.
+    """
+    reference = Benchmark(REFERENCE, reference_step)
+    for bench in benchmarks:
+        if bench.setup:
+            bench.setup()
+        for _ in range(bench.calls // 10):
+            bench.step()  # Warm up caches, free lists and lazily built state
+    best = {}
+    for _ in range(REPEATS):
+        for bench in [reference] + benchmarks:
+            times = time_pass(bench)
+            kept = best.get(bench.name)
+            if kept is None or percentile(times, 0.5) < percentile(kept, 0.5):
+                best[bench.name] = times
+    reference_ns = max(1, percentile(best[REFERENCE], 0.5))
+    results = {
+        bench.name: {
+            "median_ns": percentile(best[bench.name], 0.5),
+            "p99_ns": percentile(best[bench.name], 0.99),
+            "alloc_bytes": alloc_pass(bench),
+        }
+        for bench in benchmarks
+    }
+    for result in results.values():
+        result["ref"] = result["median_ns"] / reference_ns
+    return results, reference_ns
+
+
+def too_slow(result, baseline, tolerance):
+    return baseline is not None and result["ref"] > baseline["ref"] * (1 + tolerance) + REF_SLACK
+
+
+def compare(bench, result, baseline, tolerance):
+    """Regression notes for one benchmark against its baseline"""
+    notes = []
+    regressed = False
+    if baseline is None:
+        notes.append("no baseline")
+    elif result["alloc_bytes"] > baseline["alloc_bytes"]:
+        notes.append(f"alloc {baseline['alloc_bytes']} -> {result['alloc_bytes']} B")
+        regressed = True
+    if bench.max_alloc is not None and result["alloc_bytes"] > bench.max_alloc:
+        notes.append(f"alloc over its {bench.max_alloc} B limit")
+        regressed = True
+    if baseline is not None:
+        notes.append(f"{result['ref'] / baseline['ref']:.2f}x baseline time")
+        if too_slow(result, baseline, tolerance):
+            regressed = True
+    return notes, regressed
+
+
+def load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+
+def save_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--only", help="run benchmarks whose name starts with this")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown in ref against the baseline (0.5 = 50%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline to check against or save")
+    parser.add_argument("--save", action="store_true", help="write the current figures as the baseline")
+    args = parser.parse_args()
+
+    saved = load_json(args.baseline)
+    if saved and saved.get("python") != PYTHON:
+        if not args.save:
+            sys.exit(f"{args.baseline} was saved with Python {saved.get('python')}, this is {PYTHON}: "
+                     f"allocation and ref don't compare across versions")
+        saved = {}
+    baseline = saved.get("benchmarks", {})
+
+    game = load_quiet_game()
+    benchmarks = [bench for bench in make_benchmarks(game)
+                  if not args.only or bench.name.startswith(args.only)]
+    results, reference_ns = measure(benchmarks)
+    slow = [bench for bench in benchmarks
+            if not args.save and too_slow(results[bench.name], baseline.get(bench.name), args.tolerance)]
+    if slow:
+        # Keep the faster of two measurements for a step that looked slow
+        again, _ = measure(slow)
+        for name, result in again.items():
+            if result["ref"] < results[name]["ref"]:
+                results[name] = result
+    failed = []
+    print(f"reference step {reference_ns / 1000:.2f}us")
+    print(f"{'benchmark':24s} {'median':>10s} {'p99':>10s} {'ref':>8s} {'alloc':>8s}")
+    for bench in benchmarks:
+        result = results[bench.name]
+        notes, regressed = compare(bench, result, baseline.get(bench.name), args.tolerance)
+        if regressed:
+            failed.append(bench.name)
+        print(f"{bench.name:24s} {result['median_ns'] / 1000:8.2f}us {result['p99_ns'] / 1000:8.2f}us "
+              f"{result['ref']:7.2f}x {result['alloc_bytes']:6d} B  {'; '.join(notes)}"
+              f"{'  REGRESSION' if regressed else ''}")
+
+    if args.save:
+        for name, result in results.items():
+            baseline[name] = {"alloc_bytes": result["alloc_bytes"], "ref": round(result["ref"], 3)}
+        save_json(args.baseline, {"python": PYTHON, "benchmarks": baseline})
+        print(f"baseline saved to {args.baseline} (Python {PYTHON})")
+    elif failed:
+        print(f"{len(failed)} regression(s): {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compare the ADXL345 activity backend with the software detector on recorded traces.
+
+Each level in the trace is counted twice: by src/shake_detector.py, as
+tools/replay_trace.py does, and by src/adxl345_activity.py programming the
+activity engine of the fake sensor in tools/fake_adxl345.py, which is fed the
+same raw samples at their recorded times and polled after each one. Per level
+it prints both counts and the verdicts they give, then how often the two agree,
+so DETECTION_BACKEND = "adxl345" can be judged against real sessions first.
+
+    python tools/compare_detectors.py traces.bin
+    python tools/compare_detectors.py traces.bin --threshold-scale 0.8
+
+THRESH_ACT has 62.5 mg steps, so a level threshold is rounded to the nearest
+step; --threshold-scale scales the hardware threshold only. The chip samples
+at its own output data rate while a trace holds the samples the game read, so
+on the device the activity engine sees at least as many samples as here.
+"""
+import argparse
+
+from fake_adxl345 import FakeADXL345I2C
+from replay_trace import replay_level
+from adxl345_activity import ADXL345Activity, thresh_counts
+from adxl345_raw import COUNTS_PER_MS2
+from shake_trace import read_trace
+
+
+def hardware_count(trace_level, *, threshold_scale=1.0):
+    """Run one TraceLevel through the fake sensor's activity engine; returns the shake count"""
+    bus = FakeADXL345I2C()
+    detector = ADXL345Activity(bus)
+    detector.configure(trace_level.action, trace_level.threshold * threshold_scale * COUNTS_PER_MS2,
+                       cooldown_ms=round(trace_level.cooldown * 1000))
+    if trace_level.seeds:
+        bus.feed(0.0, trace_level.seeds[-1])  # The baseline becomes the first reference
+    for t, x, y, z in trace_level.samples:
+        bus.feed(t, (x, y, z))
+        detector.poll(round(t * 1000))
+    return detector.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("traces", nargs="+")
+    parser.add_argument("--threshold-scale", type=float, default=1.0,
+                        help="scale the hardware threshold before rounding to THRESH_ACT")
+    args = parser.parse_args()
+
+    total = same_count = same_verdict = 0
+    abs_diff = 0
+    for path in args.traces:
+        with open(path, "rb") as f:
+            levels = read_trace(f)
+        for tl in levels:
+            software = replay_level(tl)
+            hardware = hardware_count(tl, threshold_scale=args.threshold_scale)
+            low, high = tl.target - tl.tolerance, tl.target + tl.tolerance
+            sw_pass = low <= software <= high
+            hw_pass = low <= hardware <= high
+            total += 1
+            same_count += software == hardware
+            same_verdict += sw_pass == hw_pass
+            abs_diff += abs(software - hardware)
+            thresh = thresh_counts(tl.threshold * args.threshold_scale * COUNTS_PER_MS2)
+            print(f"{path}: level {tl.level:2d} {tl.action:10s} threshold {tl.threshold:.2f} "
+                  f"(THRESH_ACT {thresh})  software {software} {'PASS' if sw_pass else 'FAIL'}  "
+                  f"adxl345 {hardware} {'PASS' if hw_pass else 'FAIL'}"
+                  f"{'' if software == hardware else '  <- differs'}")
+    if not total:
+        print("no levels in the traces")
+        return
+    print(f"{same_count}/{total} levels count the same, {same_verdict}/{total} give the same verdict, "
+          f"mean |difference| {abs_diff / total:.2f} shakes")
+
+
+if __name__ == "__main__":
+    main()
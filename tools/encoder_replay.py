@@ -0,0 +1,114 @@
+"""
+Replay quadrature edge streams through the RotaryEncoder decoder and count lost steps.
+
+Each stream is a list of (t_ms, a, b) edges. Synthetic streams model an encoder
+with jittered edge spacing and contact bounce spun at a steady speed; a recorded
+stream can be given as a CSV of "t_ms,a,b" lines. Every stream is replayed through
+each sampling strategy and the decoded detents are compared with the true count.
+
+    python tools/encoder_replay.py
+    python tools/encoder_replay.py --csv capture.csv --detents 20
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from rotary_encoder import QuadratureDecoder  # noqa: E402
+
+PULSES_PER_DETENT = 2  # As configured in code.py
+GRAY_CW = (0b11, 0b10, 0b00, 0b01)  # Clockwise from the idle (pulled-up) state
+
+# name -> (sample period in ms, debounced); "keypad" scans in the background and
+# feeds every observed change straight to the state machine
+SAMPLERS = [
+    ("poll 10ms (old menu loop)", 10.0, True),
+    ("poll 5ms", 5.0, True),
+    ("poll 2ms (encoder task)", 2.0, True),
+    ("keypad 1ms scan", 1.0, False),
+]
+
+
+def synthetic_stream(detents_per_s, detents, *, jitter=0.25, bounce_ms=0.3, seed=1):
+    """Edges for `detents` clockwise detents at a steady speed, with jitter and bounce"""
+    rng = random.Random(seed)
+    edge_ms = 1000.0 / (detents_per_s * PULSES_PER_DETENT)
+    edges = []
+    t = 5.0
+    state = GRAY_CW[0]
+    for i in range(detents * PULSES_PER_DETENT):
+        t += edge_ms * (1 + rng.uniform(-jitter, jitter))
+        new_state = GRAY_CW[(i + 1) % 4]
+        changed = state ^ new_state
+        # Contact bounce: the changing pin chatters briefly before settling
+        if bounce_ms:
+            for _ in range(rng.randint(0, 2)):
+                bt = t + rng.uniform(0, bounce_ms * 0.8)
+                edges.append((bt, new_state))
+                edges.append((bt + bounce_ms * 0.1, new_state ^ changed))
+        edges.append((t + bounce_ms, new_state))
+        state = new_state
+    edges.sort()
+    return edges
+
+
+def load_csv(path):
+    edges = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            t, a, b = line.split(",")[:3]
+            edges.append((float(t), int(a) << 1 | int(b)))
+    return edges
+
+
+def replay(edges, period_ms, debounced):
+    """Sample the stream every period_ms and return (detents decoded, skipped states)"""
+    decoder = QuadratureDecoder(pulses_per_detent=PULSES_PER_DETENT, state=GRAY_CW[0])
+    decoder._last_change_time = decoder._last_step_time = decoder._last_update_time = 0
+    end = edges[-1][0] + 50 if edges else 0
+    state = GRAY_CW[0]
+    i = 0
+    t = 0.0
+    while t <= end:
+        while i < len(edges) and edges[i][0] <= t:
+            state = edges[i][1]
+            i += 1
+        now = int(t)
+        if debounced:
+            decoder.feed(state, now)
+        elif state != decoder._last_stable:
+            decoder._transition(state, now)
+        t += period_ms
+    return decoder.position, decoder.skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--csv", help="recorded edge stream: t_ms,a,b per line")
+    parser.add_argument("--detents", type=int, help="true detent count of the recorded stream")
+    parser.add_argument("--speeds", default="2,5,10,20,40,60", help="synthetic spin speeds, detents/s")
+    args = parser.parse_args()
+
+    if args.csv:
+        streams = [(os.path.basename(args.csv), load_csv(args.csv), args.detents)]
+    else:
+        streams = []
+        for speed in (float(v) for v in args.speeds.split(",")):
+            detents = max(10, int(speed * 2))
+            streams.append((f"{speed:g} det/s", synthetic_stream(speed, detents), detents))
+
+    width = max(len(name) for name, _, _ in SAMPLERS)
+    for stream_name, edges, expected in streams:
+        print(f"{stream_name}: {expected if expected is not None else '?'} detents")
+        for name, period, debounced in SAMPLERS:
+            decoded, skipped = replay(edges, period, debounced)
+            lost = "" if expected is None else f"  lost {expected - decoded}"
+            print(f"  {name:<{width}}  decoded {decoded:4d}  skipped states {skipped:4d}{lost}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Host-side stand-in for a busio.I2C bus with an ADXL345 on it.
+
+Models the registers the game touches (DEVID, BW_RATE, POWER_CTL, DATA_FORMAT,
+DATAX0..DATAZ1, FIFO_CTL, FIFO_STATUS) including the 32-entry FIFO in bypass
+and stream mode, with the output registers holding a 33rd sample and the
+overrun bit in INT_SOURCE, and counts bus transactions so acquisition modes
+can be compared.
+The activity engine (THRESH_ACT, THRESH_INACT, TIME_INACT, ACT_INACT_CTL, the
+link bit, INT_ENABLE/INT_MAP/INT_SOURCE and the INT1 line) is modelled for
+src/adxl345_activity.py.
+
+Run directly to check src/adxl345_fifo.py against it: block reads return
+every sample in order, a full FIFO is not an overrun, and a stall that
+overwrites samples is counted once and leaves the newest 33. The exit status
+is 1 when a check fails.
+    python tools/fake_adxl345.py
+"""
+import math
+import os
+import sys
+
+ADDRESS = 0x53
+
+_REG_DEVID = 0x00
+_REG_THRESH_ACT = 0x24
+_REG_THRESH_INACT = 0x25
+_REG_TIME_INACT = 0x26
+_REG_ACT_INACT_CTL = 0x27
+_REG_BW_RATE = 0x2C
+_REG_POWER_CTL = 0x2D
+_REG_INT_ENABLE = 0x2E
+_REG_INT_MAP = 0x2F
+_REG_INT_SOURCE = 0x30
+_REG_DATA_FORMAT = 0x31
+_REG_DATAX0 = 0x32
+_REG_FIFO_CTL = 0x38
+_REG_FIFO_STATUS = 0x39
+
+_FIFO_DEPTH = 32
+_FIFO_ENTRIES = _FIFO_DEPTH + 1  # The output registers hold one more
+_INT_OVERRUN = 0x01
+_INT_ACTIVITY = 0x10
+_INT_INACTIVITY = 0x08
+_THRESH_COUNTS = 62.5 / 4  # THRESH_ACT/INACT LSB (62.5 mg) in data counts (4 mg)
+_BW_RATE_HZ = {0x08: 25, 0x09: 50, 0x0A: 100, 0x0B: 200, 0x0C: 400, 0x0D: 800, 0x0E: 1600, 0x0F: 3200}
+
+
+class FakeADXL345I2C:
+    """
+    FakeADXL345I2C(source=None)
+    - source(t) -> (x, y, z) raw counts at time t seconds; defaults to 1 g on Z.
+    - advance(seconds) runs the sensor clock, producing samples at the
+      configured output data rate while POWER_CTL has the measure bit set.
+    - feed(t, counts) takes one sample at time t instead, for replaying
+      recorded traces through the activity engine.
+    - Activity is AC-coupled as on the chip: a sample further than THRESH_ACT
+      from the reference on an enabled axis is activity, the reference being
+      the sample where detection started. Inactivity re-takes its reference
+      whenever a sample moves past THRESH_INACT and fires after TIME_INACT
+      seconds without one. With the link bit set each arms the other.
+    """
+
+    def __init__(self, source=None):
+        self.source = source or (lambda t: (0, 0, 256))
+        self.regs = bytearray(64)
+        self.regs[_REG_DEVID] = 0xE5
+        self.regs[_REG_BW_RATE] = 0x0A
+        self.fifo = []
+        self.latest = (0, 0, 0)
+        self.time = 0.0
+        self._next_sample = 0.0
+        self._locked = False
+        self._pending_reg = 0
+        self.transactions = 0
+        self.locks = 0
+        self.bytes_read = 0
+        self.overflows = 0
+        self._awaiting_inactivity = False
+        self._reference = None
+        self._still_since = 0.0
+
+    # ----- sensor model -----
+    @property
+    def rate_hz(self):
+        return _BW_RATE_HZ.get(self.regs[_REG_BW_RATE] & 0x0F, 100)
+
+    @property
+    def fifo_mode(self):
+        return self.regs[_REG_FIFO_CTL] >> 6
+
+    @property
+    def measuring(self):
+        return bool(self.regs[_REG_POWER_CTL] & 0x08)
+
+    def advance(self, seconds):
+        end = self.time + seconds
+        period = 1.0 / self.rate_hz
+        while self._next_sample <= end:
+            self.time = self._next_sample
+            self._next_sample += period
+            if self.measuring:
+                self._sample(self.source(self.time))
+        self.time = end
+
+    @property
+    def int1(self):
+        """INT1 level: an enabled interrupt routed to INT1 is latched in INT_SOURCE"""
+        return bool(self.regs[_REG_INT_SOURCE] & self.regs[_REG_INT_ENABLE] & ~self.regs[_REG_INT_MAP])
+
+    def feed(self, t, counts):
+        self.time = t
+        self._sample(counts)
+
+    def _activity(self, sample):
+        regs = self.regs
+        enables = regs[_REG_INT_ENABLE] & (_INT_ACTIVITY | _INT_INACTIVITY)
+        if not enables:
+            self._reference = None
+            return
+        ctl = regs[_REG_ACT_INACT_CTL]
+        linked = regs[_REG_POWER_CTL] & 0x20
+        if self._reference is None:
+            self._reference = sample
+            self._still_since = self.time
+            self._awaiting_inactivity = False
+            return
+        ref = self._reference
+        if not self._awaiting_inactivity:
+            axes = ctl >> 4 & 0x07
+            threshold = regs[_REG_THRESH_ACT] * _THRESH_COUNTS
+            if not ctl & 0x80:
+                ref = (0, 0, 0)
+            if self._exceeds(sample, ref, axes, threshold):
+                if enables & _INT_ACTIVITY:
+                    regs[_REG_INT_SOURCE] |= _INT_ACTIVITY
+                if linked:
+                    self._awaiting_inactivity = True
+                self._reference = sample
+                self._still_since = self.time
+            return
+        axes = ctl & 0x07
+        threshold = regs[_REG_THRESH_INACT] * _THRESH_COUNTS
+        if not ctl & 0x08:
+            ref = (0, 0, 0)
+        if self._exceeds(sample, ref, axes, threshold):
+            self._reference = sample
+            self._still_since = self.time
+        elif self.time - self._still_since >= regs[_REG_TIME_INACT]:
+            if enables & _INT_INACTIVITY:
+                regs[_REG_INT_SOURCE] |= _INT_INACTIVITY
+            self._awaiting_inactivity = False
+            self._reference = sample
+
+    @staticmethod
+    def _exceeds(sample, ref, axes, threshold):
+        # ACT_INACT_CTL axis bits run X, Y, Z from the high bit down
+        for i in range(3):
+            if axes & (4 >> i) and abs(sample[i] - ref[i]) > threshold:
+                return True
+        return False
+
+    def _sample(self, counts):
+        self.latest = tuple(int(v) for v in counts)
+        self._activity(self.latest)
+        if self.fifo_mode == 0:
+            return
+        if len(self.fifo) >= _FIFO_ENTRIES:
+            if self.fifo_mode != 0b10:
+                return  # FIFO mode stops collecting when full
+            self.fifo.pop(0)  # Stream mode overwrites the oldest entry
+            self.overflows += 1
+            self.regs[_REG_INT_SOURCE] |= _INT_OVERRUN
+        self.fifo.append(self.latest)
+
+    def _output(self):
+        if self.fifo_mode != 0 and self.fifo:
+            return self.fifo[0]
+        return self.latest
+
+    def _read_reg(self, reg):
+        if _REG_DATAX0 <= reg < _REG_DATAX0 + 6:
+            value = self._output()[(reg - _REG_DATAX0) // 2] & 0xFFFF
+            return value & 0xFF if (reg - _REG_DATAX0) % 2 == 0 else value >> 8
+        if reg == _REG_FIFO_STATUS:
+            return len(self.fifo)
+        if reg == _REG_INT_SOURCE:
+            # Reading INT_SOURCE clears the activity and inactivity latches
+            value = self.regs[reg]
+            self.regs[reg] &= ~(_INT_ACTIVITY | _INT_INACTIVITY)
+            return value
+        return self.regs[reg]
+
+    def _read(self, reg, buf, start, end):
+        for i in range(start, end):
+            buf[i] = self._read_reg((reg + i - start) & 0x3F)
+        self.bytes_read += end - start
+        # Reading any data register pops one FIFO entry at the end of the transfer
+        # and clears the overrun bit
+        if reg <= _REG_DATAX0 + 5 and reg + end - start > _REG_DATAX0:
+            self.regs[_REG_INT_SOURCE] &= ~_INT_OVERRUN
+            if self.fifo_mode != 0 and self.fifo:
+                self.fifo.pop(0)
+
+    # ----- busio.I2C API -----
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        self.locks += 1
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def scan(self):
+        return [ADDRESS]
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        self._check(address)
+        end = len(buffer) if end is None else end
+        self.transactions += 1
+        if end - start < 1:
+            return
+        reg = buffer[start]
+        for i, value in enumerate(buffer[start + 1:end]):
+            r = (reg + i) & 0x3F
+            if r == _REG_FIFO_CTL and (value >> 6) == 0:
+                self.fifo.clear()  # Bypass mode empties the FIFO
+            if r in (_REG_POWER_CTL, _REG_ACT_INACT_CTL, _REG_INT_ENABLE):
+                self._reference = None  # Detection restarts from the next sample
+            if r == _REG_INT_SOURCE:
+                continue  # Read-only
+            self.regs[r] = value
+        self._pending_reg = reg
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        self._check(address)
+        end = len(buffer) if end is None else end
+        self.transactions += 1
+        self._read(self._pending_reg, buffer, start, end)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        self._check(address)
+        in_end = len(buffer_in) if in_end is None else in_end
+        self.transactions += 1
+        self._read(buffer_out[out_start], buffer_in, in_start, in_end)
+
+    def _check(self, address):
+        if address != ADDRESS:
+            raise OSError(19, f"No I2C device at 0x{address:02X}")  # ENODEV, as busio does
+
+
+def _check():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+    from adxl345_fifo import ADXL345FIFO, FIFO_ENTRIES
+
+    # X counts the samples taken, so a block shows exactly which samples it holds
+    bus = FakeADXL345I2C(lambda t: (round(t * 100), 0, 256))
+    fifo = ADXL345FIFO(bus, rate_hz=100)
+    failures = []
+
+    def drain(seconds):
+        bus.advance(seconds)
+        locks = bus.locks
+        count = fifo.read_block()
+        if bus.locks != locks + 1:
+            failures.append(f"block read took {bus.locks - locks} bus locks")
+        return list(fifo.x[:count])
+
+    # Drain every 250 ms, as a loop stalled by display and LED work would
+    drain(0)
+    samples = []
+    for _ in range(10):
+        samples += drain(0.25)
+    expected = list(range(1, 251))
+    if samples != expected:
+        failures.append(f"steady drains: {len(samples)} samples, expected 1..250 in order")
+    if fifo.overruns:
+        failures.append(f"steady drains: {fifo.overruns} overruns, expected none")
+    print(f"steady: {len(samples)} samples over {bus.time:.2f}s at {fifo.rate_hz} Hz in 10 bus locks")
+
+    # Exactly full: 33 samples and nothing lost
+    block = drain((FIFO_ENTRIES + 0.5) / 100)
+    if block != list(range(251, 251 + FIFO_ENTRIES)) or fifo.overruns:
+        failures.append(f"full FIFO: {len(block)} samples, {fifo.overruns} overruns, "
+                        f"expected {FIFO_ENTRIES} in order and none")
+    print(f"full: {len(block)} samples, {fifo.overruns} overruns")
+
+    # A 1 s stall overwrites the oldest samples: one overrun, the newest 33 kept
+    block = drain(1.0)
+    newest = int(bus.time * 100)  # Drains fall between samples
+    if block != list(range(newest - FIFO_ENTRIES + 1, newest + 1)) or fifo.overruns != 1:
+        failures.append(f"stall: {len(block)} samples ending at {block[-1] if block else None}, "
+                        f"{fifo.overruns} overruns, expected the newest {FIFO_ENTRIES} and one")
+    # The overrun bit was cleared by the reads, so a normal drain after it is clean
+    block = drain(0.1)
+    if len(block) != 10 or fifo.overruns != 1:
+        failures.append(f"after stall: {len(block)} samples, {fifo.overruns} overruns, expected 10 and one")
+    print(f"stall: {bus.overflows} samples overwritten, {fifo.overruns} overrun counted")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _check()
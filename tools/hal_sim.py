@@ -0,0 +1,527 @@
+"""
+Linux host simulator backend for src/hal.py.
+
+Simulator is a hal.Hardware whose parts are all simulated: the ADXL345 is the
+register-level fake from fake_adxl345.py driven by a scripted Motion, the display
+keeps its labels as text, buttons and the encoder are pressed/turned by scripts,
+and time is a VirtualClock. run() drives the game on an asyncio loop whose
+timers advance the virtual clock instead of sleeping, so a 20 s level takes
+milliseconds of wall time.
+
+    hw = Simulator(seed=1)
+    game = load_game(hw)          # imports src/code.py against the simulator
+    hw.run(game.run(), timeout=120)
+
+AutoPlayer reads the simulated screen and plays the whole game headless.
+"""
+import asyncio
+import importlib.util
+import os
+import random
+import selectors
+import sys
+import tracemalloc
+import types
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(TOOLS, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import hal  # noqa: E402
+from adxl345_raw import ADXL345Raw, MS2_PER_COUNT  # noqa: E402
+from ticks import TICKS_MAX  # noqa: E402
+from fake_adxl345 import FakeADXL345I2C  # noqa: E402
+from page_buffer import FULL_FRAME_BYTES, PageBuffer  # noqa: E402
+
+GRAVITY = 9.80665
+# Heap the simulator reports free space against while tracemalloc is tracing;
+# only blocks allocated from the game's own code (src/) count as used
+SIM_HEAP_BYTES = 1 << 20
+GAME_HEAP = (tracemalloc.Filter(True, os.path.join(SRC, "*")),)
+SIM_NVM_BYTES = 256  # Erased flash reads 0xFF
+
+
+# ========== Virtual Time ==========
+class VirtualClock:
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def advance(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """Selector whose blocking wait jumps the virtual clock instead of sleeping"""
+
+    def __init__(self, clock):
+        super().__init__()
+        self._clock = clock
+
+    def select(self, timeout=None):
+        if timeout:
+            self._clock.advance(timeout)
+        return super().select(0)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """asyncio loop on a VirtualClock: asyncio.sleep() and wait_for() use virtual seconds"""
+
+    def __init__(self, clock):
+        super().__init__(_VirtualSelector(clock))
+        self._clock = clock
+
+    def time(self):
+        return self._clock.now
+
+
+# ========== Accelerometer ==========
+class Motion:
+    """
+    Scripted device motion in m/s^2: gravity on Z plus shake pulses and optional noise.
+    pulse(axis, at) adds one short, sharp jerk, which the game counts as one shake.
+    """
+
+    AXES = {"x": 0, "y": 1, "z": 2}
+
+    def __init__(self, *, noise=0.05, seed=0):
+        self.noise = noise
+        self._rng = random.Random(seed)
+        self._pulses = []
+
+    def pulse(self, axis, at, *, amplitude=8.0, width=0.04):
+        self._pulses.append((at, at + width, self.AXES[axis], amplitude))
+
+    def acceleration(self, t):
+        accel = [0.0, 0.0, GRAVITY]
+        keep = []
+        for start, end, axis, amplitude in self._pulses:
+            if t < end:
+                keep.append((start, end, axis, amplitude))
+                if t >= start:
+                    accel[axis] += amplitude
+        self._pulses = keep
+        if self.noise:
+            for i in range(3):
+                accel[i] += self._rng.gauss(0, self.noise)
+        return accel
+
+    def counts(self, t):
+        return tuple(int(v / MS2_PER_COUNT) for v in self.acceleration(t))
+
+
+BITS_PER_BYTE = 9  # 8 data bits + ACK
+
+
+class SimI2C(FakeADXL345I2C):
+    """
+    Fake ADXL345 bus that catches the sensor up to the virtual clock on every
+    lock; each transaction takes its bus time (bytes incl. addresses at frequency)
+    off the virtual clock.
+    """
+
+    def __init__(self, clock, source, *, frequency=hal.I2C_FREQUENCY):
+        super().__init__(source)
+        self._clock = clock
+        self.frequency = frequency
+
+    def _hold(self, nbytes):
+        self._clock.advance(nbytes * BITS_PER_BYTE / self.frequency)
+
+    def try_lock(self):
+        if self._clock.now > self.time:
+            self.advance(self._clock.now - self.time)
+        return super().try_lock()
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        super().writeto(address, buffer, start=start, end=end)
+        self._hold(1 + (len(buffer) if end is None else end) - start)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        super().readfrom_into(address, buffer, start=start, end=end)
+        self._hold(1 + (len(buffer) if end is None else end) - start)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        super().writeto_then_readfrom(address, buffer_out, buffer_in, out_start=out_start, out_end=out_end,
+                                      in_start=in_start, in_end=in_end)
+        out_end = len(buffer_out) if out_end is None else out_end
+        in_end = len(buffer_in) if in_end is None else in_end
+        self._hold(2 + out_end - out_start + in_end - in_start)
+
+
+class SimIntPin:
+    """The fake ADXL345's INT1 line as a DigitalInOut, caught up to the virtual clock on read"""
+
+    def __init__(self, clock, bus):
+        self._clock = clock
+        self._bus = bus
+
+    @property
+    def value(self):
+        bus = self._bus
+        if self._clock.now > bus.time:
+            bus.advance(self._clock.now - bus.time)
+        return bus.int1
+
+
+# ========== Display ==========
+GLYPH_WIDTH = 6
+GLYPH_HEIGHT = 12
+
+
+class Group(list):
+    """displayio.Group subset: append/pop/len over child labels"""
+
+
+class Label:
+    """
+    A TileGrid holding one line of text, centred on y. tile is (x, width) of a
+    HUD slot's fixed screen-wide tile, whose text x moves inside it; None for
+    a tile the size of its text.
+    """
+
+    def __init__(self, text, x, y, *, tile=None):
+        self.text = text
+        self.x = x
+        self.y = y
+        self.tile = tile
+
+
+class SimBitmap:
+    """Rendered text stand-in: terminalio cell size, keeps the string"""
+
+    def __init__(self, text):
+        self.text = text
+        self.width = max(1, len(text)) * GLYPH_WIDTH
+        self.height = GLYPH_HEIGHT
+
+
+def glyph_columns(char):
+    """Stand-in 5x10 glyph bitmap for char as column bits; distinct per character"""
+    if char == " ":
+        return (0, 0, 0, 0, 0)
+    h = (ord(char) * 0x9E3779B1) & 0xFFFFFFFF
+    return tuple((((h >> (col * 6)) | 0x201) & 0x3FF) << 1 for col in range(5))
+
+
+class SimDisplay:
+    """
+    Display stand-in. Every refresh() rasterises the labels into a PageBuffer in
+    the SSD1306 memory layout and counts the I2C bytes of the changed windows
+    (bytes_sent) next to what full-frame pushes would cost (full_frame_bytes).
+    With a clock, the transfer's bus time at frequency passes on it.
+    With raster=False refresh() only counts frames: no bytes, no bus time.
+    """
+
+    width = hal.DISPLAY_WIDTH
+    height = hal.DISPLAY_HEIGHT
+
+    def __init__(self, clock=None, *, frequency=hal.I2C_FREQUENCY, raster=True):
+        self._clock = clock
+        self.frequency = frequency
+        self.raster = raster
+        self.root_group = None
+        self.auto_refresh = True
+        self.refreshes = 0
+        self.pages = PageBuffer(self.width, self.height)
+        self.full_frame_bytes = 0
+
+    @property
+    def bytes_sent(self):
+        return self.pages.bytes_sent
+
+    def refresh(self, *, target_frames_per_second=None, minimum_frames_per_second=0):
+        self.refreshes += 1
+        if not self.raster:
+            return True
+        self.rasterize()
+        sent = self.pages.flush()
+        self.full_frame_bytes += FULL_FRAME_BYTES
+        if self._clock:
+            self._clock.advance(sent * BITS_PER_BYTE / self.frequency)
+        return True
+
+    def rasterize(self):
+        """Draw the labels into the page buffer (terminalio-sized cells, centred on y)"""
+        pages = self.pages
+        pages.fill(False)
+        for item in self.root_group or ():
+            top = item.y - GLYPH_HEIGHT // 2
+            for i, char in enumerate(item.text):
+                x = item.x + i * GLYPH_WIDTH
+                for col, bits in enumerate(glyph_columns(char)):
+                    row = 0
+                    while bits:
+                        if bits & 1:
+                            pages.pixel(x + col, top + row)
+                        bits >>= 1
+                        row += 1
+
+    def labels(self):
+        """Visible labels as (y, x, text), top to bottom"""
+        return sorted((item.y, item.x, item.text) for item in self.root_group or ())
+
+    def text(self):
+        return " | ".join(text for _, _, text in self.labels())
+
+
+# ========== Pixels / Inputs ==========
+class SimPixels:
+    def __init__(self, n):
+        self.n = n
+        self.brightness = 1.0
+        self.auto_write = True
+        self._colors = [(0, 0, 0)] * n
+        self.shown = [(0, 0, 0)] * n
+        self.shows = 0
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        return self._colors[i]
+
+    def __setitem__(self, i, color):
+        self._colors[i] = tuple(color)
+
+    def fill(self, color):
+        self._colors = [tuple(color)] * self.n
+
+    def show(self):
+        self.shown = list(self._colors)
+        self.shows += 1
+
+
+class SimButton:
+    """DigitalInOut stand-in with a pull-up: value is False while pressed"""
+
+    def __init__(self, clock):
+        self._clock = clock
+        self._release_at = -1.0
+
+    @property
+    def value(self):
+        return not (self._clock.now < self._release_at)
+
+    def press(self, hold=0.1):
+        self._release_at = self._clock.now + hold
+
+
+class SimPin:
+    """digitalio.DigitalInOut stand-in whose level is set by a script"""
+
+    def __init__(self, pin=None):
+        self.pin = pin
+        self.value = True
+        self.direction = None
+        self.pull = None
+
+    def deinit(self):
+        pass
+
+
+# Drop-in for the digitalio module where a driver builds its own pins (RotaryEncoder)
+sim_digitalio = types.SimpleNamespace(
+    DigitalInOut=SimPin,
+    Direction=types.SimpleNamespace(INPUT="input", OUTPUT="output"),
+    Pull=types.SimpleNamespace(UP="up", DOWN="down"),
+)
+
+
+class SimEncoder:
+    def __init__(self):
+        self.position = 0
+
+    def turn(self, steps=1):
+        self.position += steps
+
+
+# ========== Backend ==========
+class Simulator(hal.Hardware):
+    """
+    Simulator(*, seed=0, noise=0.05, restart_button=True, nvm=None, raster=True)
+    - Headless hal.Hardware on a VirtualClock; seed fixes sensor noise and the
+      game's random module so runs are repeatable.
+    - nvm starts erased unless a bytearray is passed in; pass the previous
+      Simulator's hw.nvm to boot the "same unit" again.
+    - raster=False skips drawing frames into the SSD1306 page buffer, for
+      runs that don't look at display bytes (the soak test); frames then
+      take no bus time.
+    """
+
+    name = "sim"
+    encoder_kind = "sim"
+
+    def __init__(self, *, seed=0, noise=0.05, restart_button=True, nvm=None, raster=True):
+        random.seed(seed)
+        self.clock = VirtualClock()
+        self.motion = Motion(noise=noise, seed=seed)
+        self.i2c = SimI2C(self.clock, self.motion.counts)
+        self.i2c_frequency = self.i2c.frequency
+        self.accel_int = SimIntPin(self.clock, self.i2c)
+        self.display = SimDisplay(self.clock, raster=raster)
+        self.main_group = Group()
+        self.display.root_group = self.main_group
+        self.encoder_button = SimButton(self.clock)
+        self.restart_button = SimButton(self.clock) if restart_button else None
+        self.nvm = bytearray(b"\xff" * SIM_NVM_BYTES) if nvm is None else nvm
+
+    def boot_steps(self):
+        # Same deferred parts as the device, so the host runs the same boot path
+        steps = (("accelerometer", lambda: setattr(self, "accelerometer", ADXL345Raw(self.i2c))),
+                 ("encoder", lambda: setattr(self, "encoder", SimEncoder())),
+                 ("pixels", lambda: setattr(self, "pixels", SimPixels(hal.PIXEL_COUNT))))
+        return tuple(step for step in steps if getattr(self, step[0]) is None)
+
+    def monotonic(self):
+        return self.clock.now
+
+    def monotonic_ns(self):
+        return int(self.clock.now * 1_000_000_000)
+
+    def ticks_ms(self):
+        return int(self.clock.now * 1000) & TICKS_MAX
+
+    def mem_free(self):
+        """SIM_HEAP_BYTES less what src/ code holds of what was allocated since tracing started"""
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces(GAME_HEAP)
+        return SIM_HEAP_BYTES - sum(stat.size for stat in snapshot.statistics("filename"))
+
+    def render_text(self, text):
+        return SimBitmap(text)
+
+    def make_tile(self, bitmap, x, y):
+        return Label(bitmap.text, x, y)
+
+    def make_text_slot(self, y):
+        label = Label("", 0, y, tile=(0, self.display.width))
+        return label, label
+
+    def draw_text(self, canvas, text, x):
+        canvas.text = text
+        canvas.x = x
+
+    def run(self, coro, *, timeout=None):
+        """Run coro in virtual time; timeout is in virtual seconds"""
+        loop = VirtualTimeLoop(self.clock)
+        try:
+            if timeout is not None:
+                coro = asyncio.wait_for(coro, timeout)
+            return loop.run_until_complete(coro)
+        finally:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+
+def load_game(hardware):
+    """Install hardware as the HAL backend and import a fresh copy of src/code.py"""
+    hal.use(hardware)
+    spec = importlib.util.spec_from_file_location("game", os.path.join(SRC, "code.py"))
+    game = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(game)
+    return game
+
+
+# ========== Scripted Player ==========
+ACTION_AXES = {"LEFT-RIGHT": "x", "FWD-BACK": "y", "UP-DOWN": "z"}
+DIFFICULTY_BRACKET_X = {4: 0, 44: 1, 89: 2}  # "[" label x -> selected difficulty
+
+
+class AutoPlayer:
+    """
+    AutoPlayer(hw, *, difficulty=0, games=1, overshoot=0, seed=0, keep_results=True)
+    - Reads the simulated screen and presses, turns and shakes like a player:
+      picks the difficulty, shakes target + overshoot times per level, stops
+      slot reels at random moments and restarts after each result screen.
+    - run() returns after `games` results. `played` counts them and
+      `last_result` holds the latest (result, score, time); with keep_results
+      they are all collected in `results`, otherwise it stays empty so long
+      runs hold nothing per game.
+    """
+
+    SHAKE_INTERVAL = 0.35  # Just over the game's 0.3 s shake cooldown
+
+    def __init__(self, hw, *, difficulty=0, games=1, overshoot=0, seed=0, keep_results=True):
+        self.hw = hw
+        self.difficulty = difficulty
+        self.games = games
+        self.overshoot = overshoot
+        self.keep_results = keep_results
+        self.results = []
+        self.played = 0
+        self.last_result = None
+        self._rng = random.Random(seed)
+        self._next_shake = 0.0
+        self._on_result = False
+
+    def _click(self, button):
+        button.press(0.1)
+
+    def _slot_button(self):
+        return self.hw.restart_button or self.hw.encoder_button
+
+    async def run(self):
+        hw = self.hw
+        while self.played < self.games:
+            labels = hw.display.labels()
+            texts = [text for _, _, text in labels]
+            now = hw.clock.now
+
+            if "PRESS START" in texts:
+                selected = None
+                for _, x, text in labels:
+                    if text == "[":
+                        selected = DIFFICULTY_BRACKET_X.get(x)
+                if selected is not None and selected != self.difficulty:
+                    hw.encoder.turn(1)
+                    await asyncio.sleep(0.1)
+                else:
+                    self._click(hw.encoder_button)
+                    await asyncio.sleep(0.3)
+                continue
+
+            if any(text.startswith("LEVEL ") for text in texts):
+                self._play_level(labels, now)
+            elif "to START" in texts or "Press to STOP" in texts:
+                self._click(self._slot_button())
+                await asyncio.sleep(0.2 + self._rng.random() * 0.4)
+                continue
+            elif "Press Button" in texts:
+                if not self._on_result:
+                    self._on_result = True
+                    score = next((t for t in texts if t.startswith("Score:")), "")
+                    result = "WIN" if "YOU WIN!" in texts else "GAME OVER"
+                    self.last_result = (result, int(score[6:]) if score[6:].strip().isdigit() else None, now)
+                    self.played += 1
+                    if self.keep_results:
+                        self.results.append(self.last_result)
+                if self.played < self.games:
+                    # Keep clicking: presses during the result screen's settle time are ignored
+                    self._click(hw.encoder_button)
+                    await asyncio.sleep(0.5)
+                continue
+            self._on_result = False
+
+            await asyncio.sleep(0.05)
+
+    def _play_level(self, labels, now):
+        action = None
+        count = target = None
+        for y, _, text in labels:
+            if y == 28:
+                action = text
+            elif y == 40 and "/" in text:
+                count, target = (int(v) for v in text.split("/"))
+        if action is None or count is None or now < self._next_shake:
+            return
+        if count < target + self.overshoot:
+            axis = ACTION_AXES.get(action, "x")
+            self.hw.motion.pulse(axis, now)
+            self._next_shake = now + self.SHAKE_INTERVAL
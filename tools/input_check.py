@@ -0,0 +1,75 @@
+"""
+Check src/input_events.py's button events against scripted presses.
+
+Drives a button pin through short presses and holds, polling at the input
+task's rate, and checks the events the queue hands back: a hold past
+long_press_ms gives exactly one LONG_PRESS between its PRESS and RELEASE
+(however long it is held), a short press gives none, and the same holds
+across the ticks_ms wrap. The exit status is 1 when a check fails.
+
+    python tools/input_check.py
+"""
+import sys
+
+import hal_sim  # noqa: F401  (puts src/ on the path)
+from input_events import InputEvents, LONG_PRESS, PRESS, RELEASE
+from ticks import TICKS_MAX, ticks_add
+
+POLL_MS = 10  # INPUT_RATE_HZ = 100
+LONG_PRESS_MS = 800
+NAMES = {PRESS: "PRESS", RELEASE: "RELEASE", LONG_PRESS: "LONG_PRESS"}
+
+
+class Pin:
+    """Button pin with a pull-up: value is False while pressed"""
+
+    def __init__(self):
+        self.value = True
+
+
+def press(start, hold_ms, *, idle_ms=200):
+    """Kinds and times (ms from start) of the events one press of hold_ms produces"""
+    pin = Pin()
+    now = [start]
+    events = InputEvents(debounce_ms=50, long_press_ms=LONG_PRESS_MS, clock=lambda: now[0])
+    events.add_button(pin)
+    seen = []
+    elapsed = 0
+    while elapsed <= idle_ms + hold_ms + idle_ms:
+        pin.value = not (idle_ms <= elapsed < idle_ms + hold_ms)
+        now[0] = ticks_add(start, elapsed)
+        events.poll(now[0])
+        while events.pop():
+            seen.append((events.kind, elapsed))
+        elapsed += POLL_MS
+    return seen
+
+
+def check(label, seen, *, long_press):
+    kinds = [kind for kind, _ in seen]
+    expected = [PRESS, LONG_PRESS, RELEASE] if long_press else [PRESS, RELEASE]
+    print(f"{label}: " + ", ".join(f"{NAMES[kind]} at {t}ms" for kind, t in seen))
+    if kinds != expected:
+        return [f"{label}: got {[NAMES[k] for k in kinds]}, expected {[NAMES[k] for k in expected]}"]
+    if long_press:
+        press_at, long_at = seen[0][1], seen[1][1]
+        if not LONG_PRESS_MS <= long_at - press_at < LONG_PRESS_MS + POLL_MS:
+            return [f"{label}: LONG_PRESS {long_at - press_at}ms after PRESS, expected {LONG_PRESS_MS}ms"]
+    return []
+
+
+def main():
+    failures = []
+    failures += check("short press 300ms", press(0, 300), long_press=False)
+    failures += check("hold 1000ms", press(0, 1000), long_press=True)
+    failures += check("hold 5000ms", press(0, 5000), long_press=True)
+    # Start just before ticks_ms wraps, so the hold spans the wrap
+    failures += check("hold across wrap", press(TICKS_MAX - 500, 1500), long_press=True)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Check the game's per-phase heap budgets on the simulator.
+
+Plays games with tracemalloc tracing, so the simulator's mem_free() reports a
+heap that shrinks by what the game's own code (src/) allocates after boot, and
+prints what each phase of
+MemoryManager (src/memory.py) used against its budget in MEMORY_BUDGETS. The
+exit status is 1 when any phase went over, so this can gate a change that adds
+allocation to a hot loop.
+
+    python tools/mem_budget.py
+    python tools/mem_budget.py --games 5 --seed 2 --difficulty HARD
+
+CPython objects are larger than MicroPython's, so a phase that fits here has
+room to spare on the device; the device's own figures come from gc.mem_free()
+and are printed on the serial console after each game.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tracemalloc
+
+from hal_sim import AutoPlayer, Simulator, load_game
+
+DIFFICULTIES = ["EASY", "MED", "HARD"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=3)
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default="EASY")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    hw = Simulator(seed=args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = load_game(hw)
+    tracemalloc.start()
+    player = AutoPlayer(hw, difficulty=DIFFICULTIES.index(args.difficulty), games=args.games, seed=args.seed)
+
+    async def session():
+        game_task = asyncio.create_task(game.run())
+        await player.run()
+        game_task.cancel()
+
+    # Serial output is discarded, not buffered, so it doesn't count as game heap
+    with open(os.devnull, "w") as serial, contextlib.redirect_stdout(serial):
+        hw.run(session(), timeout=3600 * args.games)
+    tracemalloc.stop()
+
+    memory = game.memory
+    print(f"{len(player.results)} games, {args.difficulty}")
+    print(f"{'phase':8s} {'entries':>8s} {'used max':>9s} {'budget':>7s} {'gc max':>7s}")
+    for phase in memory.phases.values():
+        flag = "  OVER" if phase.over_budget else ""
+        print(f"{phase.name:8s} {phase.entries:8d} {phase.used_max:9d} {phase.budget:7d} "
+              f"{phase.collect_max_ns / 1_000_000:6.1f}ms{flag}")
+    over = memory.over_budget()
+    if over:
+        print(f"over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
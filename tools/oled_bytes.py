@@ -0,0 +1,144 @@
+"""
+Display bus traffic per frame: full frames, displayio's dirty areas and page windows.
+
+Plays games on the simulator and, for every display refresh, records the I2C
+bytes three ways: a full 128x64 push; the windows displayio sends for its
+dirty areas; and the minimal windows the page buffer sends (only columns
+that really changed). Frames are grouped by screen (the in-level HUD, the
+spinning slot reels, everything else); displayio -> page buffer is the
+before/after of sending only changed columns.
+
+displayio is modelled on CircuitPython's refresh: every TileGrid added,
+removed or redrawn since the last frame marks its whole area dirty (a HUD
+slot's screen-wide tile is redrawn whole), each area is sent on its own,
+widened to 8-pixel pages, in chunks of at most REFRESH_BUFFER_PIXELS.
+
+    python tools/oled_bytes.py
+    python tools/oled_bytes.py --games 3 --seed 4 --bus-khz 100
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+
+from hal_sim import BITS_PER_BYTE, GLYPH_HEIGHT, GLYPH_WIDTH, AutoPlayer, Simulator, load_game
+from page_buffer import DATA_OVERHEAD, FULL_FRAME_BYTES, HEIGHT, WIDTH, WINDOW_COMMAND_BYTES
+
+REFRESH_BUFFER_PIXELS = 128 * 32  # displayio's refresh buffer: 128 words of 1-bit pixels
+
+
+def screen_kind(texts):
+    if any(text.startswith("LEVEL ") for text in texts):
+        return "hud"
+    if "SLOT MACHINE!" in texts and "Press to STOP" in texts:
+        return "slot reels"
+    return "other"
+
+
+def tile_area(item):
+    """(x, y, width, height) of the TileGrid behind a simulated label"""
+    x, width = item.tile or (item.x, len(item.text) * GLYPH_WIDTH)
+    return x, item.y - GLYPH_HEIGHT // 2, width, GLYPH_HEIGHT
+
+
+def area_bytes(area):
+    """I2C bytes displayio sends for one dirty area"""
+    x, y, width, height = area
+    x0, x1 = max(0, x), min(WIDTH, x + width)
+    y0, y1 = max(0, y), min(HEIGHT, y + height)
+    if x0 >= x1 or y0 >= y1:
+        return 0
+    pages = (y1 - 1) // 8 - y0 // 8 + 1
+    pages_per_chunk = max(1, REFRESH_BUFFER_PIXELS // (x1 - x0) // 8)
+    sent = 0
+    while pages > 0:
+        chunk = min(pages, pages_per_chunk)
+        sent += WINDOW_COMMAND_BYTES + DATA_OVERHEAD + (x1 - x0) * chunk
+        pages -= chunk
+    return sent
+
+
+class DirtyAreas:
+    """Follows the root group between frames; frame_bytes() is what displayio would send"""
+
+    def __init__(self):
+        self._shown = {}  # id(label) -> (label, (x, y, text), area) as of the last frame
+
+    def frame_bytes(self, group):
+        shown = {}
+        areas = []
+        for item in group or ():
+            state = (item.x, item.y, item.text)
+            area = tile_area(item)
+            last = self._shown.get(id(item))
+            if last is None:
+                areas.append(area)
+            elif last[1] != state:
+                if last[2] != area:
+                    areas.append(last[2])  # A moved tile clears where it was
+                areas.append(area)
+            shown[id(item)] = (item, state, area)
+        for key, (_, _, area) in self._shown.items():
+            if key not in shown:
+                areas.append(area)
+        self._shown = shown
+        return sum(area_bytes(area) for area in areas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bus-khz", type=float, default=400)
+    args = parser.parse_args()
+
+    hw = Simulator(seed=args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = load_game(hw)
+    display = hw.display
+    frames = {}  # screen -> [(displayio bytes, page buffer bytes)] per frame
+    dirty = DirtyAreas()
+    refresh = display.refresh
+
+    def metered_refresh(**kwargs):
+        before = display.bytes_sent
+        result = refresh(**kwargs)
+        kind = screen_kind([text for _, _, text in display.labels()])
+        sent = (dirty.frame_bytes(display.root_group), display.bytes_sent - before)
+        frames.setdefault(kind, []).append(sent)
+        return result
+
+    display.refresh = metered_refresh
+    player = AutoPlayer(hw, games=args.games, seed=args.seed)
+
+    async def session():
+        game_task = asyncio.create_task(game.run())
+        await player.run()
+        game_task.cancel()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        hw.run(session(), timeout=3600)
+
+    bus_bytes_per_ms = args.bus_khz * 1000 / BITS_PER_BYTE / 1000
+    full_ms = FULL_FRAME_BYTES / bus_bytes_per_ms
+    print(f"full frame: {FULL_FRAME_BYTES} B, {full_ms:.1f} ms at {args.bus_khz:.0f} kHz")
+    print("mean bytes per frame: displayio's dirty areas -> the page buffer's changed windows")
+    print(f"{'screen':12s} {'frames':>7s} {'displayio':>10s} {'pages':>7s} {'max':>7s} "
+          f"{'ms':>13s} {'vs full':>8s}")
+    for kind in sorted(frames):
+        sizes = frames[kind]
+        before = sum(sent for sent, _ in sizes) / len(sizes)
+        after = sum(sent for _, sent in sizes) / len(sizes)
+        print(f"{kind:12s} {len(sizes):7d} {before:8.0f} B {after:5.0f} B {max(sent for _, sent in sizes):5d} B "
+              f"{before / bus_bytes_per_ms:5.2f} -> {after / bus_bytes_per_ms:4.2f} {after / FULL_FRAME_BYTES:7.1%}")
+    count = sum(len(sizes) for sizes in frames.values())
+    if count:
+        before = sum(sent for sizes in frames.values() for sent, _ in sizes)
+        after = sum(sent for sizes in frames.values() for _, sent in sizes)
+        print(f"total: {after} B in {count} frames vs {before} B as displayio's dirty areas "
+              f"({after / before:.1%}) and {count * FULL_FRAME_BYTES} B as full frames "
+              f"({after / (count * FULL_FRAME_BYTES):.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+SSD1306-layout framebuffer with dirty page/column tracking and an I2C byte meter.
+
+The SSD1306 stores 128x64 pixels as 8 pages of 128 column bytes, each byte 8
+vertical pixels. PageBuffer keeps that layout, records for every page the
+column range touched since the last flush, and flush() sends only the columns
+that really differ from what the panel already shows, one window per page.
+Bytes are counted as they would go over I2C: per window an address + control
+byte + 6 addressing commands (column and page range), then address + control
+byte + the data.
+
+hal_sim.SimDisplay rasterises its labels into a PageBuffer on every refresh,
+so the simulator reports display bus traffic; tools/oled_bytes.py compares it
+with full-frame pushes for the game's screens.
+"""
+
+WIDTH = 128
+HEIGHT = 64
+PAGES = HEIGHT // 8
+WINDOW_COMMAND_BYTES = 1 + 1 + 6  # address, control, 0x21 c0 c1 0x22 p0 p1
+DATA_OVERHEAD = 1 + 1             # address, control (0x40)
+FULL_FRAME_BYTES = WINDOW_COMMAND_BYTES + DATA_OVERHEAD + WIDTH * PAGES
+
+
+class PageBuffer:
+    """
+    PageBuffer(width=128, height=64)
+    - pixel()/fill_rect()/fill() draw into the buffer and widen the touched
+      column range of each page they hit.
+    - flush(send=None) diffs the touched ranges against the shown copy and
+      calls send(page, start_col, data) for each changed window; returns bytes sent.
+    - Meter: frames, windows and bytes_sent since reset_meter().
+    """
+
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        self.width = width
+        self.pages = height // 8
+        self.buffer = bytearray(width * self.pages)
+        self._shown = bytearray(width * self.pages)
+        self._lo = [width] * self.pages   # First touched column per page
+        self._hi = [-1] * self.pages      # Last touched column per page
+        self.reset_meter()
+
+    def reset_meter(self):
+        self.frames = 0
+        self.windows = 0
+        self.bytes_sent = 0
+
+    def _touch(self, page, x0, x1):
+        if x0 < self._lo[page]:
+            self._lo[page] = x0
+        if x1 > self._hi[page]:
+            self._hi[page] = x1
+
+    def pixel(self, x, y, on=True):
+        if not (0 <= x < self.width and 0 <= y < self.pages * 8):
+            return
+        page = y >> 3
+        i = page * self.width + x
+        bit = 1 << (y & 7)
+        if on:
+            self.buffer[i] |= bit
+        else:
+            self.buffer[i] &= ~bit & 0xFF
+        self._touch(page, x, x)
+
+    def fill_rect(self, x, y, w, h, on=True):
+        x0 = max(0, x)
+        x1 = min(self.width, x + w) - 1
+        y0 = max(0, y)
+        y1 = min(self.pages * 8, y + h) - 1
+        if x0 > x1 or y0 > y1:
+            return
+        for page in range(y0 >> 3, (y1 >> 3) + 1):
+            top = max(y0, page * 8) & 7
+            bottom = min(y1, page * 8 + 7) & 7
+            mask = ((0xFF << top) & (0xFF >> (7 - bottom))) & 0xFF
+            row = page * self.width
+            for i in range(row + x0, row + x1 + 1):
+                if on:
+                    self.buffer[i] |= mask
+                else:
+                    self.buffer[i] &= ~mask & 0xFF
+            self._touch(page, x0, x1)
+
+    def fill(self, on=False):
+        value = 0xFF if on else 0
+        for i in range(len(self.buffer)):
+            self.buffer[i] = value
+        for page in range(self.pages):
+            self._touch(page, 0, self.width - 1)
+
+    def dirty_windows(self):
+        """(page, start_col, end_col) for each page whose content changed"""
+        windows = []
+        buf = self.buffer
+        shown = self._shown
+        for page in range(self.pages):
+            lo = self._lo[page]
+            hi = self._hi[page]
+            row = page * self.width
+            while lo <= hi and buf[row + lo] == shown[row + lo]:
+                lo += 1
+            while hi >= lo and buf[row + hi] == shown[row + hi]:
+                hi -= 1
+            if lo <= hi:
+                windows.append((page, lo, hi))
+        return windows
+
+    def flush(self, send=None):
+        sent = 0
+        view = memoryview(self.buffer)
+        for page, lo, hi in self.dirty_windows():
+            row = page * self.width
+            data = view[row + lo:row + hi + 1]
+            if send:
+                send(page, lo, data)
+            self._shown[row + lo:row + hi + 1] = data
+            sent += WINDOW_COMMAND_BYTES + DATA_OVERHEAD + len(data)
+            self.windows += 1
+        for page in range(self.pages):
+            self._lo[page] = self.width
+            self._hi[page] = -1
+        self.frames += 1
+        self.bytes_sent += sent
+        return sent
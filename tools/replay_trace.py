@@ -0,0 +1,65 @@
+"""
+Replay recorded accelerometer traces through the game's shake detector.
+
+Each level in the trace is fed through src/shake_detector.py, the same
+ShakeDetector the game runs, with the level's recorded action, threshold,
+cooldown and filter window. Replay is deterministic and runs as fast as the host
+can go. The replayed count is compared with the count the device reported, so a
+detection change can be checked against real sessions.
+
+    python tools/replay_trace.py traces.bin
+    python tools/replay_trace.py traces.bin --threshold-scale 1.2 --window 8
+"""
+import argparse
+import time
+
+import hal_sim  # noqa: F401  (puts src/ on the path)
+from adxl345_raw import COUNTS_PER_MS2
+from shake_detector import ShakeDetector
+from shake_trace import read_trace
+
+
+def replay_level(trace_level, *, threshold_scale=1.0, cooldown=None, window=None):
+    """Run one TraceLevel through a ShakeDetector; returns the shake count"""
+    detector = ShakeDetector(window or trace_level.window)
+    detector.configure(trace_level.action, trace_level.threshold * threshold_scale * COUNTS_PER_MS2,
+                       cooldown_ms=round((trace_level.cooldown if cooldown is None else cooldown) * 1000))
+    # Traces hold raw counts, which the detector takes as they are
+    for x, y, z in trace_level.seeds:
+        detector.seed(x, y, z)
+    for t, x, y, z in trace_level.samples:
+        detector.update(round(t * 1000), x, y, z)
+    return detector.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("traces", nargs="+")
+    parser.add_argument("--threshold-scale", type=float, default=1.0)
+    parser.add_argument("--cooldown", type=float, help="override the recorded shake cooldown (s)")
+    parser.add_argument("--window", type=int, help="override the recorded filter window")
+    args = parser.parse_args()
+
+    total = agree = samples = 0
+    start = time.perf_counter()
+    for path in args.traces:
+        with open(path, "rb") as f:
+            levels = read_trace(f)
+        for tl in levels:
+            count = replay_level(tl, threshold_scale=args.threshold_scale,
+                                 cooldown=args.cooldown, window=args.window)
+            passed = tl.target - tl.tolerance <= count <= tl.target + tl.tolerance
+            same = count == tl.shake_count
+            total += 1
+            agree += same
+            samples += len(tl.samples)
+            print(f"{path}: level {tl.level:2d} {tl.action:10s} {len(tl.samples):5d} samples  "
+                  f"device {tl.shake_count}  replay {count}  {'PASS' if passed else 'FAIL'}"
+                  f"{'' if same else '  <- differs'}")
+    wall = time.perf_counter() - start
+    print(f"{agree}/{total} levels match the device count; "
+          f"{samples} samples in {wall:.2f}s ({samples / wall if wall else 0:.0f} samples/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Play Shake Master headless on the host simulator, faster than real time.
+
+    python tools/simulate.py                      # one game on EASY
+    python tools/simulate.py --games 5 --difficulty HARD --seed 3
+    python tools/simulate.py --verbose            # include the game's serial output
+    python tools/simulate.py --record traces.bin  # then: python tools/replay_trace.py traces.bin
+    python tools/simulate.py --noise 0.2          # a noisy unit: calibration raises the thresholds
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+
+from hal_sim import AutoPlayer, Simulator, load_game
+from shake_trace import TraceRecorder
+
+DIFFICULTIES = ["EASY", "MED", "HARD"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default="EASY")
+    parser.add_argument("--overshoot", type=int, default=0, help="extra shakes per level beyond the target")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=float, default=0.05, help="sensor noise (m/s^2 standard deviation)")
+    parser.add_argument("--timeout", type=float, default=3600, help="virtual seconds before giving up")
+    parser.add_argument("--record", metavar="PATH", help="append every level's samples to a trace file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    hw = Simulator(seed=args.seed, noise=args.noise)
+    serial = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else serial):
+        game = load_game(hw)
+    if args.record:
+        game.recorder = TraceRecorder(args.record)
+    player = AutoPlayer(hw, difficulty=DIFFICULTIES.index(args.difficulty), games=args.games,
+                        overshoot=args.overshoot, seed=args.seed)
+
+    async def session():
+        game_task = asyncio.create_task(game.run())
+        await player.run()
+        game_task.cancel()
+
+    wall_start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else serial):
+        try:
+            hw.run(session(), timeout=args.timeout)
+        except asyncio.TimeoutError:
+            pass
+    wall = time.perf_counter() - wall_start
+    if args.record:
+        game.recorder.close()
+
+    for i, (result, score, at) in enumerate(player.results, 1):
+        print(f"game {i}: {result:9s} score {score}  at {at:7.1f}s")
+    virtual = hw.clock.now
+    print(f"simulated {virtual:.1f}s in {wall:.2f}s wall ({virtual / wall:.0f}x real time)")
+    print(f"pixel shows {hw.pixels.shows}, display refreshes {hw.display.refreshes} "
+          f"({hw.display.bytes_sent} B, {hw.display.full_frame_bytes} B as full frames), "
+          f"I2C transactions {hw.i2c.transactions}")
+
+
+if __name__ == "__main__":
+    main()
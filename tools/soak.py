@@ -0,0 +1,162 @@
+"""
+Soak test: play many consecutive games headless and check memory stays flat.
+
+Runs the unmodified game on the simulator with AutoPlayer restarting after
+every result screen. At each result it collects garbage and records how many
+memory blocks the interpreter holds (sys.getallocatedblocks(), cheap enough to
+leave the game at full speed) and how deep the game coroutine's await chain
+is. A game flow that nests every replay inside the last one shows up as both
+growing; the state machine in code.py should keep them flat. The player keeps
+no per-game results and the figures go into preallocated arrays, so nothing
+on the host side grows with the games either.
+
+    python tools/soak.py                              # 1000 consecutive games
+    python tools/soak.py --games 2000                 # the acceptance check
+    python tools/soak.py --games 200 --jobs 8 --difficulty HARD
+
+The simulator runs on virtual time with no real-time pacing, so what a game
+costs is the game's own work: every task wake-up (sensor, detect, LEDs,
+display, input) is one pass of the asyncio loop, about 80k per game of ~3
+virtual minutes. Frames are counted but not rasterised and the encoder task
+isn't started for the simulator's encoder, which leaves about 2 s of CPU per
+game: half an hour for the default 1000 games, an hour for the 2000-game
+check. Growth is only meaningful within one process, so those are single
+runs. --jobs plays independent runs (seeds seed..seed+jobs-1) in separate
+processes for more seeds in the same time; it does not make any one run
+longer.
+
+Exits with status 1 when, in any run, the blocks held after the last quarter
+of the games are more than --max-growth above the first quarter (median of
+each), or the await chain at the result screen got deeper (also medians: a
+sample can land in the screen's settle sleep or in its wait for a press).
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from hal_sim import AutoPlayer, Simulator, load_game
+
+DIFFICULTIES = ["EASY", "MED", "HARD"]
+
+
+def await_depth(task):
+    """Coroutines in task's await chain, outermost first"""
+    depth = 0
+    coro = task.get_coro()
+    while coro is not None and hasattr(coro, "cr_await"):
+        depth += 1
+        coro = coro.cr_await
+    return depth
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def soak(games, difficulty, seed):
+    """Play `games` games in this process; the figures the checks need"""
+    hw = Simulator(seed=seed, raster=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = load_game(hw)
+    player = AutoPlayer(hw, difficulty=DIFFICULTIES.index(difficulty), games=games, seed=seed,
+                        keep_results=False)
+    blocks = array("q", [0]) * games
+    depth = array("q", [0]) * games
+    won = array("b", [0]) * games
+
+    async def watch(game_task):
+        seen = 0
+        while True:
+            if player.played != seen:
+                won[seen] = player.last_result[0] == "WIN"
+                gc.collect()
+                blocks[seen] = sys.getallocatedblocks()
+                depth[seen] = await_depth(game_task)
+                seen += 1
+            await asyncio.sleep(0.5)
+
+    async def session():
+        game_task = asyncio.create_task(game.run())
+        watcher = asyncio.create_task(watch(game_task))
+        await player.run()
+        await asyncio.sleep(1)
+        watcher.cancel()
+        game_task.cancel()
+
+    wall_start = time.perf_counter()
+    with open(os.devnull, "w") as serial, contextlib.redirect_stdout(serial):
+        hw.run(session(), timeout=3600 * games)
+    return {
+        "seed": seed,
+        "games": player.played,
+        "wins": sum(won[:player.played]),
+        "virtual_s": hw.clock.now,
+        "wall_s": time.perf_counter() - wall_start,
+        "blocks": list(blocks[:player.played]),
+        "depth": list(depth[:player.played]),
+        "visits": dict(game.game_flow.visits),
+    }
+
+
+def check(run, max_growth):
+    """Print one run's figures; its failures"""
+    print(f"seed {run['seed']}: {run['games']} games ({run['wins']} won) in "
+          f"{run['virtual_s'] / 3600:.1f} h virtual, {run['wall_s']:.0f}s wall")
+    blocks = run["blocks"]
+    depth = run["depth"]
+    if len(blocks) < 4:
+        print("  too few games to compare")
+        return []
+    quarter = len(blocks) // 4
+    first = median(blocks[:quarter])
+    last = median(blocks[-quarter:])
+    print(f"  allocated blocks: first quarter {first}, last quarter {last} ({last - first:+d}), "
+          f"range {min(blocks)}-{max(blocks)}")
+    failed = []
+    if last - first > max_growth:
+        failed.append(f"seed {run['seed']}: {last - first} more blocks held")
+    first_depth = median(depth[:quarter])
+    last_depth = median(depth[-quarter:])
+    print(f"  await depth at result screen: first quarter {first_depth}, last quarter {last_depth}, "
+          f"range {min(depth)}-{max(depth)}")
+    print(f"  state visits: {run['visits']}")
+    if last_depth > first_depth:
+        failed.append(f"seed {run['seed']}: await chain grew from {first_depth} to {last_depth}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=1000, help="consecutive games per run")
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default="EASY")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=1, help="independent runs, one process each")
+    parser.add_argument("--max-growth", type=int, default=200, help="blocks")
+    args = parser.parse_args()
+
+    seeds = range(args.seed, args.seed + args.jobs)
+    if args.jobs == 1:
+        runs = [soak(args.games, args.difficulty, args.seed)]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            runs = list(pool.map(soak, [args.games] * args.jobs, [args.difficulty] * args.jobs, seeds))
+    failed = []
+    for run in runs:
+        failed += check(run, args.max_growth)
+    if len(runs) > 1:
+        print(f"{sum(run['games'] for run in runs)} games in {len(runs)} runs")
+    if failed:
+        print("FAIL: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Tune LEVELS thresholds, the shake cooldown and the filter window against recorded traces.
+
+Every recorded level in the corpus is counted for every candidate filter
+window, cooldown and threshold with the batch engine in tools/batch_replay.py
+(exact ShakeDetector counts). The filter output is worked out once per window
+and reused for every threshold, and the runs of moving samples once per
+threshold and reused for every cooldown. Files are spread over a process pool.
+
+Each session is judged at the difficulty it was played on (its recorded
+target and tolerance), so every difficulty present in the corpus pulls on the
+result. The window and cooldown are global; for each pair the levels'
+thresholds are independent, so each level takes the threshold whose pass
+rates per difficulty come closest to the target rates (squared error), and the
+pair with the smallest total wins. The tuned table is written in code.py's
+format:
+
+    python tools/tune_levels.py fleet/
+    python tools/tune_levels.py fleet/ --out levels.py --jobs 8
+    python tools/tune_levels.py fleet/ --rate HARD 0.7 0.25 --windows 4,5,6 --cooldowns 0.25,0.3
+
+Target rates run linearly from the first level to the last for each
+difficulty (--rate DIFFICULTY FIRST LAST). A level that can't be passed at a
+difficulty whatever the threshold (target - tolerance more shakes than the
+time allows at the cooldown) is reported; only its time, target or tolerance
+can fix that. Needs NumPy.
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import batch_replay
+from batch_replay import DIFFICULTIES, np
+from adxl345_raw import COUNTS_PER_MS2
+import hal_sim
+
+CODE_PATH = os.path.join(hal_sim.SRC, "code.py")
+TUNED_NAMES = ("LEVELS", "difficulty_multipliers", "tolerance_multipliers", "FILTER_WINDOW", "SHAKE_COOLDOWN_MS")
+DEFAULT_RATES = {"EASY": (0.95, 0.6), "MED": (0.85, 0.45), "HARD": (0.75, 0.3)}
+
+
+def read_config(path=CODE_PATH):
+    """The tuned settings as code.py has them, read with ast rather than by importing the game"""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    config = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            name = getattr(node.targets[0], "id", None)
+            if name in TUNED_NAMES:
+                config[name] = ast.literal_eval(node.value)
+    missing = [name for name in TUNED_NAMES if name not in config]
+    if missing:
+        raise ValueError(f"{path}: no literal {', '.join(missing)}")
+    return config
+
+
+def grid(spec):
+    """"a,b,c" or "start:stop:step" (inclusive) -> sorted values"""
+    if ":" in spec:
+        start, stop, step = (float(v) for v in spec.split(":"))
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 4) for i in range(count)]
+    return sorted(float(v) for v in spec.split(","))
+
+
+def sweep_file(path, windows, cooldowns_ms, thresholds):
+    """
+    Worker: {(level, difficulty): [sessions, passes, unders]} for one trace
+    file, passes and unders being int arrays over (window, cooldown, threshold)
+    """
+    shape = (len(windows), len(cooldowns_ms), len(thresholds))
+    limits = [threshold * COUNTS_PER_MS2 for threshold in thresholds]
+    totals = {}
+    for level in batch_replay.load_trace(path):
+        if level.target == 0:
+            continue  # The slot round records no shakes
+        key = (level.level, level.difficulty)
+        total = totals.get(key)
+        if total is None:
+            total = totals[key] = [0, np.zeros(shape, np.int32), np.zeros(shape, np.int32)]
+        total[0] += 1
+        low = level.target - level.tolerance
+        high = level.target + level.tolerance
+        for w, window in enumerate(windows):
+            deviation, n, any_axis = batch_replay.filter_deviation(level, window)
+            for t, limit in enumerate(limits):
+                if any_axis:
+                    starts, stops = batch_replay.moving_runs(batch_replay.moving_samples(deviation, n, limit))
+                else:
+                    starts = stops = ()
+                for c, cooldown_ms in enumerate(cooldowns_ms):
+                    count = batch_replay.count_runs(level.times, starts, stops, cooldown_ms)
+                    if count < low:
+                        total[2][w, c, t] += 1
+                    elif count <= high:
+                        total[1][w, c, t] += 1
+    return totals
+
+
+def target_rates(levels, rates):
+    """(level number, difficulty index) -> target pass rate, linear from the first shake level to the last"""
+    numbers = [entry["level"] for entry in levels if entry["target_shakes"]]
+    targets = {}
+    for d, name in enumerate(DIFFICULTIES):
+        first, last = rates[name]
+        for i, number in enumerate(numbers):
+            fraction = i / (len(numbers) - 1) if len(numbers) > 1 else 0
+            targets[(number, d)] = first + (last - first) * fraction
+    return targets
+
+
+def max_shakes(seconds, cooldown_ms):
+    """Most shakes the cooldown lets through in `seconds`"""
+    return int(seconds * 1000 // cooldown_ms) + 1
+
+
+def format_levels(levels, window, cooldown_ms):
+    lines = [f"FILTER_WINDOW = {window}", f"SHAKE_COOLDOWN_MS = {cooldown_ms}", "", "LEVELS = ["]
+    for i, entry in enumerate(levels):
+        fields = ", ".join(f"{json.dumps(key)}: {json.dumps(value)}" for key, value in entry.items())
+        lines.append(f"    {{{fields}}}{',' if i < len(levels) - 1 else ''}")
+    lines.append("]")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("traces", nargs="+", help="trace files or directories of *.bin")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--thresholds", default="0.8:3.6:0.1", help="m/s^2, a,b,c or start:stop:step")
+    parser.add_argument("--cooldowns", default="0.2,0.25,0.3,0.35,0.4", help="seconds")
+    parser.add_argument("--windows", default="3,4,5,6,8,10")
+    parser.add_argument("--rate", nargs=3, action="append", metavar=("DIFFICULTY", "FIRST", "LAST"),
+                        help="target pass rate at the first and last level")
+    parser.add_argument("--min-sessions", type=int, default=5,
+                        help="level/difficulty pairs with fewer sessions don't count")
+    parser.add_argument("--out", metavar="PATH", help="write the tuned LEVELS here instead of printing it")
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("tune_levels.py needs NumPy (pip install numpy)")
+
+    config = read_config()
+    levels = config["LEVELS"]
+    rates = dict(DEFAULT_RATES)
+    for name, first, last in args.rate or ():
+        rates[name.upper()] = (float(first), float(last))
+    # The current settings are always candidates, so they can be reported and kept on a tie
+    windows = sorted({int(v) for v in grid(args.windows)} | {config["FILTER_WINDOW"]})
+    cooldowns_ms = sorted({round(v * 1000) for v in grid(args.cooldowns)} | {config["SHAKE_COOLDOWN_MS"]})
+    current_thresholds = {entry["level"]: entry["threshold"] for entry in levels if entry["target_shakes"]}
+    thresholds = sorted(set(grid(args.thresholds)) | set(current_thresholds.values()))
+
+    paths = batch_replay.trace_paths(args.traces)
+    start = time.perf_counter()
+    totals = {}
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for result in pool.map(sweep_file, paths, [windows] * len(paths), [cooldowns_ms] * len(paths),
+                               [thresholds] * len(paths), chunksize=max(1, len(paths) // (4 * args.jobs))):
+            for key, (sessions, passes, unders) in result.items():
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = [sessions, passes, unders]
+                else:
+                    total[0] += sessions
+                    total[1] += passes
+                    total[2] += unders
+    wall = time.perf_counter() - start
+    candidates = len(windows) * len(cooldowns_ms) * len(thresholds)
+    print(f"{len(paths)} files, {sum(t[0] for t in totals.values())} levels x {candidates} candidates "
+          f"in {wall:.1f}s on {args.jobs} processes")
+
+    targets = target_rates(levels, rates)
+    used = {key: total for key, total in totals.items()
+            if total[0] >= args.min_sessions and key in targets}
+    if not used:
+        sys.exit(f"no level/difficulty has {args.min_sessions} or more sessions")
+
+    # Per level: squared error over its difficulties for every (window, cooldown, threshold)
+    errors = {}
+    for (number, d), (sessions, passes, _) in used.items():
+        error = (passes / sessions - targets[(number, d)]) ** 2
+        errors[number] = errors.get(number, 0) + error
+    w_now = windows.index(config["FILTER_WINDOW"])
+    c_now = cooldowns_ms.index(config["SHAKE_COOLDOWN_MS"])
+    t_now = {number: thresholds.index(current_thresholds[number]) for number in errors}
+    # Ties go to the threshold nearest the current one
+    distance = {number: np.abs(np.array(thresholds) - current_thresholds[number]) for number in errors}
+    best_t = {number: np.lexsort((np.broadcast_to(distance[number], error.shape), error), axis=-1)[..., 0]
+              for number, error in errors.items()}
+    objective = sum(np.take_along_axis(error, best_t[number][..., None], -1)[..., 0]
+                    for number, error in errors.items())
+    w_best, c_best = np.unravel_index(np.argmin(objective), objective.shape)
+    if objective[w_now, c_now] <= objective[w_best, c_best]:
+        w_best, c_best = w_now, c_now
+    before = sum(error[w_now, c_now, t_now[number]] for number, error in errors.items())
+    print(f"window {windows[w_now]} -> {windows[w_best]}, cooldown {cooldowns_ms[c_now]} -> "
+          f"{cooldowns_ms[c_best]} ms, squared error {before:.3f} -> {objective[w_best, c_best]:.3f}")
+
+    tuned = []
+    print(f"{'level':>5s} {'action':10s} {'threshold':>13s}  "
+          + "  ".join(f"{name + ' pass (target)':>24s}" for name in DIFFICULTIES))
+    for entry in levels:
+        entry = dict(entry)
+        number = entry["level"]
+        if number in errors:
+            t_best = int(best_t[number][w_best, c_best])
+            cells = []
+            for d in range(len(DIFFICULTIES)):
+                total = used.get((number, d))
+                if total is None:
+                    cells.append(f"{'-':>24s}")
+                    continue
+                sessions, passes, _ = total
+                cells.append(f"{passes[w_now, c_now, t_now[number]] / sessions:5.0%} -> "
+                             f"{passes[w_best, c_best, t_best] / sessions:4.0%} ({targets[(number, d)]:3.0%})"
+                             .rjust(24))
+            print(f"{number:5d} {entry['action']:10s} {entry['threshold']:5.2f} -> {thresholds[t_best]:4.2f}  "
+                  + "  ".join(cells))
+            entry["threshold"] = thresholds[t_best]
+        tuned.append(entry)
+
+    # Levels no threshold can make passable at the tuned cooldown
+    for entry in levels:
+        if not entry["target_shakes"]:
+            continue
+        for name in DIFFICULTIES:
+            seconds = entry["time"] * config["difficulty_multipliers"][name]
+            low = entry["target_shakes"] - int(entry["tolerance"] * config["tolerance_multipliers"][name])
+            most = max_shakes(seconds, cooldowns_ms[c_best])
+            if most < low:
+                print(f"level {entry['level']} {name}: needs {low} shakes in {seconds:g}s, "
+                      f"at most {most} fit at {cooldowns_ms[c_best]} ms cooldown")
+    for d, name in enumerate(DIFFICULTIES):
+        thin = [number for (number, dd), total in totals.items() if dd == d and total[0] < args.min_sessions]
+        if thin:
+            print(f"{name}: levels {', '.join(map(str, sorted(thin)))} have under {args.min_sessions} sessions")
+        if not any(dd == d for _, dd in used):
+            print(f"{name}: no sessions in the corpus; its target rates were not tuned for")
+
+    table = format_levels(tuned, windows[w_best], cooldowns_ms[c_best])
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(table)
+        print(f"tuned table written to {args.out}")
+    else:
+        print()
+        print(table, end="")
+
+
+if __name__ == "__main__":
+    main()